@@ -0,0 +1,86 @@
+"""
+Compares the deduplicated archive (src/archive.py) with zipping the Tableau folder.
+
+A Tableau folder with module_data for several courses is archived twice: once as it is,
+and once after one course's progress changed (like two runs in a row). Reports the time
+and the archive growth of both runs, and checks that the second run restores byte for
+byte.
+
+Usage:
+    python -m benchmarks.bench_archive [rows per course] [courses]
+"""
+import filecmp
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import settings
+from benchmarks.bench_dtypes import make_student_items
+from src.archive import archive_directory, restore
+from src.canvas_helpers import STUDENT_ITEMS_COLUMNS
+from src.output_formats import TableWriter
+from src.schema import STUDENT_ITEMS_SCHEMA, apply_schema
+
+
+def write_tableau(tableau_path, courses):
+    writer = TableWriter(tableau_path / "module_data", STUDENT_ITEMS_COLUMNS, "csv")
+    for student_items in courses:
+        writer.append(student_items)
+    writer.finish()
+    pd.DataFrame({"course_id": range(len(courses))}).to_csv(
+        tableau_path / "course_entitlements.csv", index=False
+    )
+
+
+def folder_bytes(path):
+    return sum(file.stat().st_size for file in Path(path).rglob("*") if file.is_file())
+
+
+def main(rows, course_count):
+    courses = []
+    for cid in range(course_count):
+        student_items = apply_schema(make_student_items(rows), STUDENT_ITEMS_SCHEMA)
+        student_items["course_id"] = cid + 1
+        courses.append(student_items)
+
+    print(f"{'run':>4} {'mode':>6} {'seconds':>8} {'archive growth MB':>18}")
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        settings.ROOT_DIR = root
+        tableau_path = root / "data" / "Tableau"
+        tableau_path.mkdir(parents=True)
+        for run in (1, 2):
+            if run == 2:
+                # one course's students made progress
+                changed = courses[0]["item_cp_req_completed"].copy()
+                changed.iloc[::50] = True
+                courses[0]["item_cp_req_completed"] = changed
+            write_tableau(tableau_path, courses)
+
+            before = folder_bytes(root / "zip")
+            start = time.perf_counter()
+            shutil.make_archive(root / "zip" / f"run{run}", "zip", tableau_path)
+            seconds = time.perf_counter() - start
+            growth = (folder_bytes(root / "zip") - before) / 2**20
+            print(f"{run:>4} {'zip':>6} {seconds:>8.2f} {growth:>18.1f}")
+
+            before = folder_bytes(root / "archive")
+            start = time.perf_counter()
+            archive_directory(tableau_path, f"run{run}")
+            seconds = time.perf_counter() - start
+            growth = (folder_bytes(root / "archive") - before) / 2**20
+            print(f"{run:>4} {'dedup':>6} {seconds:>8.2f} {growth:>18.1f}")
+
+        restored = root / "restored"
+        restore("run2", restored)
+        for path in tableau_path.iterdir():
+            assert filecmp.cmp(path, restored / path.name, shallow=False), path.name
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [200000, 20][len(args):]))
@@ -0,0 +1,87 @@
+"""
+Compares the change feed (src/change_feed.py) with what consumers did without it:
+reading the previous module_data.csv and merging it with the new table. Reports the
+time of both, the size of the feed's index and what a consumer reads (changes.csv next
+to module_data.csv), and checks that both find the same changes.
+
+The second run's table is the first one with 1% of the items completed.
+
+Usage:
+    python -m benchmarks.bench_change_feed [rows ...]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import settings
+from benchmarks.bench_dtypes import make_student_items
+from src.change_feed import ChangeFeed, CompletionIndex
+from src.schema import STUDENT_ITEMS_SCHEMA, apply_schema
+
+KEY = ["student_id", "items_id"]
+
+
+def merge_diff(previous_path, current):
+    """Returns the number of newly completed items, found with a full merge"""
+    previous = pd.read_csv(previous_path)
+    current = current[KEY + ["item_cp_req_completed"]].astype({"student_id": int})
+    merged = previous[KEY + ["item_cp_req_completed"]].merge(
+        current, on=KEY, suffixes=("_old", "")
+    )
+    was = merged["item_cp_req_completed_old"].fillna(False).astype(bool)
+    now = merged["item_cp_req_completed"].fillna(False).astype(bool)
+    return int((now & ~was).sum())
+
+
+def main(sizes):
+    print(
+        f"{'item rows':>10} {'merge s':>8} {'index s':>8} {'index MB':>9}"
+        f" {'module_data MB':>15} {'changes KB':>11}"
+    )
+    for size in sizes:
+        previous = apply_schema(make_student_items(size), STUDENT_ITEMS_SCHEMA)
+        current = previous.copy()
+        not_completed = np.flatnonzero(~current["item_cp_req_completed"].fillna(False))
+        rng = np.random.default_rng(0)
+        newly = rng.choice(not_completed, len(current) // 100, replace=False)
+        completed = current["item_cp_req_completed"].copy()
+        completed.iloc[newly] = True
+        current["item_cp_req_completed"] = completed
+
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            settings.ROOT_DIR = directory
+            CompletionIndex.build(previous).save("1")
+            previous_path = directory / "previous_module_data.csv"
+            previous.to_csv(previous_path, index=False)
+
+            start = time.perf_counter()
+            expected = merge_diff(previous_path, current)
+            merge_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            feed = ChangeFeed(directory)
+            feed.append(current)
+            changes_path = feed.table.path
+            feed.finish()
+            index_seconds = time.perf_counter() - start
+
+            index_megabytes = (directory / "change_index" / "1.pkl").stat().st_size / 2**20
+            changes_kilobytes = changes_path.stat().st_size / 2**10
+            module_data_megabytes = previous_path.stat().st_size / 2**20
+            with open(changes_path) as changes:
+                found = sum(1 for line in changes) - 1
+        print(
+            f"{len(current):>10} {merge_seconds:>8.2f} {index_seconds:>8.2f}"
+            f" {index_megabytes:>9.1f} {module_data_megabytes:>15.1f}"
+            f" {changes_kilobytes:>11.1f}"
+        )
+        assert found == expected == len(newly), (found, expected, len(newly))
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000])
@@ -0,0 +1,53 @@
+"""
+Measures how much memory STUDENT_ITEMS_SCHEMA (src/schema.py) saves on student_items_df
+and checks that the CSV output is unchanged.
+
+The student module table is generated in memory like in bench_flatten, flattened with
+flatten_items and reduced to STUDENT_ITEMS_COLUMNS, then measured before and after
+apply_schema.
+
+Usage:
+    python -m benchmarks.bench_dtypes [rows ...]
+"""
+import sys
+import time
+
+from benchmarks.bench_flatten import ITEMS, MODULES, make_module_status
+from src.canvas_helpers import STUDENT_ITEMS_COLUMNS
+from src.flatten import flatten_items
+from src.schema import STUDENT_ITEMS_SCHEMA, apply_schema
+
+
+def make_student_items(rows):
+    """Returns an untyped student_items_df with (about) rows rows"""
+    module_status = make_module_status(rows)
+    module_status["course_id"] = 1
+    module_status["course_name"] = "Course 1"
+    module_status["items_count"] = ITEMS
+    module_status["module_position"] = module_status["module_id"] % MODULES + 1
+    student_items = flatten_items(
+        module_status, "items", "items_", "items_completion_requirement", "item_cp_req_"
+    )
+    return student_items.reindex(columns=STUDENT_ITEMS_COLUMNS)
+
+
+def megabytes(dataframe):
+    return dataframe.memory_usage(deep=True).sum() / 2**20
+
+
+def main(sizes):
+    print(f"{'item rows':>10} {'before MB':>10} {'after MB':>9} {'seconds':>8}")
+    for size in sizes:
+        student_items = make_student_items(size)
+        before = megabytes(student_items)
+        csv = student_items.to_csv(index=False)
+        start = time.perf_counter()
+        apply_schema(student_items, STUDENT_ITEMS_SCHEMA)
+        seconds = time.perf_counter() - start
+        after = megabytes(student_items)
+        print(f"{len(student_items):>10} {before:>10.1f} {after:>9.1f} {seconds:>8.2f}")
+        assert student_items.to_csv(index=False) == csv, "CSV output differs"
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000])
@@ -0,0 +1,148 @@
+"""
+End-to-end benchmark: runs update_module_progress.main against a local FakeCanvas.
+
+The run is non-interactive (settings.CONFIRM_RUN = False) and happens in a child process
+with its own ROOT_DIR (a temporary folder with course_entitlements.csv, data/, archive/
+and status_log/), so nothing in the repository is touched and the peak RSS is that of
+the script alone. Reports, per client:
+
+    * wall time of main()
+    * requests served by the fake Canvas (and how many were throttled)
+    * peak RSS of the process running main()
+    * courses that succeeded
+
+Usage:
+    python -m benchmarks.bench_end_to_end [--courses 4] [--students 200] [--modules 10]
+        [--items 10] [--latency 0.05] [--jitter 0.02] [--rate-limit 700]
+        [--client canvasapi async] [--progress-mode per_student] [--setting NAME=VALUE ...]
+
+EX. python -m benchmarks.bench_end_to_end --students 1000 --latency 0.1 --rate-limit 700
+"""
+import argparse
+import ast
+import contextlib
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.fake_canvas import FakeCanvas, SyntheticCourse
+
+
+def run_main(root, base_url, overrides, results):
+    """Runs update_module_progress.main in this (child) process and reports the result"""
+    import settings
+
+    settings.ROOT_DIR = root
+    settings.BASE_URL = base_url
+    settings.CONFIRM_RUN = False
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    os.environ["CANVAS_API_TOKEN"] = "fake-token"
+
+    import update_module_progress
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+        devnull
+    ), contextlib.redirect_stderr(devnull):
+        start = time.perf_counter()
+        update_module_progress.main()
+        seconds = time.perf_counter() - start
+    succeeded = sum(info["status"] == "Success" for info in settings.status.values())
+    # ru_maxrss is in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((seconds, peak_mb, succeeded))
+
+
+def make_root(course_ids):
+    """Returns a temporary ROOT_DIR holding course_entitlements.csv and the output folders"""
+    root = Path(tempfile.mkdtemp(prefix="module-progress-bench-"))
+    for folder in ("data/Tableau", "archive", "status_log"):
+        (root / folder).mkdir(parents=True)
+    pd.DataFrame({"course_id": course_ids, "user_id": "bench-user"}).to_csv(
+        root / "course_entitlements.csv", index=False
+    )
+    return str(root)
+
+
+def parse_setting(text):
+    """Parses NAME=VALUE (VALUE as a Python literal, else as a string)"""
+    name, _, value = text.partition("=")
+    try:
+        return name, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return name, value
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--courses", type=int, default=4)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--client", nargs="+", default=["canvasapi", "async"])
+    parser.add_argument("--progress-mode", default="per_student")
+    parser.add_argument("--setting", nargs="*", default=[], type=parse_setting)
+    args = parser.parse_args(argv)
+
+    courses = [
+        SyntheticCourse(
+            course_id, students=args.students, modules=args.modules, items=args.items
+        )
+        for course_id in range(1, args.courses + 1)
+    ]
+    print(
+        f"{args.courses} courses x {args.students} students x {args.modules} modules"
+        f" x {args.items} items, latency {args.latency}s (+{args.jitter}s),"
+        f" rate limit {args.rate_limit}"
+    )
+    print(
+        f"{'client':>10} {'seconds':>8} {'requests':>9} {'throttled':>9}"
+        f" {'peak MB':>8} {'courses':>8}"
+    )
+    context = multiprocessing.get_context("spawn")
+    for client in args.client:
+        server = FakeCanvas(
+            courses,
+            latency=args.latency,
+            latency_jitter=args.jitter,
+            rate_limit=args.rate_limit,
+        )
+        base_url = server.start()
+        overrides = {
+            "CANVAS_CLIENT": client,
+            "PROGRESS_MODE": args.progress_mode,
+            # every run starts cold
+            "CACHE_RESPONSES": False,
+            **dict(args.setting),
+        }
+        results = context.Queue()
+        root = make_root([course.id for course in courses])
+        try:
+            process = context.Process(
+                target=run_main, args=(root, base_url, overrides, results)
+            )
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                sys.exit(f"{client}: the run failed (see {root})")
+            seconds, peak_mb, succeeded = results.get(timeout=10)
+        finally:
+            server.stop()
+        print(
+            f"{client:>10} {seconds:>8.2f} {server.request_count:>9}"
+            f" {server.throttled_count:>9} {peak_mb:>8.0f}"
+            f" {succeeded:>4}/{args.courses:<3}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,117 @@
+"""
+Benchmarks flatten_items against the previous row-by-row flattening functions
+(_list_to_df / _dict_to_cols / _all_dict_to_str, copied below) and checks that both
+produce byte-identical CSV output.
+
+The student module table is generated in memory: students x modules rows, each with
+a list of items, so the flattened table has students x modules x items rows.
+
+Usage:
+    python -m benchmarks.bench_flatten [rows ...]
+"""
+import re
+import sys
+import time
+import warnings
+from ast import literal_eval
+
+import pandas as pd
+
+from benchmarks.fake_canvas import SyntheticCourse
+from src.flatten import flatten_items
+
+MODULES = 10
+ITEMS = 10
+
+
+def _dict_to_cols(dataframe, col_to_expand, expand_name):
+    dataframe[col_to_expand] = dataframe[col_to_expand].apply(_all_dict_to_str)
+    original_df = dataframe.drop([col_to_expand], axis=1)
+    extended_df = dataframe[col_to_expand].apply(pd.Series, dtype="object")
+    extended_df.columns = [
+        i
+        if bool(re.search(expand_name, i))
+        else "{}{}".format(str(expand_name), str(i))
+        for i in extended_df.columns
+    ]
+    new_df = pd.concat([original_df, extended_df], axis=1, ignore_index=False)
+    return new_df
+
+
+def _list_to_df(dataframe, col_to_expand):
+    series = (
+        dataframe.apply(lambda x: pd.Series(x[col_to_expand]), axis=1)
+        .stack()
+        .reset_index(level=1, drop=True)
+    )
+    series.name = col_to_expand
+    new_df = dataframe.drop(col_to_expand, axis=1).join(series)
+    return new_df
+
+
+def _all_dict_to_str(d):
+    if isinstance(d, dict):
+        new = {k: str(v) for k, v in d.items()}
+        return new
+    else:
+        if pd.isnull(d):
+            pass
+        else:
+            d = literal_eval(d)
+            new = {k: str(v) for k, v in d.items()}
+            return new
+
+
+def row_by_row(module_status):
+    """The flattening get_student_items_status did before flatten_items"""
+    expanded_items = _list_to_df(module_status, "items")
+    expanded_items = _dict_to_cols(expanded_items, "items", "items_")
+    return _dict_to_cols(
+        expanded_items, "items_completion_requirement", "item_cp_req_"
+    ).reset_index(drop=True)
+
+
+def bulk(module_status):
+    return flatten_items(
+        module_status, "items", "items_", "items_completion_requirement", "item_cp_req_"
+    )
+
+
+def make_module_status(rows):
+    """Returns a student module table that flattens to (about) rows item rows"""
+    students = max(1, rows // (MODULES * ITEMS))
+    course = SyntheticCourse(1, students=students, modules=MODULES, items=ITEMS)
+    records = []
+    for student in course.students:
+        for module in course.student_modules_json(student["id"]):
+            records.append(
+                {
+                    "module_id": module["id"],
+                    "module_name": module["name"],
+                    "state": module["state"],
+                    "completed_at": module["completed_at"],
+                    "items": module["items"],
+                    "student_id": str(student["id"]),
+                    "student_name": student["name"],
+                }
+            )
+    return pd.DataFrame(records)
+
+
+def main(sizes):
+    warnings.simplefilter("ignore", FutureWarning)
+    print(f"{'item rows':>10} {'method':>10} {'seconds':>9}")
+    for size in sizes:
+        module_status = make_module_status(size)
+        outputs = []
+        for function in (row_by_row, bulk):
+            start = time.perf_counter()
+            result = function(module_status.copy())
+            seconds = time.perf_counter() - start
+            outputs.append(result.to_csv(index=False))
+            print(f"{len(result):>10} {function.__name__:>10} {seconds:>9.2f}")
+        assert outputs[0] == outputs[1], "CSV output differs"
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000])
@@ -0,0 +1,63 @@
+"""
+Compares write time, read time and file size of the output formats in
+src/output_formats.py on SAMPLE_Tableau_Data/SAMPLE_module_data.csv scaled up.
+
+The sample (419 rows) is repeated with new student ids until it has about the requested
+number of rows. Files are written to a temporary directory.
+
+Usage:
+    python -m benchmarks.bench_output_formats [rows ...]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import settings
+from src.output_formats import FORMATS, read_table, write_table
+
+SAMPLE = Path(f"{settings.ROOT_DIR}/SAMPLE_Tableau_Data/SAMPLE_module_data.csv")
+
+
+def make_module_data(rows):
+    """Returns the sample module data repeated to about rows rows"""
+    sample = pd.read_csv(SAMPLE, index_col=0, encoding="utf-8-sig")
+    copies = max(1, rows // len(sample))
+    students = sample["student_id"].max() + 1
+    frames = []
+    for copy in range(copies):
+        frame = sample.copy()
+        frame["student_id"] = frame["student_id"] + copy * students
+        frame["student_name"] = frame["student_name"] + f"-{copy}"
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main(sizes):
+    print(f"{'rows':>9} {'format':>8} {'write s':>8} {'read s':>8} {'MB':>8}")
+    for size in sizes:
+        module_data = make_module_data(size)
+        with tempfile.TemporaryDirectory() as directory:
+            for name in FORMATS:
+                path = Path(directory) / name / "module_data"
+                path.parent.mkdir()
+
+                start = time.perf_counter()
+                written = write_table(module_data, path, output_format=name)
+                write_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                read_table(path)
+                read_seconds = time.perf_counter() - start
+
+                megabytes = written.stat().st_size / 2 ** 20
+                print(
+                    f"{len(module_data):>9} {name:>8} {write_seconds:>8.2f}"
+                    f" {read_seconds:>8.2f} {megabytes:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [100000, 1000000, 5000000])
@@ -0,0 +1,102 @@
+"""
+Benchmarks building the student module table with RecordBuilder against the previous
+approach (a DataFrame per student concatenated onto the growing table).
+
+No requests are made: each student's modules come from a SyntheticCourse.
+
+Usage:
+    python -m benchmarks.bench_record_builder [students ...]
+"""
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import pandas as pd
+
+from benchmarks.fake_canvas import SyntheticCourse
+from src.canvas_helpers import STUDENT_MODULE_ATTRS, RecordBuilder
+
+
+def create_dict_from_object(theobj, list_of_attributes):
+    """Copied from canvas_helpers (removed when records.py replaced it)"""
+
+    def get_attribute_if_available(theobj, attrname):
+        if hasattr(theobj, attrname):
+            return {attrname: getattr(theobj, attrname)}
+        else:
+            return {attrname: None}
+
+    mydict = {}
+    for i in list_of_attributes:
+        mydict.update(get_attribute_if_available(theobj, i))
+    return mydict
+
+
+def concat_per_student(students, student_modules):
+    """The approach RecordBuilder replaced"""
+    student_module_status = pd.DataFrame()
+    for student, modules in zip(students, student_modules):
+        student_rows = pd.DataFrame(
+            [create_dict_from_object(m, STUDENT_MODULE_ATTRS) for m in modules]
+        )
+        student_rows["student_id"] = str(student["id"])
+        student_rows["sis_user_id"] = student["sis_user_id"]
+        student_rows["student_name"] = student["name"]
+        student_rows["sortable_student_name"] = student["sortable_name"]
+        student_module_status = pd.concat(
+            [student_module_status, student_rows], ignore_index=True, sort=False
+        )
+    return student_module_status
+
+
+def record_builder(students, student_modules):
+    builder = RecordBuilder(STUDENT_MODULE_ATTRS)
+    for student, modules in zip(students, student_modules):
+        builder.extend(
+            modules,
+            student_id=str(student["id"]),
+            sis_user_id=student["sis_user_id"],
+            student_name=student["name"],
+            sortable_student_name=student["sortable_name"],
+        )
+    return builder.to_frame()
+
+
+def measure(function, *args):
+    """Returns (seconds, peak traced MB, result); timed without tracing overhead"""
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def main(sizes):
+    print(f"{'students':>8} {'method':>18} {'seconds':>9} {'peak MB':>9}")
+    for size in sizes:
+        course = SyntheticCourse(1, students=size, modules=10, items=5)
+        students = course.students
+        student_modules = [
+            [
+                SimpleNamespace(course_id=course.id, **module)
+                for module in course.student_modules_json(student["id"])
+            ]
+            for student in students
+        ]
+
+        results = []
+        for function in (concat_per_student, record_builder):
+            seconds, peak, result = measure(function, students, student_modules)
+            results.append(result)
+            print(f"{size:>8} {function.__name__:>18} {seconds:>9.2f} {peak:>9.1f}")
+
+        assert results[0].astype(str).equals(results[1].astype(str))
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [100, 1000, 5000])
@@ -0,0 +1,102 @@
+"""
+Benchmarks the student items path with the records of src/records.py against the
+previous one: every module wrapped in a SimpleNamespace (as the async client did) and
+its items flattened with flatten_items, which converts every value to a string that
+apply_schema then parses back. Checks that both give the same CSV output.
+
+No requests are made: each student's modules come from a SyntheticCourse, decoded
+before timing. The peak memory includes holding every student's modules, like
+get_student_module_status does until the table is built.
+
+Usage:
+    python -m benchmarks.bench_records [students ...]
+"""
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from benchmarks.fake_canvas import SyntheticCourse
+from src.canvas_helpers import (
+    STUDENT_ITEMS_COLUMNS,
+    STUDENT_MODULE_ATTRS,
+    RecordBuilder,
+)
+from src.flatten import flatten_items, flatten_student_items
+from src.records import Module
+from src.schema import STUDENT_ITEMS_SCHEMA, apply_schema
+
+ITEM_COLUMNS = [column for column in STUDENT_ITEMS_COLUMNS if column != "course_name"]
+
+
+def student_items(students, student_modules, flatten):
+    builder = RecordBuilder(STUDENT_MODULE_ATTRS)
+    for student, modules in zip(students, student_modules):
+        builder.extend(modules, student_id=str(student["id"]), student_name=student["name"])
+    module_status = builder.to_frame().rename(
+        columns={"id": "module_id", "name": "module_name", "position": "module_position"}
+    )
+    student_items_status = flatten(module_status)
+    return apply_schema(student_items_status, STUDENT_ITEMS_SCHEMA)[ITEM_COLUMNS]
+
+
+def namespaces(students, responses):
+    """The approach the records replaced"""
+    student_modules = [
+        [SimpleNamespace(**module) for module in modules] for modules in responses
+    ]
+    return student_items(
+        students,
+        student_modules,
+        lambda module_status: flatten_items(
+            module_status,
+            "items",
+            "items_",
+            "items_completion_requirement",
+            "item_cp_req_",
+        ),
+    )
+
+
+def records(students, responses):
+    student_modules = [list(map(Module.from_json, modules)) for modules in responses]
+    return student_items(students, student_modules, flatten_student_items)
+
+
+def measure(function, *args):
+    """Returns (seconds, peak traced MB, result); timed without tracing overhead"""
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def main(sizes):
+    print(f"{'students':>8} {'item rows':>10} {'method':>11} {'seconds':>9} {'peak MB':>9}")
+    for size in sizes:
+        course = SyntheticCourse(1, students=size, modules=10, items=10)
+        responses = [
+            [
+                dict(module, course_id=course.id)
+                for module in course.student_modules_json(student["id"])
+            ]
+            for student in course.students
+        ]
+        outputs = []
+        for function in (namespaces, records):
+            seconds, peak, result = measure(function, course.students, responses)
+            outputs.append(result.to_csv(index=False))
+            print(
+                f"{size:>8} {len(result):>10} {function.__name__:>11}"
+                f" {seconds:>9.2f} {peak:>9.1f}"
+            )
+        assert outputs[0] == outputs[1], "CSV output differs"
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [100, 1000, 5000])
@@ -0,0 +1,93 @@
+"""
+Compares the flat module_data table with the star schema tables (src/star_schema.py):
+size on disk, write time and load time, and checks that joining the fact table to the
+dimensions gives back module_data.
+
+Usage:
+    python -m benchmarks.bench_star_schema [rows ...]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.bench_dtypes import make_student_items
+from src.canvas_helpers import STUDENT_ITEMS_COLUMNS
+from src.output_formats import TableWriter, write_table
+from src.schema import STUDENT_ITEMS_SCHEMA, apply_schema
+from src.star_schema import (
+    COURSE_COLUMNS,
+    COURSE_TABLES,
+    DIMENSIONS,
+    FACT_TABLE,
+    TABLES,
+    StarWriter,
+)
+
+
+def write_flat(student_items, directory):
+    writer = TableWriter(directory / "module_data", STUDENT_ITEMS_COLUMNS, "csv")
+    writer.append(student_items)
+    return [writer.finish()]
+
+
+def write_course_folder(student_items, directory):
+    """Writes the module_df and items_df StarWriter reads, taken from student_items"""
+    renamed = {new: old for old, new in COURSE_COLUMNS.items()}
+    for name, table in COURSE_TABLES.items():
+        key, columns = DIMENSIONS[name]
+        dataframe = student_items[columns].drop_duplicates(subset=[key])
+        write_table(dataframe.rename(columns=renamed), directory / "1" / table, "csv")
+
+
+def write_star(student_items, directory):
+    writer = StarWriter(directory, data_path=directory)
+    writer.append(student_items)
+    writer.finish()
+    return [(directory / name).with_suffix(".csv") for name in TABLES]
+
+
+def join_star(directory):
+    """Returns module_data rebuilt from the star schema tables"""
+    tables = {
+        name: pd.read_csv((directory / name).with_suffix(".csv"), dtype=str)
+        for name in TABLES
+    }
+    joined = tables[FACT_TABLE]
+    for name, (key, columns) in DIMENSIONS.items():
+        new_columns = [col for col in columns if col == key or col not in joined]
+        joined = joined.merge(tables[name][new_columns], on=key, how="left")
+    return joined[STUDENT_ITEMS_COLUMNS]
+
+
+def main(sizes):
+    print(
+        f"{'item rows':>10} {'layout':>6} {'MB':>7} {'write s':>8} {'load s':>7}"
+    )
+    for size in sizes:
+        student_items = apply_schema(make_student_items(size), STUDENT_ITEMS_SCHEMA)
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / "1").mkdir()
+            write_course_folder(student_items, directory)
+            for layout, write in (("flat", write_flat), ("star", write_star)):
+                start = time.perf_counter()
+                paths = write(student_items, directory)
+                write_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                for path in paths:
+                    pd.read_csv(path)
+                load_seconds = time.perf_counter() - start
+                megabytes = sum(path.stat().st_size for path in paths) / 2**20
+                print(
+                    f"{len(student_items):>10} {layout:>6} {megabytes:>7.1f}"
+                    f" {write_seconds:>8.2f} {load_seconds:>7.2f}"
+                )
+            flat = pd.read_csv(directory / "module_data.csv", dtype=str)
+            assert join_star(directory).equals(flat), "the star schema join differs"
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000])
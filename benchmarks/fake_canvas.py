@@ -0,0 +1,438 @@
+"""
+Local stand-in for the parts of the Canvas LMS REST API that module-progress uses.
+
+Serves synthetic courses generated from a few numbers (students x modules x items) so
+the Canvas clients in src/ can be exercised without a real Canvas instance or token:
+
+    GET /api/v1/courses/:id
+    GET /api/v1/courses/:id/modules            (optionally with student_id)
+    GET /api/v1/courses/:id/users              (also /search_users, used by canvasapi)
+    GET /api/v1/courses/:id/enrollments
+    GET /api/v1/courses/:id/students/submissions   (every student's submissions)
+    GET /api/v1/courses/:id/quizzes
+    GET /api/v1/courses/:id/discussion_topics
+
+Like Canvas:
+
+    * list endpoints are paginated with `per_page` (10 by default, at most 100) / `page`
+      and a `Link` header (current, next, first, last)
+    * responses carry an ETag and a matching If-None-Match is answered with 304
+    * with a rate_limit, requests are metered with a leaky bucket: every request is
+      charged an up-front cost while in flight, responses carry X-Request-Cost and
+      X-Rate-Limit-Remaining, and an empty bucket is answered with 403 "Rate Limit
+      Exceeded" (https://canvas.instructure.com/doc/api/file.throttling.html)
+
+latency (and latency_jitter) delay every response, to stand in for the network and
+Canvas' own processing time.
+
+Usage:
+    server = FakeCanvas([SyntheticCourse(1, students=20)], latency=0.05)
+    base_url = server.start()
+    canvas = Canvas(base_url, "any-token")
+    ...
+    server.stop()
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+REQUIREMENT_TYPES = ["must_view", "must_mark_done", "must_submit", "min_score"]
+ITEM_TYPES = ["Page", "Assignment", "Quiz", "File", "Discussion"]
+# unlock_at of the modules that aren't unlocked yet (see SyntheticCourse future_modules)
+FUTURE_UNLOCK_AT = "2099-01-01T00:00:00Z"
+
+
+class SyntheticCourse:
+    """A generated course with deterministic (seeded) student progress
+
+    Args:
+        course_id (int): the course id
+        students (int): number of enrolled students
+        modules (int): number of modules
+        items (int): number of items per module
+        seed (int): seed for the generated progress
+        requirement_types (list of strings): completion requirements given to the items
+                                             (in turn)
+        sequential (bool): every module has the previous one as a prerequisite
+        future_modules (int): the last future_modules modules unlock in the future
+    """
+
+    def __init__(
+        self,
+        course_id,
+        students=10,
+        modules=5,
+        items=4,
+        seed=0,
+        requirement_types=REQUIREMENT_TYPES,
+        sequential=False,
+        future_modules=0,
+    ):
+        self.id = course_id
+        self.name = f"Synthetic-Course-{course_id}"
+        self.seed = seed
+        self._submissions = None
+        self.students = [
+            {
+                "id": course_id * 100000 + i,
+                "name": f"student{i:05d}",
+                "created_at": "2020-01-01T00:00:00Z",
+                "sortable_name": f"{i:05d}, student",
+                "short_name": f"student{i:05d}",
+                "sis_user_id": f"{course_id}{i:05d}",
+                "integration_id": None,
+                "login_id": f"student{i:05d}",
+                "email": f"student{i:05d}@example.com",
+            }
+            for i in range(students)
+        ]
+        self.modules = []
+        for m in range(modules):
+            module_id = course_id * 1000 + m
+            module_items = []
+            for k in range(items):
+                item = {
+                    "id": module_id * 100 + k,
+                    "title": f"Item {m + 1}.{k + 1}",
+                    "position": k + 1,
+                    "indent": k % 2,
+                    "type": ITEM_TYPES[k % len(ITEM_TYPES)],
+                    "module_id": module_id,
+                    "content_id": module_id * 100 + k,
+                    "html_url": f"https://canvas.example.com/courses/{course_id}/modules/items/{module_id * 100 + k}",
+                }
+                requirement = requirement_types[k % len(requirement_types)]
+                item["completion_requirement"] = {"type": requirement}
+                if requirement == "min_score":
+                    item["completion_requirement"]["min_score"] = 5.0
+                module_items.append(item)
+            self.modules.append(
+                {
+                    "id": module_id,
+                    "name": f"Module {m + 1}",
+                    "position": m + 1,
+                    # every other module has an unlock date (already passed)
+                    "unlock_at": FUTURE_UNLOCK_AT
+                    if m >= modules - future_modules
+                    else "2020-09-08T07:00:00Z"
+                    if m % 2
+                    else None,
+                    "require_sequential_progress": False,
+                    "publish_final_grade": False,
+                    "prerequisite_module_ids": [module_id - 1] if sequential and m else [],
+                    "published": True,
+                    "items_count": items,
+                    "items_url": f"https://canvas.example.com/api/v1/courses/{course_id}/modules/{module_id}/items",
+                    "items": module_items,
+                }
+            )
+
+    def course_json(self):
+        return {"id": self.id, "name": self.name, "course_code": self.name}
+
+    def enrollments_json(self):
+        return [
+            {
+                "id": student["id"] + 50000,
+                "user_id": student["id"],
+                "course_id": self.id,
+                "type": "StudentEnrollment",
+                "enrollment_state": "active",
+                "created_at": "2020-01-02T00:00:00Z",
+                "updated_at": "2020-01-02T00:00:00Z",
+                "last_activity_at": "2020-02-01T12:00:00Z",
+            }
+            for student in self.students
+        ]
+
+    def content_json(self, item_type):
+        """Returns the quizzes or discussion topics behind the module items
+
+        Their assignment id is the item's content id, like the other items' ids.
+        """
+        return [
+            {"id": item["content_id"], "title": item["title"], "assignment_id": item["content_id"]}
+            for module in self.modules
+            for item in module["items"]
+            if item["type"] == item_type
+        ]
+
+    def submissions_json(self):
+        """Returns every student's submissions, consistent with student_modules_json
+
+        must_submit / min_score items a student completed have a submission (submitted
+        at the module's completed_at if the module is completed); a min_score item that
+        isn't completed has a submission below the minimum score.
+        """
+        # the progress is seeded, so the submissions are built once and reused by every page
+        if self._submissions is not None:
+            return self._submissions
+        submissions = []
+        for student in self.students:
+            for module in self.student_modules_json(student["id"]):
+                for item in module["items"]:
+                    requirement = item.get("completion_requirement", {})
+                    if requirement.get("type") not in ("must_submit", "min_score"):
+                        continue
+                    submitted_at = module["completed_at"] or "2020-01-15T10:00:00Z"
+                    submission = {
+                        "id": len(submissions) + 1,
+                        "assignment_id": item["content_id"],
+                        "user_id": student["id"],
+                        "workflow_state": "unsubmitted",
+                        "submitted_at": None,
+                        "graded_at": None,
+                        "score": None,
+                    }
+                    if requirement["type"] == "must_submit" and requirement["completed"]:
+                        submission.update(workflow_state="submitted", submitted_at=submitted_at)
+                    elif requirement["type"] == "min_score":
+                        score = requirement["min_score"] + (1 if requirement["completed"] else -1)
+                        submission.update(
+                            workflow_state="graded",
+                            submitted_at=submitted_at,
+                            graded_at=submitted_at,
+                            score=score,
+                        )
+                    submissions.append(submission)
+        self._submissions = submissions
+        return submissions
+
+    def student_modules_json(self, student_id):
+        """Returns the modules as seen by one student (with state and completion)
+
+        A module whose prerequisites aren't completed, or whose unlock_at is in the
+        future, is locked and none of its requirements are completed.
+        """
+        rng = random.Random(f"{self.seed}-{self.id}-{student_id}")
+        modules = []
+        states = {}
+        for module in self.modules:
+            locked = module["unlock_at"] == FUTURE_UNLOCK_AT or any(
+                states[mid] != "completed" for mid in module["prerequisite_module_ids"]
+            )
+            items = []
+            completed = 0
+            requirements = 0
+            for item in module["items"]:
+                item = dict(item)
+                if "completion_requirement" in item:
+                    requirement = dict(item["completion_requirement"])
+                    requirement["completed"] = rng.random() < 0.6 and not locked
+                    completed += requirement["completed"]
+                    requirements += 1
+                    item["completion_requirement"] = requirement
+                items.append(item)
+            module = dict(module, items=items)
+            if locked:
+                module["state"] = "locked"
+                module["completed_at"] = None
+            elif completed == requirements:
+                module["state"] = "completed"
+                day = 1 + rng.randrange(28)
+                module["completed_at"] = f"2020-02-{day:02d}T{rng.randrange(24):02d}:30:00Z"
+            else:
+                module["state"] = "started" if completed else "unlocked"
+                module["completed_at"] = None
+            states[module["id"]] = module["state"]
+            modules.append(module)
+        return modules
+
+
+class FakeCanvas:
+    """Threaded HTTP server serving one or more SyntheticCourse objects
+
+    Args:
+        courses (listof SyntheticCourse): the courses to serve
+        host (string): interface to bind to
+        port (int): port to bind to (0 picks a free port)
+        latency (float): seconds every response is delayed by
+        latency_jitter (float): up to this many more seconds, picked at random per request
+        rate_limit (float): size of the rate limit bucket (Canvas uses 700), None for no limit
+        leak_rate (float): units the bucket drains per second
+        request_cost (float): units a finished request costs
+        pre_flight_cost (float): units charged while a request is in flight
+    """
+
+    def __init__(
+        self,
+        courses,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        latency_jitter=0.0,
+        rate_limit=None,
+        leak_rate=10.0,
+        request_cost=1.0,
+        pre_flight_cost=50.0,
+    ):
+        self.courses = {course.id: course for course in courses}
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit = rate_limit
+        self.leak_rate = leak_rate
+        self.request_cost = request_cost
+        self.pre_flight_cost = pre_flight_cost
+        self.request_count = 0
+        self.throttled_count = 0
+        self._bucket = 0.0
+        self._drained_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Starts serving in a background thread and returns the base url"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def admit(self):
+        """Charges the pre-flight cost of a request
+
+        Returns:
+            bool: False if the bucket is full and the request must be throttled
+        """
+        with self._lock:
+            self.request_count += 1
+            if self.rate_limit is None:
+                return True
+            self._drain()
+            if self._bucket + self.pre_flight_cost > self.rate_limit:
+                self.throttled_count += 1
+                return False
+            self._bucket += self.pre_flight_cost
+            return True
+
+    def charge(self):
+        """Replaces the pre-flight cost of a finished request with its real cost
+
+        Returns:
+            dictionary: the rate limit headers of the response
+        """
+        if self.rate_limit is None:
+            return {}
+        with self._lock:
+            self._drain()
+            self._bucket += self.request_cost - self.pre_flight_cost
+            return {
+                "X-Request-Cost": f"{self.request_cost:.4f}",
+                "X-Rate-Limit-Remaining": f"{self.rate_limit - self._bucket:.4f}",
+            }
+
+    def delay(self):
+        """Sleeps for the configured latency"""
+        seconds = self.latency + random.uniform(0, self.latency_jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _drain(self):
+        now = time.monotonic()
+        self._bucket = max(0.0, self._bucket - (now - self._drained_at) * self.leak_rate)
+        self._drained_at = now
+
+    def route(self, path, query):
+        """Returns (status, json body) for a GET request"""
+        match = re.fullmatch(r"/api/v1/courses/(\d+)(/[\w/]+)?", path)
+        if not match or int(match.group(1)) not in self.courses:
+            return 404, {"errors": [{"message": "The specified resource does not exist."}]}
+
+        course = self.courses[int(match.group(1))]
+        endpoint = match.group(2)
+        if endpoint is None:
+            return 200, course.course_json()
+        if endpoint == "/modules":
+            if "student_id" in query:
+                return 200, course.student_modules_json(int(query["student_id"][0]))
+            return 200, course.modules
+        if endpoint in ("/users", "/search_users"):
+            return 200, course.students
+        if endpoint == "/enrollments":
+            return 200, course.enrollments_json()
+        if endpoint == "/students/submissions":
+            return 200, course.submissions_json()
+        if endpoint == "/quizzes":
+            return 200, course.content_json("Quiz")
+        if endpoint == "/discussion_topics":
+            return 200, course.content_json("Discussion")
+        return 404, {"errors": [{"message": "The specified resource does not exist."}]}
+
+
+class _Server(ThreadingHTTPServer):
+    # clients open up to MAX_ASYNC_REQUESTS connections at once
+    request_queue_size = 256
+
+
+def _make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if not fake.admit():
+                self._send(403, "403 Forbidden (Rate Limit Exceeded)", {})
+                return
+            fake.delay()
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            status, body = fake.route(url.path, query)
+
+            headers = {}
+            if status == 200 and isinstance(body, list):
+                body, headers["Link"] = self._paginate(url, query, body)
+            headers.update(fake.charge())
+            self._send(status, body, headers)
+
+        def _paginate(self, url, query, body):
+            per_page = min(int(query.get("per_page", ["10"])[0]), 100)
+            page = int(query.get("page", ["1"])[0])
+            last_page = max(1, -(-len(body) // per_page))
+            start = (page - 1) * per_page
+
+            def link(page_number, rel):
+                page_query = dict(query, page=[str(page_number)], per_page=[str(per_page)])
+                page_url = f"{fake.base_url}{url.path}?{urlencode(page_query, doseq=True)}"
+                return f'<{page_url}>; rel="{rel}"'
+
+            links = [link(page, "current")]
+            if page < last_page:
+                links.append(link(page + 1, "next"))
+            links += [link(1, "first"), link(last_page, "last")]
+            return body[start:start + per_page], ",".join(links)
+
+        def _send(self, status, body, headers):
+            if isinstance(body, str):
+                payload, content_type = body.encode(), "text/plain"
+            else:
+                payload, content_type = json.dumps(body).encode(), "application/json"
+            if status == 200:
+                headers["ETag"] = '"{}"'.format(hashlib.md5(payload).hexdigest())
+                if self.headers.get("If-None-Match") == headers["ETag"]:
+                    status, payload = 304, b""
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                if value:
+                    self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,73 @@
+"""
+Checks that bulk progress (src/bulk_progress.py) produces the same student_items_df as
+the per-student requests, against a local FakeCanvas, and compares how many requests
+each needs.
+
+The synthetic course only uses must_submit / min_score requirements (the ones bulk
+progress can derive), includes quiz and discussion items, and has locked modules
+(sequential prerequisites, and a last module that unlocks in the future).
+
+Usage:
+    python -m benchmarks.validate_bulk_progress [students ...]
+"""
+import sys
+import time
+import warnings
+
+from canvasapi import Canvas
+
+import settings
+from benchmarks.fake_canvas import FakeCanvas, SyntheticCourse
+from src.bulk_progress import get_student_module_status_bulk
+from src.canvas_helpers import (
+    get_modules,
+    get_student_items_status,
+    get_student_module_status,
+)
+
+
+def per_student(course, modules_df):
+    return get_student_module_status(course)
+
+
+def bulk(course, modules_df):
+    return get_student_module_status_bulk(course, modules_df)
+
+
+def main(sizes):
+    warnings.simplefilter("ignore")
+    settings.CACHE_RESPONSES = False
+    print(f"{'students':>8} {'method':>12} {'requests':>9} {'seconds':>8}")
+    for size in sizes:
+        synthetic = SyntheticCourse(
+            1,
+            students=size,
+            modules=5,
+            items=5,
+            requirement_types=["must_submit", "min_score"],
+            sequential=True,
+            future_modules=1,
+        )
+        server = FakeCanvas([synthetic])
+        canvas = Canvas(server.start(), "any-token")
+        try:
+            course = canvas.get_course(synthetic.id)
+            modules_df = get_modules(course)
+            outputs = []
+            for function in (per_student, bulk):
+                requests_before = server.request_count
+                start = time.perf_counter()
+                module_status = function(course, modules_df)
+                items_status = get_student_items_status(course, module_status)
+                seconds = time.perf_counter() - start
+                requests = server.request_count - requests_before
+                outputs.append(items_status.to_csv(index=False))
+                print(f"{size:>8} {function.__name__:>12} {requests:>9} {seconds:>8.2f}")
+        finally:
+            server.stop()
+        assert outputs[0] == outputs[1], "student_items_df differs"
+    print("student_items_df is identical")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [50, 500])
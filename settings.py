@@ -3,9 +3,79 @@ Declares several global variables that are used throughout the project.
 
 * The status dictionary gets updated to reflect the success/failed state of each course (and relevant errors)
 * ROOT_DIR is the filepath to the src folder
+* BASE_URL is the Canvas instance the script gets data from
+* CONFIRM_RUN asks for confirmation before running; set it to False for unattended runs
+* status_lock guards the status dictionary while several courses run at the same time
+* MAX_COURSE_WORKERS is the number of courses that are processed at the same time
+* MAX_WORKERS is the number of students whose module progress is requested from Canvas at the same time
+* CANVAS_CLIENT selects how Canvas is queried: "canvasapi" (default) or "async" (src/async_canvas.py, needs httpx)
+* MAX_ASYNC_REQUESTS is the size of the async client's connection pool
+* MAX_CONCURRENT_REQUESTS / INITIAL_CONCURRENT_REQUESTS bound the number of Canvas requests in flight;
+  the request scheduler adapts between 1 and MAX_CONCURRENT_REQUESTS based on Canvas' rate limit headers
+* RATE_LIMIT_LOW_WATERMARK is the X-Rate-Limit-Remaining value under which the scheduler backs off
+* MAX_RETRIES, BACKOFF_BASE and BACKOFF_CAP control retries of throttled (403) and 5xx responses
+* CACHE_RESPONSES keeps Canvas responses in cache/ (src/response_cache.py) and revalidates them with ETags
+* CACHE_TTL is how many seconds a cached response is used without asking Canvas (progress is always revalidated)
+* CACHE_MAX_MB / CACHE_MEMORY_ENTRIES bound the size of the cache on disk and in memory
+* OUTPUT_FORMAT is the format of the data tables: "csv" (default) or "parquet" (src/output_formats.py, needs pyarrow)
+* OUTPUT_SCHEMA is the layout of the Tableau data: "flat" (default, module_data) or "star" (a fact table and
+  dimension tables, src/star_schema.py)
+* HYPER_EXTRACT also writes data/Tableau/module_progress.hyper (src/hyper_extract.py, needs tableauhyperapi)
+* PROGRESS_MODE is how student progress is fetched: "per_student" (default, one request per student) or
+  "bulk" (derived from course-wide submissions, src/bulk_progress.py); PROGRESS_MODE_BY_COURSE overrides it
+  per course id
+* INCREMENTAL only refetches students whose enrollment activity changed since the last run (src/incremental.py)
+* INCREMENTAL_MAX_AGE_DAYS is how often an incremental run still refetches every student of a course
+* REFRESH_MINUTES is how often the daemon mode (--daemon, src/daemon.py) refreshes a course;
+  REFRESH_MINUTES_BY_COURSE overrides it per course id
+* STUDENT_CHUNK_SIZE processes the students of a per-student course that many at a time, so memory stays
+  bounded for very large courses (src/chunked.py); None (default) processes a course at once
+* CHANGE_FEED writes data/Tableau/changes.csv with the student items whose progress changed since the last run
+  (src/change_feed.py)
+* ARCHIVE_MODE is how data/Tableau is archived after a run: "dedup" (default, content addressed chunks and a
+  manifest per run, src/archive.py) or "zip" (a zip file per run)
+* ARCHIVE_KEEP_RUNS, ARCHIVE_KEEP_DAYS remove archived runs beyond that many / older than that (None keeps them)
+* CHECKPOINT saves every run's progress in checkpoint/ as it arrives, so an interrupted run can be
+  continued with --resume (src/checkpoint.py)
+* REQUEST_TRACE writes every Canvas request (url, status, latency, size) to a JSON lines file in status_log/
+  (src/instrumentation.py)
 
 """
 import os
+import threading
 
 status = {}
+status_lock = threading.Lock()
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_URL = "https://canvas.ubc.ca"
+CONFIRM_RUN = True
+MAX_COURSE_WORKERS = 4
+MAX_WORKERS = 8
+CANVAS_CLIENT = "canvasapi"
+MAX_ASYNC_REQUESTS = 100
+MAX_CONCURRENT_REQUESTS = 100
+INITIAL_CONCURRENT_REQUESTS = 10
+RATE_LIMIT_LOW_WATERMARK = 150
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30
+CACHE_RESPONSES = True
+CACHE_TTL = 3600
+CACHE_MAX_MB = 500
+CACHE_MEMORY_ENTRIES = 1000
+OUTPUT_FORMAT = "csv"
+OUTPUT_SCHEMA = "flat"
+HYPER_EXTRACT = False
+PROGRESS_MODE = "per_student"
+PROGRESS_MODE_BY_COURSE = {}
+INCREMENTAL = False
+INCREMENTAL_MAX_AGE_DAYS = 7
+REFRESH_MINUTES = 60
+REFRESH_MINUTES_BY_COURSE = {}
+STUDENT_CHUNK_SIZE = None
+CHANGE_FEED = False
+ARCHIVE_MODE = "dedup"
+ARCHIVE_KEEP_RUNS = None
+ARCHIVE_KEEP_DAYS = None
+CHECKPOINT = True
+REQUEST_TRACE = False
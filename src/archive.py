@@ -0,0 +1,462 @@
+"""
+Deduplicated archive of the Tableau folder (settings.ARCHIVE_MODE = "dedup").
+
+Zipping all of data/Tableau after every run compresses hundreds of MB that are mostly
+the same as last time. Instead, every file of the folder is cut into chunks that are
+stored once, by content:
+
+    * archive/objects/<ab>/<sha256>: a zlib compressed chunk, named by the SHA-256 of
+      its contents; a chunk that is already stored (EX. the rows of a course that
+      didn't change) is neither compressed nor written again
+    * archive/manifests/<run>.json: the files of a run (EX. 2020-02-01--12-30-00), each
+      with its size, SHA-256 and the chunks it is made of
+
+Text tables are cut where their course_id changes, so each course's rows are their own
+chunks, and also inside a course at lines picked by their content (so an insertion
+only changes the chunks around it); other files are cut into fixed size blocks. New
+chunks are hashed and compressed by settings.MAX_WORKERS threads.
+
+After every archive the retention policy removes old runs (settings.ARCHIVE_KEEP_RUNS,
+settings.ARCHIVE_KEEP_DAYS) and the chunks no remaining run uses. The newest run is
+always kept. Restore a run's Tableau folder with
+python update_module_progress.py --restore <run>.
+"""
+import collections
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import settings
+
+RUN_FORMAT = "%Y-%m-%d--%H-%M-%S"
+# content defined cuts: after a line whose hash % CUT_MODULUS == 0, once a chunk has
+# MIN_CHUNK_BYTES; always before MAX_CHUNK_BYTES
+MIN_CHUNK_BYTES = 1 << 20
+MAX_CHUNK_BYTES = 8 << 20
+CUT_MODULUS = 4096
+BLOCK_BYTES = 4 << 20
+# text tables are scanned this many bytes at a time
+SCAN_BYTES = 1 << 20
+TEXT_SUFFIXES = {".csv"}
+
+
+def archive_directory(tableau_path, run=None):
+    """Archives every file of the Tableau folder as a new run, then applies retention
+
+    Args:
+        tableau_path (Path): the folder to archive
+        run (string): the run's name (defaults to the current time, EX.
+                      2020-02-01--12-30-00)
+
+    Returns:
+        dictionary: the run's manifest
+    """
+    run = run or datetime.datetime.now().strftime(RUN_FORMAT)
+    store = ChunkStore(_archive_path())
+    manifest = {"run": run, "files": []}
+    for path in sorted(Path(tableau_path).iterdir()):
+        if path.is_file() and not path.name.endswith(".partial"):
+            manifest["files"].append(store.add_file(path))
+    manifest["new_chunks"] = store.new_chunks
+    manifest["new_bytes"] = store.new_bytes
+
+    manifests_path = _archive_path() / "manifests"
+    os.makedirs(manifests_path, exist_ok=True)
+    partial = manifests_path / f"{run}.json.partial"
+    with open(partial, "w") as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(partial, manifests_path / f"{run}.json")
+
+    apply_retention()
+    return manifest
+
+
+def restore(run, destination=None):
+    """Writes the files of an archived run back (each replaced in one step)
+
+    Files of the destination that aren't part of the run are removed, so it holds the
+    run's bundle exactly.
+
+    Args:
+        run (string): the run's name (a manifest in archive/manifests)
+        destination (Path): where to write them (defaults to data/Tableau)
+
+    Raises:
+        FileNotFoundError: if there is no such run
+        ValueError: if a restored file doesn't match its checksum
+    """
+    destination = Path(destination or f"{settings.ROOT_DIR}/data/Tableau")
+    manifest_path = _archive_path() / "manifests" / f"{run}.json"
+    zip_path = _archive_path() / f"{run}.zip"
+    if not manifest_path.exists() and zip_path.exists():
+        return _restore_zip(zip_path, destination)
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"No archived run named {run}, see {_archive_path()}")
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+
+    os.makedirs(destination, exist_ok=True)
+    store = ChunkStore(_archive_path())
+    for entry in manifest["files"]:
+        path = destination / entry["name"]
+        partial = path.with_name(path.name + ".partial")
+        digest = hashlib.sha256()
+        with open(partial, "wb") as file:
+            for chunk in store.read(entry["chunks"]):
+                digest.update(chunk)
+                file.write(chunk)
+        if digest.hexdigest() != entry["sha256"]:
+            partial.unlink()
+            raise ValueError(f"Restored {entry['name']} doesn't match its checksum")
+        os.replace(partial, path)
+
+    _remove_others(destination, {entry["name"] for entry in manifest["files"]})
+    return manifest
+
+
+def _restore_zip(zip_path, destination):
+    """Restores a run archived as a zip (ARCHIVE_MODE = "zip", or before the manifests)"""
+    os.makedirs(destination, exist_ok=True)
+    with zipfile.ZipFile(zip_path) as archive:
+        names = [name for name in archive.namelist() if not name.endswith("/")]
+        for name in names:
+            path = destination / name
+            partial = path.with_name(path.name + ".partial")
+            with archive.open(name) as src, open(partial, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(partial, path)
+    _remove_others(destination, set(names))
+    return {"run": zip_path.stem, "files": [{"name": name} for name in names]}
+
+
+def _remove_others(destination, names):
+    for path in destination.iterdir():
+        if path.is_file() and path.name not in names:
+            path.unlink()
+
+
+def list_runs():
+    """Returns the names of the archived runs (zips and manifests), oldest first"""
+    archive_path = _archive_path()
+    runs = {path.stem for path in archive_path.glob("*.zip")}
+    runs.update(path.stem for path in archive_path.glob("manifests/*.json"))
+    return sorted(runs)
+
+
+def apply_retention(now=None):
+    """Removes the runs the retention settings don't keep, and the unused chunks
+
+    A run is removed when it isn't one of the newest settings.ARCHIVE_KEEP_RUNS, or is
+    older than settings.ARCHIVE_KEEP_DAYS (None keeps every run). The newest run is
+    always kept.
+
+    Returns:
+        listof string: the removed runs
+    """
+    now = now or datetime.datetime.now()
+    runs = list_runs()
+    removed = []
+    for position, run in enumerate(reversed(runs)):
+        if position == 0:
+            continue
+        too_many = (
+            settings.ARCHIVE_KEEP_RUNS is not None
+            and position >= settings.ARCHIVE_KEEP_RUNS
+        )
+        too_old = settings.ARCHIVE_KEEP_DAYS is not None and _run_time(
+            run
+        ) < now - datetime.timedelta(days=settings.ARCHIVE_KEEP_DAYS)
+        if too_many or too_old:
+            (_archive_path() / f"{run}.zip").unlink(missing_ok=True)
+            (_archive_path() / "manifests" / f"{run}.json").unlink(missing_ok=True)
+            removed.append(run)
+    if removed:
+        ChunkStore(_archive_path()).remove_unused()
+    return removed
+
+
+class ChunkStore:
+    """Chunks stored by the SHA-256 of their contents under archive/objects
+
+    Args:
+        archive_path (Path): the archive folder
+    """
+
+    def __init__(self, archive_path):
+        self.archive_path = Path(archive_path)
+        self.objects_path = self.archive_path / "objects"
+        self.new_chunks = 0
+        self.new_bytes = 0
+        self._adding = set()
+        self._lock = threading.Lock()
+
+    def add_file(self, path):
+        """Stores the chunks of a file that aren't stored yet
+
+        Returns:
+            dictionary: the file's manifest entry (name, size, sha256, chunks)
+        """
+        digest = hashlib.sha256()
+        size = 0
+        chunks = []
+        # a few chunks per worker in flight, so a large file isn't held in memory
+        pending = collections.deque()
+        with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
+            for chunk in split_file(path):
+                digest.update(chunk)
+                size += len(chunk)
+                pending.append(executor.submit(self._add, chunk))
+                if len(pending) >= 2 * settings.MAX_WORKERS:
+                    chunks.append(pending.popleft().result())
+            chunks.extend(future.result() for future in pending)
+        return {
+            "name": path.name,
+            "size": size,
+            "sha256": digest.hexdigest(),
+            "chunks": chunks,
+        }
+
+    def read(self, chunks):
+        """Yields the contents of chunks, in order"""
+        for name in chunks:
+            with open(self._path(name), "rb") as file:
+                yield zlib.decompress(file.read())
+
+    def remove_unused(self):
+        """Deletes the chunks no manifest refers to"""
+        used = set()
+        for manifest_path in self.archive_path.glob("manifests/*.json"):
+            with open(manifest_path) as file:
+                for entry in json.load(file)["files"]:
+                    used.update(entry["chunks"])
+        for path in self.objects_path.glob("*/*"):
+            if path.name not in used:
+                path.unlink()
+
+    def _add(self, chunk):
+        """Stores a chunk (in a worker thread; hashing and zlib release the GIL)"""
+        name = hashlib.sha256(chunk).hexdigest()
+        path = self._path(name)
+        with self._lock:
+            if path.exists() or name in self._adding:
+                return name
+            self._adding.add(name)
+            self.new_chunks += 1
+            self.new_bytes += len(chunk)
+        os.makedirs(path.parent, exist_ok=True)
+        partial = path.with_name(f"{name}.{os.getpid()}.partial")
+        with open(partial, "wb") as file:
+            file.write(zlib.compress(chunk, 6))
+        os.replace(partial, path)
+        return name
+
+    def _path(self, name):
+        return self.objects_path / name[:2] / name
+
+
+def split_file(path):
+    """Yields the chunks of a file (see the module docstring)"""
+    path = Path(path)
+    with open(path, "rb") as file:
+        if path.suffix in TEXT_SUFFIXES:
+            yield from _split_text(file)
+            return
+        while True:
+            block = file.read(BLOCK_BYTES)
+            if not block:
+                return
+            yield block
+
+
+def _split_text(file):
+    """Yields the chunks of a text table, cut at lines where its course_id changes and
+    at content defined lines
+
+    The file is scanned a block of whole lines at a time; _scan finds the lines to cut
+    at with numpy, so Python only loops over the cuts.
+    """
+    header = file.readline()
+    columns = header.rstrip(b"\r\n").split(b",")
+    # course_id is only read when nothing before it can hold a comma (EX. in module_data
+    # it comes after completed_at); a line continuing a quoted value gives a wrong key,
+    # which only adds a cut
+    key_column = None
+    if b"course_id" in columns[:2]:
+        key_column = columns.index(b"course_id")
+
+    pieces = [header]
+    size = len(header)
+    key = None
+    rest = b""
+    while True:
+        data = file.read(SCAN_BYTES)
+        block = rest + data
+        rest = b""
+        if data:
+            end = block.rfind(b"\n") + 1
+            block, rest = block[:end], block[end:]
+        if block:
+            starts, ends, marks, keys = _scan(block, key_column)
+            changes = np.zeros(len(ends), dtype=bool)
+            if keys is not None:
+                changes[1:] = keys[1:] != keys[:-1]
+                changes[0] = key is not None and keys[0] != key
+                key = keys[-1]
+
+            cuts = _Cuts(ends, size)
+            for line in np.flatnonzero(changes | marks):
+                if changes[line]:
+                    cuts.add(starts[line])
+                if marks[line] and cuts.size_at(ends[line]) >= MIN_CHUNK_BYTES:
+                    cuts.add(ends[line])
+            cuts.limit(len(block))
+
+            start = 0
+            for cut in cuts.offsets:
+                pieces.append(block[start:cut])
+                yield b"".join(pieces)
+                pieces = []
+                start = cut
+            pieces.append(block[start:])
+            size = cuts.size_at(len(block))
+        if not data:
+            break
+    if size:
+        yield b"".join(pieces)
+
+
+class _Cuts:
+    """The offsets a block is cut at, keeping every chunk under MAX_CHUNK_BYTES
+
+    Args:
+        ends (array of int): the offset after each line of the block
+        pending (int): bytes of the current chunk before the block
+    """
+
+    def __init__(self, ends, pending):
+        self.ends = ends
+        self.offsets = []
+        self.start = 0
+        self.pending = pending
+
+    def size_at(self, offset):
+        """Returns the size the current chunk would have if it was cut at offset"""
+        return self.pending + offset - self.start
+
+    def add(self, offset):
+        """Cuts at offset (a line end), after any cut needed to stay under the maximum"""
+        self.limit(offset)
+        if self.size_at(offset) > 0:
+            self.offsets.append(int(offset))
+            self.start = offset
+            self.pending = 0
+
+    def limit(self, offset):
+        """Cuts at line ends so no chunk up to offset exceeds MAX_CHUNK_BYTES"""
+        while self.size_at(offset) > MAX_CHUNK_BYTES:
+            last = self.start + MAX_CHUNK_BYTES - self.pending
+            line = np.searchsorted(self.ends, last, side="right") - 1
+            if line < 0 or self.ends[line] <= self.start:
+                # a single line longer than the maximum
+                line = np.searchsorted(self.ends, self.start, side="right")
+            self.offsets.append(int(self.ends[line]))
+            self.start = self.ends[line]
+            self.pending = 0
+
+
+def _scan(block, key_column):
+    """Returns the lines of a block of whole lines, with what to cut them at
+
+    Returns:
+        array of int: the offset of each line
+        array of int: the offset after each line
+        array of bool: the content defined cut points (hash % CUT_MODULUS == 0)
+        array of uint32: a hash of each line's course_id (None without key_column)
+    """
+    data = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(data == ord("\n")) + 1
+    if len(ends) == 0 or ends[-1] != len(data):
+        ends = np.append(ends, len(data))
+    starts = np.concatenate(([0], ends[:-1]))
+    prefix = _prefix_hashes(data)
+    marks = (_range_hashes(prefix, starts, ends) >> np.uint32(16)) % CUT_MODULUS == 0
+
+    keys = None
+    if key_column is not None:
+        commas = np.append(np.flatnonzero(data == ord(",")), len(data))
+        field_starts = starts
+        if key_column == 1:
+            field_starts = commas[np.searchsorted(commas, starts)] + 1
+        field_ends = commas[np.searchsorted(commas, field_starts)]
+        # a line without enough commas: its key is what's left of it
+        field_ends = np.minimum(field_ends, ends)
+        field_starts = np.minimum(field_starts, field_ends)
+        keys = _range_hashes(prefix, field_starts, field_ends)
+    return starts, ends, marks, keys
+
+
+# polynomial hashes of byte ranges, for a whole block at once: numpy's uint32 arithmetic
+# wraps around, so everything is mod 2**32 (the base is odd, so it has an inverse)
+_HASH_BASE = 0x01000193
+_HASH_BASE_INVERSE = pow(_HASH_BASE, -1, 2**32)
+
+
+# (base**(j + 1), base**-(j + 1)) for every j of the longest block seen, replaced as a
+# pair under a lock, since files may be split in several threads at once
+_powers = (np.ones(0, dtype=np.uint32), np.ones(0, dtype=np.uint32))
+_powers_lock = threading.Lock()
+
+
+def _prefix_hashes(data):
+    """Returns (prefix sums of data[j] * base**(j + 1), base**-(j + 1) for every j)
+
+    The powers are computed once for the longest block seen.
+    """
+    global _powers
+    with _powers_lock:
+        powers, inverses = _powers
+        if len(powers) < len(data):
+            powers = np.full(len(data), _HASH_BASE, dtype=np.uint32).cumprod(
+                dtype=np.uint32
+            )
+            inverses = np.full(len(data), _HASH_BASE_INVERSE, dtype=np.uint32).cumprod(
+                dtype=np.uint32
+            )
+            _powers = (powers, inverses)
+    sums = np.zeros(len(data) + 1, dtype=np.uint32)
+    values = data.astype(np.uint32)
+    values += np.uint32(1)
+    values *= powers[: len(data)]
+    values.cumsum(dtype=np.uint32, out=sums[1:])
+    return sums, inverses
+
+
+def _range_hashes(prefix, starts, ends):
+    """Returns the hash of data[start:end] for every (start, end); equal bytes hash
+    the same wherever they are"""
+    sums, inverses = prefix
+    hashes = sums[ends] - sums[starts]
+    # a range starting at 0 needs no shift (inverses[j] is base**-(j + 1))
+    shifted = starts > 0
+    hashes[shifted] *= inverses[starts[shifted] - 1]
+    return hashes
+
+
+def _run_time(run):
+    try:
+        return datetime.datetime.strptime(run, RUN_FORMAT)
+    except ValueError:
+        return datetime.datetime.max
+
+
+def _archive_path():
+    return Path(f"{settings.ROOT_DIR}/archive")
@@ -0,0 +1,328 @@
+"""
+Asynchronous Canvas LMS REST API client for the bulk paginated endpoints.
+
+Used by canvas_helpers instead of canvasapi when settings.CANVAS_CLIENT is "async".
+Every request of a run is multiplexed on a single event loop (running in a background
+thread) through one pooled httpx connection set, so the synchronous helpers can hand it
+thousands of requests at once and simply wait for the results. Requests are throttled
+and retried by the run-wide scheduler in request_scheduler.py, and answered from
+response_cache.py when settings.CACHE_RESPONSES is on.
+
+Modules, students and enrollments are returned as the records of records.py, other
+responses are wrapped in SimpleNamespace objects, so they can all be read with
+RecordBuilder exactly like canvasapi objects. Error responses raise the same
+canvasapi exceptions (Unauthorized, ResourceDoesNotExist...) canvasapi would.
+
+httpx is only required when this client is enabled:
+https://www.python-httpx.org/
+"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from canvasapi.exceptions import (
+    BadRequest,
+    CanvasException,
+    Conflict,
+    Forbidden,
+    InvalidAccessToken,
+    RateLimitExceeded,
+    ResourceDoesNotExist,
+    Unauthorized,
+    UnprocessableEntity,
+)
+
+import settings
+from . import instrumentation
+from .records import Enrollment, Module, Student
+from .request_scheduler import scheduler
+from .response_cache import cache
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - only needed for the async client
+    httpx = None
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client_for(course):
+    """Returns the shared async client for the Canvas instance a course belongs to
+
+    Args:
+        course (canvasapi.course.Course): The course obj.
+               from Canvas Python API wrapper
+
+    Returns:
+        AsyncCanvasClient: one client per base url and token for the whole run
+    """
+    requester = course._requester
+    key = (requester.original_url, requester.access_token)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = AsyncCanvasClient(*key)
+        return _clients[key]
+
+
+def close_all():
+    """Closes every client created by client_for (and its connection pool)"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+class AsyncCanvasClient:
+    """Minimal Canvas client that follows `Link: next` pagination asynchronously
+
+    Args:
+        base_url (string): Canvas instance url, EX. https://canvas.ubc.ca
+        token (string): Canvas API token
+        max_requests (int): size of the connection pool (how many requests may be in flight
+                            is decided by request_scheduler.scheduler)
+    """
+
+    def __init__(self, base_url, token, max_requests=None):
+        if httpx is None:
+            raise RuntimeError(
+                'The async Canvas client requires httpx. Install it or set CANVAS_CLIENT = "canvasapi"'
+            )
+        self.base_url = base_url.rstrip("/") + "/api/v1/"
+        self.token = token
+        self.max_requests = max_requests or settings.MAX_ASYNC_REQUESTS
+        self._client = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def run(self, coro):
+        """Runs a coroutine on the client's event loop and waits for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self):
+        """Closes the connection pool and stops the event loop"""
+        if self._client is not None:
+            self.run(self._client.aclose())
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def get_modules(self, course_id, student_id=None):
+        """Returns every module (with items) of a course, optionally as seen by one student"""
+        return self.run(self._get_modules(course_id, student_id))
+
+    def get_students(self, course_id):
+        """Returns every student user of a course"""
+        return self.run(
+            self.get_paginated(
+                f"courses/{course_id}/users",
+                {
+                    "include[]": ["test_student", "email"],
+                    "enrollment_type[]": ["student"],
+                    "per_page": 50,
+                },
+                record=Student,
+            )
+        )
+
+    def get_enrollments(self, course_id):
+        """Returns every student enrollment of a course"""
+        return self.run(
+            self.get_paginated(
+                f"courses/{course_id}/enrollments",
+                {"enrollment_type[]": ["student"], "per_page": 50},
+                record=Enrollment,
+            )
+        )
+
+    def get_course_list(self, course_id, endpoint):
+        """Returns every element of a course-wide list endpoint
+
+        Args:
+            course_id (int): the course id
+            endpoint (string): "quizzes", "discussion_topics" or "students/submissions"
+        """
+        params = {"per_page": 100}
+        if endpoint == "students/submissions":
+            params["student_ids[]"] = ["all"]
+        return self.run(self.get_paginated(f"courses/{course_id}/{endpoint}", params))
+
+    def get_student_modules(self, course_id, student_ids, on_done=None, on_result=None):
+        """Returns the modules of a course as seen by each of the given students
+
+        All students are requested at once; the request scheduler decides how many
+        are in flight.
+
+        Args:
+            course_id (int): the course id
+            student_ids (list): student ids to request
+            on_done (function): called once (with no arguments) per finished student
+            on_result (function): called with (student id, modules) as soon as a
+                                  student's modules have arrived (in a worker
+                                  thread, so it may block, EX. to write a checkpoint)
+
+        Returns:
+            list: one entry per student id, in the same order. Each entry is either
+                  the student's list of modules or the Exception that was raised
+        """
+
+        async def fetch(sid):
+            try:
+                modules = await self._get_modules(course_id, sid)
+                if on_result is not None:
+                    # off the event loop, so the other students' requests keep going
+                    await asyncio.to_thread(on_result, sid, modules)
+                return modules
+            finally:
+                if on_done is not None:
+                    on_done()
+
+        async def fetch_all():
+            return await asyncio.gather(
+                *[fetch(sid) for sid in student_ids], return_exceptions=True
+            )
+
+        return self.run(fetch_all())
+
+    async def _get_modules(self, course_id, student_id=None):
+        params = {"include[]": ["items"], "per_page": 50}
+        if student_id is not None:
+            params["student_id"] = student_id
+        modules = await self.get_paginated(
+            f"courses/{course_id}/modules", params, record=Module
+        )
+        # canvasapi adds the course id to every module it returns, so do the same
+        for module in modules:
+            module.course_id = course_id
+        return modules
+
+    async def get_paginated(self, endpoint, params=None, record=None):
+        """Requests every page of a paginated endpoint
+
+        Args:
+            endpoint (string): path relative to /api/v1/, EX. courses/1/modules
+            params (dict): query parameters of the first request
+            record (class): optional, a records.py class to build the elements with
+
+        Returns:
+            listof SimpleNamespace (or record): one object per element of every page
+
+        Raises:
+            CanvasException: the canvasapi exception for an error response, EX.
+                             Unauthorized or ResourceDoesNotExist
+        """
+        make = record.from_json if record is not None else _namespace
+        client = self._get_client()
+        url = self.base_url + endpoint
+        results = []
+        while url:
+            response = await self._get(client, url, params)
+            _raise_for_status(response)
+            results.extend(map(make, response.json()))
+            url = response.links.get("next", {}).get("url")
+            # the next link already carries the query string
+            params = None
+        return results
+
+    async def _get(self, client, url, params):
+        if not settings.CACHE_RESPONSES:
+            return await self._send(client, url, params)
+
+        full_url = str(httpx.URL(url, params=params))
+        key = cache.key("Bearer " + self.token, full_url)
+        entry, fresh = cache.lookup(key, full_url)
+        if fresh:
+            return _cached_response(full_url, entry)
+
+        response = await self._send(
+            client, url, params, headers=cache.conditional_headers(entry)
+        )
+        if response.status_code == 304 and entry is not None:
+            return _cached_response(full_url, cache.revalidated(key, entry))
+        if response.status_code == 200:
+            cache.store(key, full_url, response.headers, response.content)
+        return response
+
+    async def _send(self, client, url, params, headers=None):
+        # every request goes through the shared rate-limit-aware scheduler
+        attempt = 0
+        while True:
+            async with scheduler.async_request_slot():
+                start = time.perf_counter()
+                response = await client.get(url, params=params, headers=headers)
+                seconds = time.perf_counter() - start
+            instrumentation.record_request(
+                str(response.request.url),
+                response.status_code,
+                seconds,
+                len(response.content),
+                attempt,
+            )
+            delay = scheduler.handle(
+                response.status_code, response.headers, lambda: response.text, attempt
+            )
+            if delay is None:
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _get_client(self):
+        # created lazily so it belongs to the client's event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"Authorization": "Bearer " + self.token},
+                limits=httpx.Limits(
+                    max_connections=self.max_requests,
+                    max_keepalive_connections=self.max_requests,
+                ),
+                timeout=60,
+            )
+        return self._client
+
+
+def _raise_for_status(response):
+    """Raises the exception canvasapi's Requester raises for an error response"""
+    status = response.status_code
+    if status == 400:
+        raise BadRequest(response.text)
+    if status == 401:
+        try:
+            message = response.json()
+        except ValueError:
+            message = response.text
+        if "WWW-Authenticate" in response.headers:
+            raise InvalidAccessToken(message)
+        raise Unauthorized(message)
+    if status == 403:
+        raise Forbidden(response.text)
+    if status == 404:
+        raise ResourceDoesNotExist("Not Found")
+    if status == 409:
+        raise Conflict(response.text)
+    if status == 422:
+        raise UnprocessableEntity(response.text)
+    if status == 429:
+        raise RateLimitExceeded(
+            "Rate Limit Exceeded. X-Rate-Limit-Remaining: {}".format(
+                response.headers.get("X-Rate-Limit-Remaining", "Unknown")
+            )
+        )
+    if status > 400:
+        raise CanvasException("Encountered an error: status code {}".format(status))
+
+
+def _namespace(element):
+    return SimpleNamespace(**element)
+
+
+def _cached_response(url, entry):
+    """Builds an httpx Response from a response_cache entry"""
+    return httpx.Response(
+        200,
+        headers=entry["headers"],
+        content=cache.body(entry),
+        request=httpx.Request("GET", url),
+    )
@@ -0,0 +1,262 @@
+"""
+Bulk progress: derives students' module progress from course-wide requests.
+
+The per-student path (get_student_module_status) makes one modules request per student.
+This mode instead requests every student's submissions at once (the multi-student
+submissions endpoint) and combines them with the course's module structure from
+get_modules, so the number of requests no longer grows with the number of students:
+https://canvas.instructure.com/doc/api/submissions.html#method.submissions_api.for_students
+
+It returns the same table as get_student_module_status, so get_student_items_status
+and everything after it work unchanged. Per student and module:
+
+    * must_submit is met once the item's assignment has been submitted (or graded)
+    * min_score is met once the submission's score reaches the item's min_score
+    * the module is "locked" while a prerequisite module isn't completed or its
+      unlock_at is in the future, "completed" when every requirement is met,
+      "started" when some are, "unlocked" otherwise
+    * completed_at is when the last requirement was met
+
+Only submission-based requirements can be derived this way; must_view,
+must_mark_done and must_contribute are only visible through the per-student request.
+supports_bulk_progress tells run_course whether a course can use this mode.
+"""
+import datetime
+from types import SimpleNamespace
+
+import pandas as pd
+
+import settings
+from . import async_canvas
+from .canvas_helpers import (
+    STUDENT_MODULE_ATTRS,
+    RecordBuilder,
+    _get_enrollments,
+    _get_students,
+)
+from .records import Module
+from .timestamps import parse_timestamps
+
+DERIVABLE_REQUIREMENTS = {"must_submit", "min_score"}
+# item types whose content_id isn't an assignment id
+ASSIGNMENT_LOOKUPS = {"Quiz", "Discussion"}
+
+
+def supports_bulk_progress(modules_df):
+    """Returns True if every completion requirement of a course can be derived from submissions
+
+    Args:
+        modules_df (DataFrame): the course's modules table (from get_modules)
+    """
+    return not _underivable_requirements(modules_df)
+
+
+def get_student_module_status_bulk(course, modules_df):
+    """Returns DataFrame with students' module progress, derived from submissions
+
+    Same columns and row order as get_student_module_status.
+
+    Args:
+        course (canvasapi.course.Course): The course obj.
+               from Canvas Python API wrapper
+        modules_df (DataFrame): the course's modules table (from get_modules)
+
+    Returns:
+        DataFrame: Table containing module progress data for each student.
+                   Each student has a single entry per module in specified course.
+
+    Raises:
+        KeyError: if the course uses requirements that can't be derived from submissions
+    """
+    underivable = _underivable_requirements(modules_df)
+    if underivable:
+        raise KeyError(
+            "Bulk progress can't derive requirement(s): " + ", ".join(sorted(underivable))
+        )
+
+    print("Getting Module Status for students (bulk) ...")
+    students_df = _get_students(course)
+    enrollments_df = _get_enrollments(course)
+    modules = modules_df.to_dict("records")
+    assignment_ids = _assignment_ids(course, modules)
+    submissions = _get_submissions(course)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    builder = RecordBuilder(STUDENT_MODULE_ATTRS)
+    for student in students_df.to_dict("records"):
+        student_submissions = submissions.get(str(student["id"]), {})
+        states = {}
+        for module in modules:
+            state, completed_at, items = _module_progress(
+                module, student_submissions, assignment_ids, states, now
+            )
+            states[module["module_id"]] = state
+            builder.append(
+                Module(
+                    id=module["module_id"],
+                    name=module["module_name"],
+                    position=module["module_position"],
+                    unlock_at=module["unlock_at"],
+                    require_sequential_progress=module["require_sequential_progress"],
+                    publish_final_grade=module["publish_final_grade"],
+                    prerequisite_module_ids=module["prerequisite_module_ids"],
+                    state=state,
+                    completed_at=completed_at,
+                    items_count=module["items_count"],
+                    items_url=module["items_url"],
+                    items=items,
+                    course_id=module["course_id"],
+                ),
+                student_id=str(student["id"]),
+                sis_user_id=student["sis_user_id"],
+                student_name=student["name"],
+                sortable_student_name=student["sortable_name"],
+            )
+    student_module_status = parse_timestamps(
+        builder.to_frame(), ["unlock_at", "completed_at"]
+    )
+
+    student_module_status = student_module_status.rename(
+        columns={
+            "id": "module_id",
+            "name": "module_name",
+            "position": "module_position",
+        }
+    )
+    return student_module_status.merge(
+        enrollments_df[["created_at", "user_id"]],
+        how="left",
+        left_on="student_id",
+        right_on="user_id",
+    )
+
+
+def _module_progress(module, submissions, assignment_ids, states, now):
+    """Returns (state, completed_at, items) of a module for one student
+
+    Args:
+        module (dict): a row of modules_df
+        submissions (dict): the student's submissions by assignment id
+        assignment_ids (dict): (item type, content id) -> assignment id
+        states (dict): module id -> state, for the modules before this one
+        now (datetime): the current time (UTC)
+    """
+    items = []
+    met_times = []
+    requirements = 0
+    for item in module["items"] or []:
+        item = dict(item)
+        requirement = item.get("completion_requirement")
+        if requirement:
+            requirements += 1
+            assignment_id = assignment_ids.get(
+                (item.get("type"), item.get("content_id")), item.get("content_id")
+            )
+            met, met_at = _requirement_met(requirement, submissions.get(assignment_id))
+            if met:
+                met_times.append(met_at)
+            item["completion_requirement"] = dict(requirement, completed=met)
+        items.append(item)
+
+    prerequisites = module["prerequisite_module_ids"] or []
+    unlock_at = _parse_time(module["unlock_at"])
+    if any(states.get(mid) != "completed" for mid in prerequisites) or (
+        unlock_at is not None and unlock_at > now
+    ):
+        return "locked", None, items
+    if len(met_times) == requirements:
+        times = [met_at for met_at in met_times if met_at is not None]
+        return "completed", max(times) if times else None, items
+    if met_times:
+        return "started", None, items
+    return "unlocked", None, items
+
+
+def _requirement_met(requirement, submission):
+    """Returns (met, when) for a requirement and the student's submission
+
+    when is an ISO time string (None if Canvas doesn't say)
+    """
+    if submission is None:
+        return False, None
+    submitted_at = getattr(submission, "submitted_at", None)
+    graded_at = getattr(submission, "graded_at", None)
+    if requirement["type"] == "must_submit":
+        met = submitted_at is not None or getattr(submission, "workflow_state", None) == "graded"
+        return met, submitted_at or graded_at
+
+    score = getattr(submission, "score", None)
+    met = score is not None and score >= float(requirement.get("min_score") or 0)
+    return met, graded_at or submitted_at
+
+
+def _underivable_requirements(modules_df):
+    types = set()
+    for items in modules_df["items"]:
+        for item in items or []:
+            requirement = item.get("completion_requirement")
+            if requirement:
+                types.add(requirement["type"])
+    return types - DERIVABLE_REQUIREMENTS
+
+
+def _assignment_ids(course, modules):
+    """Returns {(item type, content id): assignment id} for quiz and discussion items"""
+    needed = {
+        item.get("type")
+        for module in modules
+        for item in module["items"] or []
+        if item.get("completion_requirement") and item.get("type") in ASSIGNMENT_LOOKUPS
+    }
+    lookup = {}
+    if "Quiz" in needed:
+        for quiz in _get_course_list(course, "quizzes"):
+            lookup[("Quiz", quiz.id)] = getattr(quiz, "assignment_id", None)
+    if "Discussion" in needed:
+        for topic in _get_course_list(course, "discussion_topics"):
+            lookup[("Discussion", topic.id)] = getattr(topic, "assignment_id", None)
+    return lookup
+
+
+def _get_submissions(course):
+    """Returns {student id (string): {assignment id: submission}} for every student"""
+    submissions = {}
+    for submission in _get_course_list(course, "students/submissions"):
+        by_assignment = submissions.setdefault(str(submission.user_id), {})
+        by_assignment[submission.assignment_id] = submission
+    return submissions
+
+
+def _get_course_list(course, endpoint):
+    """Requests every page of a course-wide list endpoint
+
+    Elements are returned as SimpleNamespace objects, like the async client does:
+    building canvasapi objects would try to parse every string of every submission
+    as a date, which takes far longer than the requests themselves.
+    """
+    if settings.CANVAS_CLIENT == "async":
+        return async_canvas.client_for(course).get_course_list(course.id, endpoint)
+
+    params = [("per_page", 100)]
+    if endpoint == "students/submissions":
+        params.append(("student_ids[]", "all"))
+    requester = course._requester
+    response = requester.request(
+        "GET", f"courses/{course.id}/{endpoint}", _kwargs=params
+    )
+    results = []
+    while True:
+        results.extend(SimpleNamespace(**element) for element in response.json())
+        next_url = response.links.get("next", {}).get("url")
+        if not next_url:
+            return results
+        response = requester.request("GET", _url=next_url)
+
+
+def _parse_time(value):
+    if value is None or pd.isnull(value):
+        return None
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize("UTC")
+    return timestamp.tz_convert("UTC")
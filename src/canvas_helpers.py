@@ -4,40 +4,72 @@ Helper functions for get_module_progress.py
 ***
 All Canvas LMS REST API calls made using canvasapi python API wrapper:
 https://github.com/ucfopen/canvasapi
+(or through the async client in async_canvas.py when settings.CANVAS_CLIENT is "async")
 ***
 
 @authors: Marko Prodanovic, Alison Myers, Jeremy Hidjaja
 """
-from ast import literal_eval
 import datetime
-import re
 import os
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 import pandas as pd
 import settings
 from pathlib import Path
+from . import async_canvas
+from .flatten import flatten_items, flatten_student_items
+from .output_formats import FORMATS, TableWriter, write_table
+from .star_schema import StarWriter, remove_tables as remove_star_tables
+from .archive import apply_retention, archive_directory
+from .change_feed import ChangeFeed
+from .hyper_extract import HyperExtract
+from .records import Enrollment, Module, Student
+from .instrumentation import STATUS_COLUMNS, status_row
+from .timestamps import format_timestamp, parse_timestamps
+from .schema import ITEMS_SCHEMA, STUDENT_ITEMS_SCHEMA, apply_schema
+
+
+class RecordBuilder:
+    """Builds a DataFrame from Canvas objects one column at a time
+
+    Attribute values are appended to a list per column and the DataFrame is only
+    materialized once, in to_frame(), instead of building and concatenating a
+    DataFrame per request.
 
-
-def create_dict_from_object(theobj, list_of_attributes):
-    """given an object and list of attributes return a dictionary
     Args:
-        theobj (a Canvas object)
-        list_of_attributes (list of strings)
-    Returns:
-        mydict
+        attributes (list of strings): attributes to read from each object (missing
+                                      attributes become None)
     """
 
-    def get_attribute_if_available(theobj, attrname):
-        if hasattr(theobj, attrname):
-            return {attrname: getattr(theobj, attrname)}
-        else:
-            return {attrname: None}
+    def __init__(self, attributes):
+        self.attributes = list(attributes)
+        self.columns = {attrname: [] for attrname in self.attributes}
+        self.length = 0
+
+    def append(self, theobj, **constants):
+        """Adds a row for theobj
+
+        Keyword arguments become extra columns holding the same value for the row.
+        Once used, a keyword must be passed for every following row.
+        """
+        for attrname in self.attributes:
+            self.columns[attrname].append(getattr(theobj, attrname, None))
+        for name, value in constants.items():
+            self.columns.setdefault(name, [None] * self.length).append(value)
+        self.length += 1
 
-    mydict = {}
-    for i in list_of_attributes:
-        mydict.update(get_attribute_if_available(theobj, i))
-    return mydict
+    def extend(self, objs, **constants):
+        """Adds a row for every object in objs (see append)"""
+        for theobj in objs:
+            self.append(theobj, **constants)
+
+    def to_frame(self):
+        """Returns:
+            DataFrame: one row per appended object, one column per attribute
+        """
+        return pd.DataFrame(self.columns)
 
 
 def get_modules(course):
@@ -61,7 +93,10 @@ def get_modules(course):
 
     print("Getting Module Information ...")
     try:
-        modules = course.get_modules(include=["items"], per_page=50)
+        if settings.CANVAS_CLIENT == "async":
+            modules = async_canvas.client_for(course).get_modules(course.id)
+        else:
+            modules = course.get_modules(include=["items"], per_page=50)
         attrs = [
             "id",
             "name",
@@ -78,8 +113,9 @@ def get_modules(course):
             "course_id",
         ]
 
-        modules_dict = [create_dict_from_object(m, attrs) for m in modules]
-        modules_df = pd.DataFrame(modules_dict)
+        builder = RecordBuilder(attrs)
+        builder.extend(modules)
+        modules_df = parse_timestamps(builder.to_frame(), ["unlock_at"])
         modules_df = modules_df.rename(
             columns={
                 "id": "module_id",
@@ -113,17 +149,14 @@ def get_items(modules_df, cname):
     """
     print("Getting item information ...")
     try:
-        expanded_items = _list_to_df(
-            modules_df[["module_id", "module_name", "course_id", "items"]], "items"
-        )
-
-        items_df = _dict_to_cols(expanded_items, "items", "items_")
-
-        items_df = _dict_to_cols(
-            items_df.reset_index(drop=True),
+        items_df = flatten_items(
+            modules_df[["module_id", "module_name", "course_id", "items"]],
+            "items",
+            "items_",
             "items_completion_requirement",
             "items_completion_req_",
         )
+        apply_schema(items_df, ITEMS_SCHEMA)
     except KeyError:
         print('No items to expand ... skipping row ...')
         return None
@@ -134,7 +167,24 @@ def get_items(modules_df, cname):
         return items_df
 
 
-def get_student_module_status(course):
+STUDENT_MODULE_ATTRS = [
+    "id",
+    "name",
+    "position",
+    "unlock_at",
+    "require_sequential_progress",
+    "publish_final_grade",
+    "prerequisite_module_ids",
+    "state",
+    "completed_at",
+    "items_count",
+    "items_url",
+    "items",
+    "course_id",
+]
+
+
+def get_student_module_status(course, select_students=None, checkpoint=None):
     """Returns DataFrame with students' module progress
 
     Given a course object, gets students registered in that course (API Request)
@@ -144,9 +194,16 @@ def get_student_module_status(course):
     Args:
         course (canvasapi.course.Course): The course obj.
                from Canvas Python API wrapper
+        select_students (function): optional, given the students and enrollments
+               DataFrames returns the ids (strings) of the students to request;
+               other students are left out of the table (used by incremental sync)
+        checkpoint (CourseCheckpoint): optional, students already in it aren't requested
+               again and every fetched student is added to it (used by --resume)
 
     Returns:
-        DataFrame: Table containing module progress data for each student.
+        None: if select_students selected no student, otherwise
+        DataFrame: Table containing module progress data for each student
+                   (with select_students, empty if none of them could be fetched).
                    Each student has a single entry per module in specified
                    course. EX.
                    row 0: student0, module0
@@ -158,48 +215,107 @@ def get_student_module_status(course):
     students_df = _get_students(course)
     enrollments_df = _get_enrollments(course)
 
+    if select_students is not None:
+        selected = select_students(students_df, enrollments_df)
+        students_df = students_df[students_df["id"].astype(str).isin(selected)]
+        if students_df.empty:
+            return None
+
     print("Getting student module info for " + course.name)
-    student_module_status = pd.DataFrame()
-
-    num_rows = len(list(students_df.iterrows()))
-    with tqdm(total=num_rows) as pbar:
-        for i, row in students_df.iterrows():
-            pbar.update(1)
-            sid = row["id"]
-            student_data = course.get_modules(
-                student_id=sid, include=["items"], per_page=50
+    student_module_status, failures = get_student_module_status_for(
+        course, students_df, enrollments_df, checkpoint=checkpoint
+    )
+    if failures:
+        _record_student_failures(course, failures)
+        # incremental sync keeps the previous rows of the students it couldn't refetch
+        if len(failures) == len(students_df) and select_students is None:
+            raise KeyError(
+                "Unable to get module progress for any student in course: "
+                + course.name
             )
-            attrs = [
-                "id",
-                "name",
-                "position",
-                "unlock_at",
-                "require_sequential_progress",
-                "publish_final_grade",
-                "prerequisite_module_ids",
-                "state",
-                "completed_at",
-                "items_count",
-                "items_url",
-                "items",
-                "course_id",
-            ]
+    return student_module_status
 
-            # make student data into dictionary
-            student_rows_dict = [
-                create_dict_from_object(m, attrs) for m in student_data
-            ]
 
-            # make dictionary into df
-            student_rows = pd.DataFrame(student_rows_dict)
+def get_student_module_status_for(course, students_df, enrollments_df, checkpoint=None):
+    """Returns the module progress of the given students (see get_student_module_status)
 
-            student_rows["student_id"] = str(sid)
-            student_rows["sis_user_id"] = row["sis_user_id"]
-            student_rows["student_name"] = row["name"]
-            student_rows["sortable_student_name"] = row["sortable_name"]
-            student_module_status = pd.concat([
-                student_module_status,
-                student_rows], ignore_index=True, sort=False)
+    Args:
+        course (canvasapi.course.Course): The course obj.
+               from Canvas Python API wrapper
+        students_df (DataFrame): the students to request (rows of _get_students)
+        enrollments_df (DataFrame): the course's enrollments (from _get_enrollments)
+        checkpoint (CourseCheckpoint): optional, see get_student_module_status
+
+    Returns:
+        DataFrame: module progress of every student that could be fetched, in
+                   students_df order (empty if there is none)
+        listof (student id, Exception): the students that could not be fetched
+    """
+    students = students_df.to_dict("records")
+    student_modules = [None] * len(students)
+    failures = []
+
+    on_result = None
+    if checkpoint is not None:
+        for i, student in enumerate(students):
+            student_modules[i] = checkpoint.modules(student["id"])
+        on_result = checkpoint.add
+    to_fetch = [i for i, modules in enumerate(student_modules) if modules is None]
+    if len(to_fetch) < len(students):
+        print(
+            "Reusing {} of {} students from the checkpoint".format(
+                len(students) - len(to_fetch), len(students)
+            )
+        )
+
+    # Students are fetched in parallel, but each result is stored at the student's
+    # position so the output keeps the same row order as students_df
+    with tqdm(total=len(to_fetch)) as pbar:
+        if settings.CANVAS_CLIENT == "async":
+            results = async_canvas.client_for(course).get_student_modules(
+                course.id,
+                [students[i]["id"] for i in to_fetch],
+                on_done=pbar.update,
+                on_result=on_result,
+            )
+            for i, result in zip(to_fetch, results):
+                if isinstance(result, Exception):
+                    failures.append((students[i]["id"], result))
+                else:
+                    student_modules[i] = result
+        else:
+            with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
+                futures = {
+                    executor.submit(_get_student_modules, course, students[i]): i
+                    for i in to_fetch
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    pbar.update(1)
+                    try:
+                        student_modules[i] = future.result()
+                    except Exception as error:
+                        failures.append((students[i]["id"], error))
+                    else:
+                        if on_result is not None:
+                            on_result(students[i]["id"], student_modules[i])
+
+    builder = RecordBuilder(STUDENT_MODULE_ATTRS)
+    for student, modules in zip(students, student_modules):
+        if modules is not None:
+            builder.extend(
+                modules,
+                student_id=str(student["id"]),
+                sis_user_id=student["sis_user_id"],
+                student_name=student["name"],
+                sortable_student_name=student["sortable_name"],
+            )
+    if builder.length == 0:
+        # no student was fetched or has modules (get_student_items_status raises)
+        return pd.DataFrame(), failures
+    student_module_status = parse_timestamps(
+        builder.to_frame(), ["unlock_at", "completed_at"]
+    )
 
     student_module_status = student_module_status.rename(
         columns={
@@ -208,8 +324,79 @@ def get_student_module_status(course):
             "position": "module_position",
         }
     )
-    student_module_status_with_enrollment_date = student_module_status.merge(enrollments_df, how='left', left_on='student_id', right_on='user_id')
-    return student_module_status_with_enrollment_date
+    student_module_status_with_enrollment_date = student_module_status.merge(enrollments_df[["created_at", "user_id"]], how='left', left_on='student_id', right_on='user_id')
+    return student_module_status_with_enrollment_date, failures
+
+
+def _get_student_modules(course, student):
+    """Returns the modules of a course as seen by a single student
+
+    Makes a request to Canvas LMS REST API through Canvas Python API Wrapper.
+    Safe to call from worker threads.
+
+    Args:
+        course (canvasapi.course.Course): The course obj.
+               from Canvas Python API wrapper
+        student (dict): a row of the students table
+
+    Returns:
+        list of Module: every module (and its items) for the student
+    """
+    # every page is requested here, in the worker thread
+    return [
+        Module.from_object(module)
+        for module in course.get_modules(
+            student_id=student["id"], include=["items"], per_page=50
+        )
+    ]
+
+
+def _record_student_failures(course, failures):
+    """Prints and records students whose module progress could not be fetched
+
+    The course still succeeds without these students; the failures are kept in the
+    global status object so log_success can mention them.
+
+    Args:
+        course (canvasapi.course.Course): The course obj.
+        failures (listof (student id, Exception)): students that failed and why
+    """
+    print(
+        "Unable to get module info for {} student(s) in {}:".format(
+            len(failures), course.name
+        )
+    )
+    for sid, error in failures:
+        print("    student {}: {}".format(sid, error))
+
+    with settings.status_lock:
+        if str(course.id) in settings.status:
+            settings.status[str(course.id)]["failed_students"] = [
+                str(sid) for sid, _ in failures
+            ]
+
+
+STUDENT_ITEMS_COLUMNS = [
+    "completed_at",
+    "course_id",
+    "module_id",
+    "items_count",
+    "module_name",
+    "module_position",
+    "state",
+    "unlock_at",
+    "student_id",
+    "student_name",
+    "items_id",
+    "items_title",
+    "items_position",
+    "items_indent",
+    "items_type",
+    "items_module_id",
+    "item_cp_req_type",
+    "item_cp_req_completed",
+    "course_name",
+]
 
 
 def get_student_items_status(course, module_status):
@@ -225,76 +412,28 @@ def get_student_items_status(course, module_status):
                    Items list exapanded -> single row per item
                    Items dict. expanded -> single col per attribute
     """
-    try:
-        expanded_items = _list_to_df(module_status, "items")
-    except KeyError as e:
+    if "items" not in module_status.columns:
         raise KeyError("Course has no items completed by students")
 
-    expanded_items = _dict_to_cols(expanded_items, "items", "items_")
-    student_items_status = _dict_to_cols(
-        expanded_items, "items_completion_requirement", "item_cp_req_"
-    ).reset_index(drop=True)
+    student_items_status = flatten_student_items(module_status)
     student_items_status["course_id"] = course.id
     student_items_status["course_name"] = course.name
 
-    # pull out completed_at column as list
-    items_status_list = student_items_status["completed_at"].values.tolist()
-    # clean/format the datetime string (to be more interpretable in Tableau)
-    cleaned = map(__clean_datetime_value, items_status_list)
-
-    
-    # put cleaned values back into dataframe
-    student_items_status["completed_at"] = list(cleaned)
-
-    dates = student_items_status["completed_at"].unique()
-    
     print("Max Date:")
-    print(max([datetime.datetime.strptime(i, '%Y-%m-%d %H:%M:%S') for i in dates if i!=None]).strftime("%Y-%m-%d %H:%M:%S"))
-    
-    student_items_status = student_items_status[
-        [
-            "completed_at",
-            "course_id",
-            "module_id",
-            "items_count",
-            "module_name",
-            "module_position",
-            "state",
-            "unlock_at",
-            "student_id",
-            "student_name",
-            "items_id",
-            "items_title",
-            "items_position",
-            "items_indent",
-            "items_type",
-            "items_module_id",
-            "item_cp_req_type",
-            "item_cp_req_completed",
-            "course_name",
-        ]
-    ]
-
-    return student_items_status
-
-
-def __clean_datetime_value(datetime_string):
-    """Given"""
-    if datetime_string is None:
-        return datetime_string
+    print(format_timestamp(student_items_status["completed_at"].max()))
 
-    if isinstance(datetime_string, str):
-        x = datetime_string.replace("T", " ")
-        return x.replace("Z", "")
+    apply_schema(student_items_status, STUDENT_ITEMS_SCHEMA)
+    student_items_status = student_items_status[STUDENT_ITEMS_COLUMNS]
 
-    raise TypeError("Expected datetime_string to be of type string (or None)")
+    return student_items_status
 
 
 def write_data_directory(dataframes, cid):
     """Writes dataframes to directory titled by value of cid and items dataframe to
        tableau directory
 
-    Iterates through dataframes dictionary and writes each one to disk (<key>.csv)
+    Iterates through dataframes dictionary and writes each one to disk
+    (<key>.csv, or <key>.parquet when settings.OUTPUT_FORMAT is "parquet")
     Makes *Course output* directory in data folder named <cid> (or writes to existing
     if one already exists with that name)
     Makes *Tableau* output directory called "Tableau" where all student_items dataframes will
@@ -308,50 +447,209 @@ def write_data_directory(dataframes, cid):
 
     course_path = _make_output_dir(cid)
     for name, dataframe in dataframes.items():
-        path = Path(f"{course_path}/{name}.csv")
-        dataframe.to_csv(path, index=False)
+        write_table(dataframe, Path(f"{course_path}/{name}"))
 
 
-def clear_data_directory():
+def clear_data_directory(keep=(), shard=None):
     """
     Clears entire data directory except for Tableau folder
     Directory path : module_progress/data
+
+    Args:
+        keep (list of strings): names of course folders to leave in place (EX. the
+                                courses a resumed run already finished)
+        shard (Shard): only clear the course folders of this shard (and its status),
+                       other shards may share the data directory (see sharding.py)
     """
 
-    root = os.path.dirname(os.path.abspath(__file__))[:-4]
+    root = settings.ROOT_DIR
     data_path = Path(f"{root}/data")
 
     for subdir in os.listdir(data_path):
         path = data_path / subdir
+        if subdir in keep:
+            continue
+        if shard is not None:
+            if subdir.isdigit() and shard.owns(subdir):
+                shutil.rmtree(path)
+            elif subdir == "shards":
+                shutil.rmtree(path / shard.name, ignore_errors=True)
+            continue
         if subdir != "Tableau" and subdir != ".gitkeep" and subdir != ".DS_Store":
             shutil.rmtree(path, ignore_errors=False, onerror=None)
 
 
-def write_tableau_directory(list_of_dfs):
+def open_module_data():
+    """Returns a ModuleDataWriter for the Tableau module_data table"""
+    return ModuleDataWriter(_make_output_dir("Tableau"))
+
+
+class ModuleDataWriter:
+    """Writes the Tableau module_data table one course at a time
+
+    Each course's student items table is appended as soon as the course succeeds, so
+    only one course at a time is held in memory. write_tableau_directory finishes it.
+    When settings.OUTPUT_SCHEMA is "star" the rows are written as a fact table and
+    dimension tables instead (see star_schema.py). When settings.HYPER_EXTRACT is on
+    the rows also go to module_progress.hyper, and when settings.CHANGE_FEED is on
+    their changes since the last run to changes.csv (see change_feed.py).
+
+    Args:
+        tableau_path (Path): the Tableau output directory
+    """
+
+    def __init__(self, tableau_path):
+        self.tableau_path = tableau_path
+        if settings.OUTPUT_SCHEMA == "star":
+            self.table = StarWriter(tableau_path)
+        else:
+            self.table = TableWriter(tableau_path / "module_data", STUDENT_ITEMS_COLUMNS)
+        self.extract = None
+        if settings.HYPER_EXTRACT:
+            self.extract = HyperExtract(
+                tableau_path / "module_progress.hyper", STUDENT_ITEMS_COLUMNS
+            )
+        self.changes = ChangeFeed(tableau_path) if settings.CHANGE_FEED else None
+
+    def append(self, dataframe):
+        """Adds a course's student items table"""
+        self.table.append(dataframe)
+        if self.extract is not None:
+            self.extract.append(dataframe)
+        if self.changes is not None:
+            self.changes.append(dataframe)
+
+    def finish(self):
+        """Moves the tables into place and removes the other output schema's tables"""
+        self.table.finish()
+        if settings.OUTPUT_SCHEMA == "star":
+            for output_format in FORMATS.values():
+                (self.tableau_path / "module_data").with_suffix(
+                    output_format.extension
+                ).unlink(missing_ok=True)
+        else:
+            remove_star_tables(self.tableau_path)
+        if self.changes is not None:
+            self.changes.finish()
+        else:
+            for output_format in FORMATS.values():
+                (self.tableau_path / "changes").with_suffix(
+                    output_format.extension
+                ).unlink(missing_ok=True)
+
+    def abort(self):
+        """Discards everything written this run"""
+        self.table.abort()
+        if self.extract is not None:
+            self.extract.abort()
+        if self.changes is not None:
+            self.changes.abort()
+
+
+class CourseOrder:
+    """Appends the courses' student items to module_data in course_ids order
+
+    Courses run at the same time finish in any order. The first unfinished course
+    appends straight to module_data; a course that finishes before the ones ahead
+    of it is held in memory until they are written. So identical runs write identical
+    files.
+
+    Args:
+        module_data (ModuleDataWriter): the Tableau union (or NoModuleData)
+        course_ids (list): the run's course ids, in order
+    """
+
+    def __init__(self, module_data, course_ids):
+        self.module_data = module_data
+        self._waiting = list(course_ids)
+        self._held = {cid: [] for cid in course_ids}
+        self._finished = set()
+        self._lock = threading.Lock()
+
+    def course(self, cid):
+        """Returns what run_course appends a course's student items to"""
+        return _CourseRows(self, cid)
+
+    def finish(self, cid):
+        """Marks a course as finished (whether it succeeded or not)"""
+        with self._lock:
+            self._finished.add(cid)
+            while self._waiting and self._waiting[0] in self._finished:
+                self._waiting.pop(0)
+                if self._waiting:
+                    for dataframe in self._held.pop(self._waiting[0]):
+                        self.module_data.append(dataframe)
+
+    def _append(self, cid, dataframe):
+        with self._lock:
+            if self._waiting and self._waiting[0] == cid:
+                self.module_data.append(dataframe)
+            else:
+                self._held[cid].append(dataframe)
+
+
+class _CourseRows:
+    """Stands in for ModuleDataWriter in run_course, for one course of a CourseOrder"""
+
+    def __init__(self, order, cid):
+        self.order = order
+        self.cid = cid
+
+    def append(self, dataframe):
+        self.order._append(self.cid, dataframe)
+
+
+def write_tableau_directory(module_data):
     """Creates a directory titled Tableau containing 3 items:
             course_entitlements.csv --> permissions table for Tableau server
-            module_data.csv         --> unioned data for Tableau
+            module_data.csv         --> unioned data for Tableau (.parquet when
+                                        settings.OUTPUT_FORMAT is "parquet"; the
+                                        fact_progress and dim_* tables when
+                                        settings.OUTPUT_SCHEMA is "star")
             status.csv              --> details the success of the most recent run
+                                        (and each course's timings and request counts)
+            changes.csv             --> when settings.CHANGE_FEED is on, the student
+                                        items that changed since the last run
+
+    Also archives the contents of the Tableau folder in the 'archive' directory: as
+    deduplicated chunks and a manifest (see archive.py), or as a .zip when
+    settings.ARCHIVE_MODE is "zip"
+
+    When settings.HYPER_EXTRACT is on, module_progress.hyper holds all 3 as typed tables
 
-    Also creates a .zip with the contents of the Tableau folder in the 'archive' directory
+    Args:
+        module_data (ModuleDataWriter): from open_module_data, with every successful
+                                        course appended
     """
     tableau_path = _make_output_dir("Tableau")
-    union = pd.concat(list_of_dfs, axis=0, ignore_index=True)
-    module_data_output_path = tableau_path / "module_data.csv"
-    union.to_csv(module_data_output_path, index=False)
+    module_data.finish()
 
-    root = os.path.dirname(os.path.abspath(__file__))[:-4]
+    root = settings.ROOT_DIR
 
     # Copy the course_entitlements.csv into the Tableau folder
     src = Path(f"{root}/course_entitlements.csv")
     dst = Path(f"{root}/data/Tableau/course_entitlements.csv")
-    shutil.copyfile(src, dst)
+    partial = dst.with_name(dst.name + ".partial")
+    shutil.copyfile(src, partial)
+    os.replace(partial, dst)
+
+    if module_data.extract is not None:
+        module_data.extract.finish(_status_dataframe(), pd.read_csv(dst))
 
     current_dt = datetime.datetime.now()
     dir_name = str(current_dt.strftime("%Y-%m-%d--%H-%M-%S"))
-    src = tableau_path
-    dst = Path(f"{root}/archive/{dir_name}")
-    shutil.make_archive(dst, "zip", src)
+    if settings.ARCHIVE_MODE == "zip":
+        src = tableau_path
+        dst = Path(f"{root}/archive/{dir_name}")
+        shutil.make_archive(dst, "zip", src)
+        apply_retention()
+    else:
+        manifest = archive_directory(tableau_path, dir_name)
+        print(
+            "Archived {}: {} new chunk(s), {:.1f} MB not archived before".format(
+                dir_name, manifest["new_chunks"], manifest["new_bytes"] / 2**20
+            )
+        )
     _output_status_table(tableau_path)
 
 
@@ -362,21 +660,34 @@ def _output_status_table(tableau_path):
     """
 
     current_dt = datetime.datetime.now()
-    cols = ["Course Id", "Course Name", "Status", "Message", "Data Updated On"]
-    data = []
-    for cid, info in settings.status.items():
-        row = [cid, info["cname"], info["status"], info["message"], current_dt]
-        data.append(row)
-
-    dataframe = pd.DataFrame(data, columns=cols)
+    dataframe = _status_dataframe(current_dt)
 
     file_name = str(current_dt.strftime("%Y-%m-%d--%H-%M-%S")) + ".csv"
 
     status_log_path = Path(f"{settings.ROOT_DIR}/status_log/{file_name}")
     dataframe.to_csv(status_log_path, index=False)
 
+    # replaced in one step, so Tableau never reads a half written file
     status_path = tableau_path / "status.csv"
-    dataframe.to_csv(status_path, index=False)
+    partial = tableau_path / "status.csv.partial"
+    dataframe.to_csv(partial, index=False)
+    os.replace(partial, status_path)
+
+
+def _status_dataframe(current_dt=None):
+    """Returns the run status of every course as a table (the contents of status.csv)"""
+    current_dt = current_dt or datetime.datetime.now()
+    cols = ["Course Id", "Course Name", "Status", "Message", "Data Updated On"]
+    cols += STATUS_COLUMNS
+    data = []
+    with settings.status_lock:
+        for cid, info in settings.status.items():
+            updated_on = info.get("updated_on", current_dt)
+            row = [cid, info["cname"], info["status"], info["message"], updated_on]
+            row += status_row(info)
+            data.append(row)
+
+    return pd.DataFrame(data, columns=cols)
 
 
 def log_failure(cid, msg):
@@ -386,8 +697,9 @@ def log_failure(cid, msg):
         cid (Integer): course id who's status has changed - used to create log entry
         msg (String): description of the failure
     """
-    settings.status[str(cid)]["status"] = "Failed"
-    settings.status[str(cid)]["message"] = msg
+    with settings.status_lock:
+        settings.status[str(cid)]["status"] = "Failed"
+        settings.status[str(cid)]["message"] = msg
 
 
 def log_success(cid):
@@ -396,10 +708,19 @@ def log_success(cid):
     Args:
         cid (Integer): course id who's status has changed - used to create log entry
     """
-    settings.status[str(cid)]["status"] = "Success"
-    settings.status[str(cid)][
-        "message"
-    ] = "Course folder has been created in data directory"
+    with settings.status_lock:
+        settings.status[str(cid)]["status"] = "Success"
+        settings.status[str(cid)][
+            "message"
+        ] = "Course folder has been created in data directory"
+
+        failed_students = settings.status[str(cid)].get("failed_students")
+        if failed_students:
+            settings.status[str(cid)]["message"] += (
+                " (missing module progress for student(s): "
+                + ", ".join(failed_students)
+                + ")"
+            )
 
 
 def _get_students(course):
@@ -418,23 +739,15 @@ def _get_students(course):
 
     """
     # print("Getting student list")
-    students = course.get_users(
-        include=["test_student", "email"], enrollment_type=["student"], per_page=50
-    )
-    attrs = [
-        "id",
-        "name",
-        "created_at",
-        "sortable_name",
-        "short_name",
-        "sis_user_id",
-        "integration_id",
-        "login_id",
-        "pronouns",
-    ]
-
-    students_data = [create_dict_from_object(s, attrs) for s in students]
-    students_df = pd.DataFrame(students_data)
+    if settings.CANVAS_CLIENT == "async":
+        students = async_canvas.client_for(course).get_students(course.id)
+    else:
+        students = course.get_users(
+            include=["test_student", "email"], enrollment_type=["student"], per_page=50
+        )
+    builder = RecordBuilder(Student.__slots__)
+    builder.extend(students)
+    students_df = parse_timestamps(builder.to_frame(), ["created_at"])
     return students_df
 
 
@@ -453,18 +766,17 @@ def _get_enrollments(course):
         DataFrame: Students table
     """
     # print("Getting course enrollments")
-    enrollments = course.get_enrollments(
-       enrollment_type=["student"], per_page=50
-    )
-    attrs = [
-        "created_at",
-        "user_id"
-    ]
-
-    enrollment_data = [create_dict_from_object(e, attrs) for e in enrollments]
-    enrollments_df = pd.DataFrame(enrollment_data)
+    if settings.CANVAS_CLIENT == "async":
+        enrollments = async_canvas.client_for(course).get_enrollments(course.id)
+    else:
+        enrollments = course.get_enrollments(
+           enrollment_type=["student"], per_page=50
+        )
+    builder = RecordBuilder(Enrollment.__slots__)
+    builder.extend(enrollments)
+    enrollments_df = builder.to_frame()
     enrollments_df['user_id'] = enrollments_df['user_id'].astype(str)
-    return enrollments_df
+    return parse_timestamps(enrollments_df, ["created_at", "updated_at", "last_activity_at"])
 
 
 def _make_output_dir(name):
@@ -476,7 +788,7 @@ def _make_output_dir(name):
     Returns:
         String: path to the newly created directory
     """
-    root = os.path.dirname(os.path.abspath(__file__))[:-4]
+    root = settings.ROOT_DIR
     directory_path = Path(f"{root}/data/{name}")
     # print(directory_path)
     if not os.path.exists(directory_path):
@@ -500,87 +812,3 @@ def _make_output_dir(name):
 #         json_list.append(element.attributes)
 #     dataframe = pd.DataFrame(json_list)
 #     return dataframe
-
-
-def _dict_to_cols(dataframe, col_to_expand, expand_name):
-    """Expands column that contains dict to multiple columns (1/dict key)
-
-    Transforms column specified to appropriate dict (all items are strings)
-    Returns DataFrame with original index
-
-    Args:
-        dataframe (DataFrame): a Panadas DataFrame that needs expanding
-        col_to_expand (string): the name of the column to expand
-        expanded_name (string): the prefix for the newly expanded columns
-        EX. (w. expanded_name = 'items_').
-            items (dict in single col.):
-                {'id': 85224, 'title': 'Page 1', 'position': 1, ...}
-            EXPANDS TO
-                => items_id: 8424,
-                   items_title: Page 1,
-                   items_position: 1
-                   ...
-    Returns:
-        DataFrame: New dataframe with specified columns expanded
-
-    """
-    dataframe[col_to_expand] = dataframe[col_to_expand].apply(_all_dict_to_str)
-    original_df = dataframe.drop([col_to_expand], axis=1)
-    extended_df = dataframe[col_to_expand].apply(pd.Series, dtype='object')
-    extended_df.columns = [
-        i
-        if bool(re.search(expand_name, i))
-        else "{}{}".format(str(expand_name), str(i))
-        for i in extended_df.columns
-    ]
-    new_df = pd.concat([original_df, extended_df], axis=1, ignore_index=False)
-    return new_df
-
-
-def _list_to_df(dataframe, col_to_expand):
-    """Expands column that contains list to multiple rows (1/list item)
-
-    col_to_expand specifies a column that contains list entries
-    Expands column list into multiple rows -- one per list item
-    Keeps original columns.
-
-    Args:
-        dataframe (DataFrame): a Panadas DataFrame that needs expanding
-        col_to_expand: the column that contains list entries
-    Returns:
-        DataFrame: with original index
-    """
-    series = (
-        dataframe.apply(lambda x: pd.Series(x[col_to_expand]), axis=1)
-        .stack()
-        .reset_index(level=1, drop=True)
-    )
-    series.name = col_to_expand
-    new_df = dataframe.drop(col_to_expand, axis=1).join(series)
-    return new_df
-
-
-def _all_dict_to_str(d):
-    """Makes all dictionary values into strings
-
-    Handles dictionaries returned from canvas.
-    When data returned some items are not strings - changes all items to strings.
-    Some data becomes string in DataFrames i.e. "{'a': 'string'}", transforms to dict.
-    Returns Dict where all values are strings.
-
-    Args:
-        d (dictionary): dictionary with <key, value> pairs
-    Returns:
-        Dictionary: all values are strings
-    """
-    # if its a dict, change items to strings
-    if isinstance(d, dict):
-        new = {k: str(v) for k, v in d.items()}
-        return new
-    else:
-        if pd.isnull(d):
-            pass
-        else:
-            d = literal_eval(d)
-            new = {k: str(v) for k, v in d.items()}
-            return new
@@ -0,0 +1,228 @@
+"""
+Change feed of student progress between runs (settings.CHANGE_FEED).
+
+Every time data/Tableau is published, data/Tableau/changes.csv lists the student items
+whose progress changed since the previous publish, one row per transition:
+
+    * change: "completed" (item_cp_req_completed became True, also for students or
+      items that are new since the previous run), "reverted" (it was True and no longer
+      is) or "state" (only the module state changed, EX. locked -> unlocked)
+    * previous_state / state: the module state before and after
+    * completed_at: when Canvas says the module was completed (if it was)
+    * detected_at: when this run published the change (UTC)
+
+Rows are keyed by (student_id, items_id). Instead of merging the fresh student items
+with the previous ones, each course keeps a small index in change_index/<course id>.pkl:
+the 64 bit hashes of its keys (sorted), with each key's module state and completion.
+A course's fresh rows are hashed and looked up in it with a binary search, so a run only
+holds the course's rows and about 10 bytes per previous row, and never reads the old
+module_data.
+
+A course's index is replaced when the Tableau folder is published, so a run that fails
+before then reports its changes again the next time. A course without an index yet
+(EX. the first run) only gets one: it has no previous progress to compare with.
+"""
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import settings
+from .output_formats import TableWriter
+
+CHANGE_COLUMNS = [
+    "course_id",
+    "module_id",
+    "items_id",
+    "student_id",
+    "change",
+    "previous_state",
+    "state",
+    "completed_at",
+    "detected_at",
+]
+
+
+class ChangeFeed:
+    """Writes the changes.csv table of a publish, one course (or chunk of it) at a time
+
+    Safe to append from several threads.
+
+    Args:
+        tableau_path (Path): the Tableau output directory
+    """
+
+    def __init__(self, tableau_path):
+        self.table = TableWriter(tableau_path / "changes", CHANGE_COLUMNS)
+        self.detected_at = pd.Timestamp.now(tz="UTC").floor("s")
+        self._previous = {}
+        self._current = {}
+        self._lock = threading.Lock()
+
+    def append(self, student_items):
+        """Writes the changes of a course's student items table (or a chunk of it)"""
+        for cid, rows in student_items.groupby("course_id", observed=True, sort=False):
+            cid = str(cid)
+            with self._lock:
+                if cid not in self._previous:
+                    self._previous[cid] = CompletionIndex.load(cid)
+                previous = self._previous[cid]
+            current = CompletionIndex.build(rows)
+            if previous is not None:
+                changes = self._changes(previous, current, rows)
+                if changes is not None:
+                    self.table.append(changes)
+            with self._lock:
+                self._current.setdefault(cid, []).append(current)
+
+    def finish(self):
+        """Completes changes.csv and saves the index of every course appended"""
+        self.table.finish()
+        with self._lock:
+            for cid, parts in self._current.items():
+                CompletionIndex.concat(parts).save(cid)
+
+    def abort(self):
+        """Discards the changes written so far (the indexes are left as they were)"""
+        self.table.abort()
+
+    def _changes(self, previous, current, rows):
+        """Returns the transitions between previous and current as CHANGE_COLUMNS rows
+
+        Returns:
+            DataFrame: the changes (None if there are none)
+        """
+        found, position = previous.lookup(current.keys)
+        previous_completed = np.full(len(found), -1, dtype=np.int8)
+        previous_completed[found] = previous.completed[position[found]]
+        previous_state = np.full(len(found), None, dtype=object)
+        previous_state[found] = previous.state[position[found]]
+
+        completed = current.completed == 1
+        newly_completed = completed & (previous_completed != 1)
+        reverted = found & (previous_completed == 1) & ~completed
+        state_changed = found & (previous_state != current.state)
+        changed = newly_completed | reverted | state_changed
+        if not changed.any():
+            return None
+
+        change = np.where(
+            newly_completed, "completed", np.where(reverted, "reverted", "state")
+        )
+        changes = rows.iloc[current.rows[changed]][
+            ["course_id", "module_id", "items_id", "student_id", "completed_at"]
+        ].copy()
+        changes["change"] = change[changed]
+        changes["previous_state"] = previous_state[changed]
+        changes["state"] = current.state[changed]
+        changes["detected_at"] = self.detected_at
+        return changes[CHANGE_COLUMNS]
+
+
+class CompletionIndex:
+    """Hashed (student_id, items_id) keys of a course with each key's progress
+
+    Args:
+        keys (array of uint64): sorted key hashes
+        state (array of str): the module state of each key ("" if missing)
+        completed (array of int8): item_cp_req_completed of each key (1, 0, -1 if missing)
+        rows (array of int): for an index built from a table, the row of each key
+    """
+
+    def __init__(self, keys, state, completed, rows=None):
+        self.keys = keys
+        self.state = state
+        self.completed = completed
+        self.rows = rows
+
+    @classmethod
+    def build(cls, student_items):
+        """Returns the index of a student items table (rows without an item are skipped)"""
+        rows = np.flatnonzero(student_items["items_id"].notna().to_numpy())
+        items = student_items.iloc[rows]
+        keys = pd.util.hash_pandas_object(
+            pd.DataFrame(
+                {
+                    "student_id": _as_text(items["student_id"]),
+                    "items_id": _as_integers(items["items_id"]),
+                }
+            ),
+            index=False,
+        ).to_numpy()
+        completed = items["item_cp_req_completed"].map({True: 1, False: 0})
+        order = np.argsort(keys, kind="stable")
+        return cls(
+            keys[order],
+            items["state"].astype(object).fillna("").to_numpy(dtype=object)[order],
+            completed.fillna(-1).to_numpy(dtype=np.int8)[order],
+            rows[order],
+        )
+
+    @classmethod
+    def concat(cls, parts):
+        """Returns one index from the indexes of a course's chunks"""
+        if len(parts) == 1:
+            return parts[0]
+        keys = np.concatenate([part.keys for part in parts])
+        order = np.argsort(keys, kind="stable")
+        return cls(
+            keys[order],
+            np.concatenate([part.state for part in parts])[order],
+            np.concatenate([part.completed for part in parts])[order],
+        )
+
+    @classmethod
+    def load(cls, cid):
+        """Returns the index saved for a course (None if there is none)"""
+        path = _index_path(cid)
+        if not path.exists():
+            return None
+        saved = pd.read_pickle(path)
+        return cls(
+            saved["keys"], np.asarray(saved["state"], dtype=object), saved["completed"]
+        )
+
+    def lookup(self, keys):
+        """Returns (whether each key is in the index, its position in the index)"""
+        position = np.searchsorted(self.keys, keys)
+        found = position < len(self.keys)
+        found[found] = self.keys[position[found]] == keys[found]
+        return found, position
+
+    def save(self, cid):
+        """Replaces the index saved for a course"""
+        path = _index_path(cid)
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        pd.to_pickle(
+            {
+                "keys": self.keys,
+                "state": pd.Categorical(self.state),
+                "completed": self.completed,
+            },
+            tmp_path,
+        )
+        os.replace(tmp_path, path)
+
+
+def _index_path(cid):
+    return Path(f"{settings.ROOT_DIR}/change_index/{cid}.pkl")
+
+
+def _as_text(values):
+    """Returns values as a categorical of strings (hashed like the strings, but once
+    per distinct value)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.rename_categories(values.cat.categories.astype(str))
+    return values.astype(str).astype("category")
+
+
+def _as_integers(values):
+    """Returns ids as int64 (as strings if they aren't numbers), so keys hash the same
+    whichever dtype the ids were read with"""
+    try:
+        return values.astype("int64")
+    except (TypeError, ValueError):
+        return values.astype(str)
@@ -0,0 +1,160 @@
+"""
+Checkpoints of a run, so an interrupted run can be resumed:
+python update_module_progress.py --resume
+
+While a run goes, checkpoint/ keeps, per course:
+
+    * checkpoint/<course id>/students.pkl: every student's module progress, appended as
+      soon as it arrives from Canvas
+    * checkpoint/<course id>/chunks/: the student items of a course run in chunks
+      (settings.STUDENT_CHUNK_SIZE, src/chunked.py)
+    * checkpoint/<course id>/done.pkl: once the course succeeded, its status and
+      student items table (or its chunks)
+
+A resumed run reuses finished courses as they are (their data/ folders are kept) and,
+for the other courses, only requests the students that aren't in students.pkl yet.
+The checkpoint is removed once a run has published the Tableau folder; a run without
+--resume starts with an empty one.
+
+Every run writes its checkpoint, not only resumed ones: --resume is given to the run
+after an interruption, which can't be known in advance. Saving a student costs about
+0.1 ms (one pickle appended to students.pkl), next to the Canvas request that fetched
+it. It does take disk space, about 14 MB per 1000 students of 10 modules of 10 items.
+settings.CHECKPOINT = False turns it off; --resume then starts over.
+"""
+import os
+import pickle
+import shutil
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+import settings
+from .canvas_helpers import STUDENT_MODULE_ATTRS
+from .records import Module
+
+
+class RunCheckpoint:
+    """The checkpoint of the current run
+
+    Args:
+        resume (bool): keep what an interrupted run saved (otherwise it is discarded)
+        shard (Shard): the shard being run, if any (each shard has its own checkpoint)
+        enabled (bool): save the run (defaults to settings.CHECKPOINT)
+    """
+
+    def __init__(self, resume=False, shard=None, enabled=None):
+        self.enabled = settings.CHECKPOINT if enabled is None else enabled
+        self.directory = Path(f"{settings.ROOT_DIR}/checkpoint")
+        if shard is not None:
+            self.directory = self.directory / shard.name
+        if not resume or not self.enabled:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        if resume and not self.enabled:
+            print("Checkpoints are turned off (settings.CHECKPOINT), starting over")
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def finished_courses(self):
+        """Returns the ids (strings) of the courses that succeeded before the interruption"""
+        return sorted(path.parent.name for path in self.directory.glob("*/done.pkl"))
+
+    def finished(self, cid):
+        """Returns (status, student items tables) saved for a finished course
+
+        The student items are a list of DataFrames (one, or the spilled chunks of a
+        course run with settings.STUDENT_CHUNK_SIZE), to append to module_data in order.
+        """
+        saved = pd.read_pickle(self.directory / str(cid) / "done.pkl")
+        student_items = saved["student_items_df"]
+        if isinstance(student_items, pd.DataFrame):
+            student_items = [student_items]
+        return saved["status"], student_items
+
+    def course(self, cid):
+        """Returns the CourseCheckpoint of a course (None when checkpoints are off)"""
+        if not self.enabled:
+            return None
+        return CourseCheckpoint(self.directory / str(cid))
+
+    def remove(self):
+        """Deletes the checkpoint (once the run's output has been published)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class CourseCheckpoint:
+    """Module progress of the students of one course fetched so far
+
+    Passed to get_student_module_status as checkpoint. Safe to add to from several
+    threads.
+
+    Args:
+        directory (Path): the course's checkpoint folder
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.log_path = self.directory / "students.pkl"
+        self.students = _read_log(self.log_path)
+        self._lock = threading.Lock()
+
+    def modules(self, student_id):
+        """Returns a student's saved modules (None if the student wasn't fetched yet)"""
+        records = self.students.get(str(student_id))
+        if records is None:
+            return None
+        return [Module.from_json(record) for record in records]
+
+    def add(self, student_id, modules):
+        """Saves a student's modules as soon as they have been fetched"""
+        records = [
+            {
+                attrname: getattr(module, attrname)
+                for attrname in STUDENT_MODULE_ATTRS
+                if hasattr(module, attrname)
+            }
+            for module in modules
+        ]
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.log_path, "ab") as log:
+                pickle.dump((str(student_id), records), log)
+            self.students[str(student_id)] = records
+
+    def finish(self, status, student_items):
+        """Marks the course as finished
+
+        Args:
+            status (dictionary): the course's settings.status entry
+            student_items (DataFrame): the student items table appended to module_data
+                                       (a SpilledTable for a course run in chunks)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.directory / "done.pkl"
+        tmp_path = path.with_suffix(".tmp")
+        pd.to_pickle({"status": status, "student_items_df": student_items}, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def _read_log(path):
+    """Returns {student id: module records} from a students.pkl log
+
+    A record cut off by the interruption is dropped (and truncated from the file, so
+    new records can be appended after the last complete one).
+    """
+    students = {}
+    if not path.exists():
+        return students
+    with open(path, "rb+") as log:
+        end = 0
+        while True:
+            try:
+                student_id, records = pickle.load(log)
+            except (EOFError, pickle.UnpicklingError, ValueError, TypeError):
+                break
+            students[student_id] = records
+            end = log.tell()
+        if end < log.seek(0, os.SEEK_END):
+            log.truncate(end)
+    return students
@@ -0,0 +1,179 @@
+"""
+Chunked processing of very large courses (settings.STUDENT_CHUNK_SIZE).
+
+get_student_module_status holds every student's raw module items in one table and
+get_student_items_status flattens them all at once, so memory grows with the number of
+students. When STUDENT_CHUNK_SIZE is set, run_course handles that many students at a
+time instead:
+
+    * fetch the chunk's module progress and turn it into student items (flattened,
+      timestamps parsed, compact dtypes and final columns, by the same functions)
+    * append both tables to the course's student_module_df / student_items_df files,
+      which are written next to the old ones and moved into place once the course
+      succeeded
+    * spill the chunk's student items to disk; they are appended to module_data once
+      the course succeeded, one chunk at a time
+
+so only one chunk is in memory at a time and the files written are the same as
+without chunks. Bulk progress and incremental sync have their own paths and don't use
+chunks.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+import settings
+from .canvas_helpers import (
+    _get_enrollments,
+    _get_students,
+    _make_output_dir,
+    _record_student_failures,
+    get_student_items_status,
+    get_student_module_status_for,
+)
+from .instrumentation import phase
+from .output_formats import TableWriter
+
+
+class SpilledTable:
+    """A table kept on disk as a sequence of pickled chunks
+
+    Iterating over it loads one chunk at a time.
+
+    Args:
+        directory (Path): folder for the chunk files (created if needed)
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.paths = []
+        self.rows = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def append(self, dataframe):
+        """Writes a chunk to disk"""
+        path = self.directory / f"{len(self.paths):05d}.pkl"
+        dataframe.to_pickle(path)
+        self.paths.append(path)
+        self.rows += len(dataframe)
+
+    def __iter__(self):
+        for path in self.paths:
+            yield pd.read_pickle(path)
+
+    def __len__(self):
+        return self.rows
+
+    def remove(self):
+        """Deletes the chunk files"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ChunkedStudentStatus:
+    """Builds and writes a course's student tables a chunk of students at a time
+
+    Args:
+        course (canvasapi.course.Course): The course obj.
+               from Canvas Python API wrapper
+        checkpoint (CourseCheckpoint): optional, fetched students are added to it and
+               the chunks are spilled to its folder (so --resume can reuse them)
+        chunk_size (int): students per chunk (defaults to settings.STUDENT_CHUNK_SIZE)
+    """
+
+    def __init__(self, course, checkpoint=None, chunk_size=None):
+        self.course = course
+        self.checkpoint = checkpoint
+        self.chunk_size = chunk_size or settings.STUDENT_CHUNK_SIZE
+        if checkpoint is not None:
+            spill_directory = checkpoint.directory / "chunks"
+            shutil.rmtree(spill_directory, ignore_errors=True)
+        else:
+            spill_directory = tempfile.mkdtemp(prefix=f"module-progress-{course.id}-")
+        self.student_items = SpilledTable(spill_directory)
+        self._tables = {}
+
+    def run(self):
+        """Fetches, flattens and writes every chunk
+
+        Raises:
+            KeyError: if no student's module progress could be fetched
+            IndexError: if the course has no students
+        """
+        cid = self.course.id
+        try:
+            with phase(cid, "progress"):
+                students_df = _get_students(self.course)
+                enrollments_df = _get_enrollments(self.course)
+            if students_df.empty:
+                raise IndexError("Course has no students")
+
+            failures = []
+            for start in range(0, len(students_df), self.chunk_size):
+                chunk = students_df.iloc[start:start + self.chunk_size]
+                print(
+                    "Getting student module info for {} (students {}-{} of {})".format(
+                        self.course.name, start + 1, start + len(chunk), len(students_df)
+                    )
+                )
+                with phase(cid, "progress"):
+                    student_module_status, chunk_failures = get_student_module_status_for(
+                        self.course, chunk, enrollments_df, checkpoint=self.checkpoint
+                    )
+                failures += chunk_failures
+                if student_module_status.empty:
+                    continue
+                with phase(cid, "items"):
+                    student_items_status = get_student_items_status(
+                        self.course, student_module_status
+                    )
+                with phase(cid, "write"):
+                    self._append("student_module_df", student_module_status)
+                    self._append("student_items_df", student_items_status)
+                    self.student_items.append(student_items_status)
+
+            if failures:
+                _record_student_failures(self.course, failures)
+                if len(failures) == len(students_df):
+                    raise KeyError(
+                        "Unable to get module progress for any student in course: "
+                        + self.course.name
+                    )
+            if not self._tables:
+                raise KeyError("Course has no items completed by students")
+        except Exception:
+            self.abort()
+            raise
+
+    def finish(self, module_data):
+        """Moves the course's student tables into place and appends them to module_data
+
+        Args:
+            module_data (ModuleDataWriter): the Tableau union
+        """
+        for table in self._tables.values():
+            table.finish()
+        for student_items_status in self.student_items:
+            module_data.append(student_items_status)
+        if self.checkpoint is None:
+            self.student_items.remove()
+
+    def abort(self):
+        """Discards the course's partial files and spilled chunks"""
+        for table in self._tables.values():
+            table.abort()
+        if self._tables:
+            # a failed course gets no folder, like without chunks
+            try:
+                os.rmdir(_make_output_dir(self.course.id))
+            except OSError:
+                pass
+        self.student_items.remove()
+
+    def _append(self, name, dataframe):
+        if name not in self._tables:
+            course_path = _make_output_dir(self.course.id)
+            self._tables[name] = TableWriter(course_path / name, list(dataframe.columns))
+        self._tables[name].append(dataframe)
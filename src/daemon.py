@@ -0,0 +1,178 @@
+"""
+Headless service mode: python update_module_progress.py --daemon
+
+Instead of one run per invocation, the script keeps running and refreshes every course
+in course_entitlements.csv on its own cadence:
+
+    * courses are validated once at startup and their Course objects are reused
+    * the Canvas session (and the async client, if used) stays open between refreshes,
+      so connections and TLS sessions are reused
+    * a course is refreshed every settings.REFRESH_MINUTES minutes
+      (settings.REFRESH_MINUTES_BY_COURSE overrides it per course id)
+    * after every cycle (the courses that were due) the Tableau folder is published
+      again with every course's latest data; each file is replaced in one step and the
+      folder is archived like after a normal run. A cycle in which no course's student
+      items file and no course's status changed publishes (and archives) nothing
+
+Only the course being refreshed is held in memory: a course's latest student items
+stay in its data/<course id>/student_items_df (written by run_course), and publishing
+streams those files into module_data one course at a time, like --merge. A course
+whose refresh fails keeps its previous file, so its previous data stays in
+module_data; status.csv shows the failure and when its data last changed. Stop it
+with Ctrl+C or SIGTERM.
+"""
+import datetime
+import hashlib
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import settings
+from . import async_canvas
+from .canvas_helpers import open_module_data, write_tableau_directory
+from .instrumentation import close_trace
+from .interface import render_status_table
+from .output_formats import FORMATS
+from .sharding import NoModuleData, read_student_items
+
+
+def serve(canvas, courses, run_course):
+    """Refreshes courses on their cadence and publishes the Tableau folder until stopped
+
+    Args:
+        canvas (canvasapi.Canvas): the Canvas obj. from Canvas Python API wrapper
+        courses (dictionary): course id -> validated canvasapi Course
+        run_course (function): update_module_progress.run_course
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    next_refresh = {cid: 0.0 for cid in courses}
+    published = None
+    try:
+        while True:
+            now = time.monotonic()
+            due = [cid for cid, at in next_refresh.items() if at <= now]
+            if due:
+                published = _cycle(canvas, courses, due, run_course, published)
+                for cid in due:
+                    next_refresh[cid] = now + refresh_minutes(cid) * 60
+            time.sleep(max(0.0, min(next_refresh.values()) - time.monotonic()))
+    except KeyboardInterrupt:
+        print("Stopping...")
+    finally:
+        async_canvas.close_all()
+        close_trace()
+
+
+def refresh_minutes(cid):
+    """Returns how often a course is refreshed, in minutes"""
+    return settings.REFRESH_MINUTES_BY_COURSE.get(cid, settings.REFRESH_MINUTES)
+
+
+def _cycle(canvas, courses, due, run_course, published):
+    """Refreshes the due courses, then publishes the Tableau folder if anything changed
+
+    Args:
+        published (dictionary): the course statuses of the last published Tableau
+                                folder (None if it wasn't published yet)
+
+    Returns:
+        dictionary: the course statuses of the Tableau folder after the cycle
+    """
+    changed = _refresh(canvas, courses, due, run_course)
+    statuses = _statuses()
+    if not changed and statuses == published:
+        print("Nothing changed, the Tableau folder is left as it is")
+        return published
+    return statuses if _publish(courses) else published
+
+
+def _refresh(canvas, courses, due, run_course):
+    """Refreshes the due courses
+
+    Returns:
+        list: the course ids whose student items file changed
+    """
+    started = datetime.datetime.now()
+    print(f"{started:%Y-%m-%d %H:%M:%S} Refreshing {len(due)} course(s)")
+    for cid in due:
+        _reset_status(cid)
+
+    def refresh(cid):
+        # module_data is built from the course folders when publishing
+        before = _student_items_digest(cid)
+        run_course(canvas, cid, NoModuleData(), course=courses[cid])
+        changed = _student_items_digest(cid) != before
+        with settings.status_lock:
+            info = settings.status[str(cid)]
+            if info["status"] == "Success" and (changed or "updated_on" not in info):
+                info["updated_on"] = datetime.datetime.now()
+        return changed
+
+    with ThreadPoolExecutor(max_workers=settings.MAX_COURSE_WORKERS) as executor:
+        return [cid for cid, changed in zip(due, executor.map(refresh, due)) if changed]
+
+
+def _student_items_digest(cid):
+    """Returns the SHA-256 of a course's student_items_df file (None if there is none)"""
+    path = Path(f"{settings.ROOT_DIR}/data/{cid}/student_items_df")
+    for output_format in FORMATS.values():
+        candidate = path.with_suffix(output_format.extension)
+        if candidate.exists():
+            digest = hashlib.sha256()
+            with open(candidate, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+            return output_format.extension, digest.hexdigest()
+    return None
+
+
+def _statuses():
+    """Returns every course's status and message, as shown in status.csv"""
+    with settings.status_lock:
+        return {
+            cid: (info["status"], info["message"])
+            for cid, info in settings.status.items()
+        }
+
+
+def _reset_status(cid):
+    """Clears a course's status (and metrics) from its previous refresh"""
+    with settings.status_lock:
+        previous = settings.status.get(str(cid), {})
+        settings.status[str(cid)] = {
+            "cname": previous.get("cname"),
+            "status": "Not executed",
+            "message": "Has not been run yet",
+        }
+        if "updated_on" in previous:
+            settings.status[str(cid)]["updated_on"] = previous["updated_on"]
+
+
+def _publish(courses):
+    """Publishes the Tableau folder from the course folders
+
+    Returns:
+        bool: True if it was published
+    """
+    data_path = Path(f"{settings.ROOT_DIR}/data")
+    module_data = open_module_data()
+    try:
+        for cid in courses:
+            try:
+                dataframe = read_student_items(data_path / str(cid) / "student_items_df")
+            except FileNotFoundError:
+                # no refresh of the course has succeeded yet
+                continue
+            module_data.append(dataframe)
+        write_tableau_directory(module_data)
+    except Exception as e:
+        module_data.abort()
+        print("Could not publish the Tableau folder: " + str(e))
+        return False
+    else:
+        render_status_table()
+        return True
+    finally:
+        close_trace()
@@ -0,0 +1,175 @@
+"""
+Flattening of the nested module items returned by Canvas.
+
+A module row holds a list of item dicts, and each item may hold a completion requirement
+dict. flatten_items turns that into one row per item with a column per item attribute
+and per completion requirement attribute, EX. (w. prefixes 'items_' / 'item_cp_req_'):
+
+    module_id  items
+    8135       [{'id': 85224, 'title': 'Page 1', 'completion_requirement': {'type': 'must_view'}}, ...]
+
+    FLATTENS TO
+
+    module_id  items_id  items_title  item_cp_req_type
+    8135       85224     Page 1       must_view
+    ...
+
+The whole table is exploded and normalized in bulk (DataFrame.explode and one DataFrame
+built from all the dicts) rather than building a Series per row.
+
+flatten_student_items does the same for the student module table (a row per student
+and module), which is far larger: it reads only the ModuleItem and CompletionRequirement
+attributes, column by column, and keeps the values' types instead of converting them to
+strings.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from .records import CompletionRequirement, ModuleItem
+
+# str() of every element of an object array in a single C loop
+_to_str = np.frompyfunc(str, 1, 1)
+
+
+def flatten_items(dataframe, list_col, list_prefix, nested_col, nested_prefix):
+    """Expands a column of lists of dicts into one row per dict and one column per key
+
+    Other columns are kept (repeated for every item). Rows with an empty or missing list
+    are kept as a single row with empty item columns. Item values are converted to
+    strings; missing keys are left empty (NaN).
+
+    Args:
+        dataframe (DataFrame): table with a column of lists of dicts
+        list_col (string): the column holding the lists, EX. 'items'
+        list_prefix (string): prefix for the item columns, EX. 'items_'
+        nested_col (string): (prefixed) item column that holds a dict itself,
+                             EX. 'items_completion_requirement'
+        nested_prefix (string): prefix for the nested dict's columns, EX. 'item_cp_req_'
+
+    Returns:
+        DataFrame: original columns, then item columns, then nested dict columns
+
+    Raises:
+        KeyError: if no item has nested_col (EX. no item has a completion requirement)
+    """
+    exploded = dataframe.reset_index(drop=True).explode(list_col)
+
+    # null entries inside a list are dropped, unless the row has nothing else
+    missing = exploded[list_col].isna()
+    if missing.any():
+        row_has_items = (~missing).groupby(level=0).transform("any")
+        exploded = exploded[~missing | ~row_has_items]
+
+    exploded = exploded.reset_index(drop=True)
+    items = _dicts_to_cols(exploded.pop(list_col), list_prefix, keep_raw=nested_col)
+    if nested_col not in items.columns:
+        raise KeyError(nested_col)
+
+    nested = _dicts_to_cols(items.pop(nested_col), nested_prefix)
+    return pd.concat([exploded, items, nested], axis=1)
+
+
+# (column, item attribute) and (column, requirement attribute) of flatten_student_items
+STUDENT_ITEM_ATTRS = [
+    ("items_id", "id"),
+    ("items_title", "title"),
+    ("items_position", "position"),
+    ("items_indent", "indent"),
+    ("items_type", "type"),
+    ("items_module_id", "module_id"),
+]
+REQUIREMENT_ATTRS = [
+    ("item_cp_req_type", "type"),
+    ("item_cp_req_completed", "completed"),
+    ("item_cp_req_min_score", "min_score"),
+]
+
+
+def flatten_student_items(dataframe):
+    """Expands the items of a student module table into one row per item
+
+    Like flatten_items(dataframe, "items", "items_", "items_completion_requirement",
+    "item_cp_req_"), with the same rows, but only the STUDENT_ITEM_ATTRS and
+    REQUIREMENT_ATTRS columns, and their values as Canvas returned them: ids and
+    positions are nullable integers, item_cp_req_completed a nullable boolean. A
+    missing attribute is empty (None).
+
+    Args:
+        dataframe (DataFrame): table with an "items" column of lists of item dicts
+
+    Returns:
+        DataFrame: the other columns of dataframe, then the item columns
+
+    Raises:
+        KeyError: if no item has a completion requirement
+    """
+    rows = []
+    items = []
+    for row, module_items in enumerate(dataframe["items"].tolist()):
+        if isinstance(module_items, list):
+            module_items = [item for item in module_items if item is not None]
+        if module_items:
+            rows.extend([row] * len(module_items))
+            items.extend(module_items)
+        else:
+            rows.append(row)
+            items.append({})
+
+    item_columns = ModuleItem.columns(items)
+    requirements = [
+        requirement if isinstance(requirement, dict) else {}
+        for requirement in item_columns["completion_requirement"]
+    ]
+    if not any(requirements):
+        raise KeyError("items_completion_requirement")
+    requirement_columns = CompletionRequirement.columns(requirements)
+
+    flattened = dataframe.drop(columns="items").iloc[rows].reset_index(drop=True)
+    for column, attrname in STUDENT_ITEM_ATTRS:
+        flattened[column] = _typed(item_columns[attrname])
+    for column, attrname in REQUIREMENT_ATTRS:
+        flattened[column] = _typed(requirement_columns[attrname])
+    return flattened
+
+
+def _typed(values):
+    """Returns values as a nullable integer or boolean array if they all are (or None),
+    otherwise as they are"""
+    present = {type(value) for value in values if value is not None}
+    if present == {int}:
+        return pd.array(values, dtype="Int64")
+    if present == {bool}:
+        return pd.array(values, dtype="boolean")
+    return np.array(values, dtype=object)
+
+
+def _dicts_to_cols(series, prefix, keep_raw=None):
+    """Returns a DataFrame with a column per key of the dicts in series
+
+    Columns are named prefix + key (unless the key already contains prefix) and ordered by
+    first appearance. Values become strings; rows without the key (or that aren't dicts)
+    are NaN.
+
+    Args:
+        series (Series): dicts (or nulls), one per row
+        prefix (string): prefix for the new columns
+        keep_raw (string): a (prefixed) column to leave unconverted (EX. a nested dict
+                           that gets expanded next)
+    """
+    records = [d if isinstance(d, dict) else {} for d in series.tolist()]
+    frame = pd.DataFrame(records, dtype=object)
+
+    columns = {}
+    for key in frame.columns:
+        name = key if re.search(prefix, key) else f"{prefix}{key}"
+        values = frame[key].to_numpy()
+        if name != keep_raw:
+            # a missing key is the only float NaN (NaN != NaN); JSON nulls stay "None"
+            missing = values != values
+            values = _to_str(values)
+            values[missing] = np.nan
+        columns[name] = values
+
+    return pd.DataFrame(columns, index=series.index, dtype=object)
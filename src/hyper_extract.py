@@ -0,0 +1,193 @@
+"""
+Tableau Hyper extract output for data/Tableau.
+
+When settings.HYPER_EXTRACT is on, module_progress.hyper is written next to the CSVs with
+three typed tables in the "Extract" schema:
+
+    * module_data: every successful course's student items (appended one course at a time)
+    * status: the run status table (same columns as status.csv)
+    * course_entitlements: the course_entitlements.csv table
+
+Column names match the CSVs, so the relationships in module-progress.twb (on Course Id /
+course_id) work the same with the extract as the data source. Ids are integers,
+completed_at a timestamp and item_cp_req_completed a boolean, so Tableau doesn't have to
+parse and type the data on every refresh. unlock_at is text, as module-progress.twb
+declares it (in the same form as in module_data.csv).
+
+Hyper's own log (hyperd.log) is written to status_log/.
+
+The extract is written to module_progress.partial.hyper and renamed into place once the
+run is done. The Hyper API runs a local Hyper process, no Tableau Server is needed:
+https://tableau.github.io/hyper-db/
+"""
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+import settings
+from .instrumentation import STATUS_COLUMNS
+from .timestamps import CANVAS_DATE_FORMAT
+
+try:
+    from tableauhyperapi import (
+        NULLABLE,
+        Connection,
+        CreateMode,
+        HyperProcess,
+        Inserter,
+        SqlType,
+        TableDefinition,
+        TableName,
+        Telemetry,
+    )
+except ImportError:  # pragma: no cover - only needed for Hyper output
+    HyperProcess = None
+
+SCHEMA = "Extract"
+
+# column -> type, for the columns that aren't text
+MODULE_DATA_TYPES = {
+    "completed_at": "timestamp",
+    "course_id": "big_int",
+    "module_id": "big_int",
+    "items_count": "int",
+    "module_position": "int",
+    "student_id": "big_int",
+    "items_id": "big_int",
+    "items_position": "int",
+    "items_indent": "int",
+    "items_module_id": "big_int",
+    "item_cp_req_completed": "bool",
+}
+STATUS_TYPES = dict(
+    {"Course Id": "big_int", "Data Updated On": "timestamp"},
+    **{col: "double" if col.endswith("Seconds") else "big_int" for col in STATUS_COLUMNS},
+)
+ENTITLEMENTS_TYPES = {"course_id": "big_int"}
+
+
+class HyperExtract:
+    """Writes module_data to a Hyper extract one course at a time
+
+    Safe to append from several threads.
+
+    Args:
+        path (Path): the extract to create, EX. data/Tableau/module_progress.hyper
+        columns (list of strings): the module_data columns, in order
+    """
+
+    def __init__(self, path, columns):
+        if HyperProcess is None:
+            raise RuntimeError(
+                "Hyper output requires tableauhyperapi. Install it or set HYPER_EXTRACT = False"
+            )
+        self.path = Path(path)
+        self.partial_path = self.path.with_name(self.path.stem + ".partial.hyper")
+        self.columns = list(columns)
+        self._lock = threading.Lock()
+        log_path = Path(f"{settings.ROOT_DIR}/status_log")
+        os.makedirs(log_path, exist_ok=True)
+        self._hyper = HyperProcess(
+            telemetry=Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU,
+            parameters={"log_dir": str(log_path)},
+        )
+        self._connection = Connection(
+            endpoint=self._hyper.endpoint,
+            database=self.partial_path,
+            create_mode=CreateMode.CREATE_AND_REPLACE,
+        )
+        self._connection.catalog.create_schema_if_not_exists(SCHEMA)
+        self._module_data = self._create_table(
+            "module_data", self.columns, MODULE_DATA_TYPES
+        )
+
+    def append(self, dataframe):
+        """Inserts a course's student items into module_data"""
+        rows = _rows(dataframe.reindex(columns=self.columns), MODULE_DATA_TYPES)
+        with self._lock:
+            self._insert(self._module_data, rows)
+
+    def finish(self, status, entitlements):
+        """Adds the status and course_entitlements tables and moves the extract into place
+
+        Args:
+            status (DataFrame): the run status table (as written to status.csv)
+            entitlements (DataFrame): the course_entitlements.csv table
+        """
+        with self._lock:
+            for name, dataframe, types in (
+                ("status", status, STATUS_TYPES),
+                ("course_entitlements", entitlements, ENTITLEMENTS_TYPES),
+            ):
+                table = self._create_table(name, list(dataframe.columns), types)
+                self._insert(table, _rows(dataframe, types))
+            self._close()
+            os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        """Discards the extract (any previous one is left in place)"""
+        with self._lock:
+            self._close()
+            self.partial_path.unlink(missing_ok=True)
+
+    def _create_table(self, name, columns, types):
+        definition = TableDefinition(
+            TableName(SCHEMA, name),
+            [
+                TableDefinition.Column(col, _sql_type(types.get(col, "text")), NULLABLE)
+                for col in columns
+            ],
+        )
+        self._connection.catalog.create_table(definition)
+        return definition
+
+    def _insert(self, definition, rows):
+        with Inserter(self._connection, definition) as inserter:
+            inserter.add_rows(rows)
+            inserter.execute()
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._hyper.close()
+            self._connection = None
+
+
+def _sql_type(name):
+    return {
+        "text": SqlType.text,
+        "int": SqlType.int,
+        "big_int": SqlType.big_int,
+        "double": SqlType.double,
+        "bool": SqlType.bool,
+        "timestamp": SqlType.timestamp,
+    }[name]()
+
+
+def _rows(dataframe, types):
+    """Returns the rows of dataframe as Python values matching types (None for missing)"""
+    columns = []
+    for col in dataframe.columns:
+        values = dataframe[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        kind = types.get(col, "text")
+        if kind in ("int", "big_int"):
+            values = pd.to_numeric(values, errors="coerce").astype("Int64")
+        elif kind == "double":
+            values = pd.to_numeric(values, errors="coerce")
+        elif kind == "bool":
+            values = values.map({True: True, False: False, "True": True, "False": False})
+        elif kind == "timestamp":
+            # Canvas times are UTC; Tableau shows them as they appear in the CSVs
+            values = pd.to_datetime(values, errors="coerce", utc=True).dt.tz_localize(None)
+        elif pd.api.types.is_datetime64_any_dtype(values.dtype):
+            # written like the CSVs write it (EX. unlock_at)
+            values = pd.to_datetime(values, utc=True).dt.strftime(CANVAS_DATE_FORMAT)
+        else:
+            values = values.map(lambda v: v if pd.isnull(v) else str(v))
+        values = values.astype(object)
+        columns.append(values.where(values.notna(), None).tolist())
+    return list(zip(*columns))
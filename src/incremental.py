@@ -0,0 +1,218 @@
+"""
+Incremental sync: only request module progress for students whose progress may have changed.
+
+Used by run_course instead of the full per-student fetch when settings.INCREMENTAL is True.
+For every course a state file in sync_state/ keeps the last run's student_module_df and
+student_items_df, plus a change signal per student taken from their enrollments
+(last_activity_at and updated_at). On the next run only students whose signal changed
+(or who are new) are requested from Canvas; their fresh rows replace their old ones and
+everybody else's rows are reused.
+
+Everything is refetched when:
+    * the course has no state yet
+    * the course structure (modules, items, completion requirements) changed
+    * the last full refresh is older than settings.INCREMENTAL_MAX_AGE_DAYS (catches
+      changes that don't touch the enrollment, EX. a teacher grading a min_score item)
+"""
+import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+import settings
+from .canvas_helpers import get_student_module_status, get_student_items_status
+from .schema import STUDENT_ITEMS_SCHEMA, apply_schema
+
+
+def sync_student_status(course, modules_df, checkpoint=None):
+    """Returns a course's student module and student items tables, refetching only changed students
+
+    Args:
+        course (canvasapi.course.Course): The course obj.
+               from Canvas Python API wrapper
+        modules_df (DataFrame): the course's modules table (from get_modules)
+        checkpoint (CourseCheckpoint): optional, see get_student_module_status
+
+    Returns:
+        SyncState: the course's state, call save() once the tables have been written
+        DataFrame: student module status (same columns as get_student_module_status)
+        DataFrame: student items status (same columns as get_student_items_status)
+
+    Raises:
+        IndexError: if the course has no students and no saved state
+        KeyError: if no student could be fetched and there is no saved state
+    """
+    state = SyncState.load(course.id, modules_df)
+    student_module_status = get_student_module_status(
+        course, select_students=state.select_students, checkpoint=checkpoint
+    )
+    if student_module_status is not None and student_module_status.empty:
+        if state.previous is None:
+            raise KeyError(
+                "Unable to get module progress for any student in course: "
+                + course.name
+            )
+        # merge keeps their previous rows and refetches them next run
+        print(
+            "Could not refetch any student of {}, keeping their last progress".format(
+                course.name
+            )
+        )
+        student_module_status = student_items_status = None
+    elif student_module_status is None:
+        if state.previous is None:
+            raise IndexError("Course has no students")
+        print("No student activity since the last run for " + course.name)
+        student_items_status = None
+    else:
+        student_items_status = get_student_items_status(course, student_module_status)
+
+    student_module_status, student_items_status = state.merge(
+        student_module_status, student_items_status
+    )
+    return state, student_module_status, student_items_status
+
+
+class SyncState:
+    """Last known student progress of a course
+
+    Args:
+        cid (int): the course id
+        structure (string): hash of the course's modules and items
+        previous (dictionary): the state saved by the last run (None if there is none)
+    """
+
+    def __init__(self, cid, structure, previous=None):
+        self.cid = cid
+        self.structure = structure
+        self.previous = previous
+        self.signals = {}
+        self.roster = []
+        self.selected = set()
+
+    @classmethod
+    def load(cls, cid, modules_df):
+        """Returns the state saved for a course (ignored if a full refresh is due)"""
+        structure = _structure_hash(modules_df)
+        path = _state_path(cid)
+        if not path.exists():
+            return cls(cid, structure)
+
+        previous = pd.read_pickle(path)
+        age = datetime.datetime.now() - previous["refreshed_at"]
+        if previous["structure"] != structure:
+            print(f"Course {cid} structure changed, refetching every student")
+        elif age > datetime.timedelta(days=settings.INCREMENTAL_MAX_AGE_DAYS):
+            print(f"Course {cid} was fully refreshed {age.days} days ago, refetching every student")
+        else:
+            return cls(cid, structure, previous)
+        return cls(cid, structure)
+
+    def select_students(self, students_df, enrollments_df):
+        """Returns the ids of the students whose module progress has to be requested
+
+        Passed to get_student_module_status as select_students.
+        """
+        self.roster = students_df["id"].astype(str).tolist()
+        self.signals = _change_signals(enrollments_df)
+
+        if self.previous is None:
+            self.selected = set(self.roster)
+        else:
+            old = self.previous["signals"]
+            self.selected = {
+                sid
+                for sid in self.roster
+                if self.signals.get(sid) is None or old.get(sid) != self.signals[sid]
+            }
+        print(
+            "Refetching {} of {} students".format(len(self.selected), len(self.roster))
+        )
+        return self.selected
+
+    def merge(self, student_module_status, student_items_status):
+        """Returns the fresh rows merged with the reused rows of unchanged students
+
+        Rows are in roster order, like a full run. Students that were selected but
+        could not be fetched keep their old rows and will be refetched next run;
+        students that left the course are dropped.
+        """
+        fetched = set()
+        if student_module_status is not None:
+            fetched = set(student_module_status["student_id"])
+        for sid in self.selected - fetched:
+            self.signals[sid] = None
+
+        if self.previous is None:
+            return student_module_status, student_items_status
+
+        keep = set(self.roster) - fetched
+        position = {sid: i for i, sid in enumerate(self.roster)}
+        merged = []
+        for name, fresh in (
+            ("student_module_df", student_module_status),
+            ("student_items_df", student_items_status),
+        ):
+            old = self.previous[name]
+            frames = [old[old["student_id"].isin(keep)]]
+            if fresh is not None:
+                frames.append(fresh)
+            table = pd.concat(frames, ignore_index=True)
+            order = table["student_id"].map(position)
+            merged.append(
+                table.iloc[order.argsort(kind="stable")].reset_index(drop=True)
+            )
+        # concatenating categoricals with different categories falls back to text
+        apply_schema(merged[1], STUDENT_ITEMS_SCHEMA)
+        return tuple(merged)
+
+    def save(self, student_module_status, student_items_status):
+        """Saves the course's tables and change signals for the next run"""
+        path = _state_path(self.cid)
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        pd.to_pickle(
+            {
+                # when every student was last refetched
+                "refreshed_at": datetime.datetime.now()
+                if self.previous is None
+                else self.previous["refreshed_at"],
+                "structure": self.structure,
+                "signals": self.signals,
+                "student_module_df": student_module_status,
+                "student_items_df": student_items_status,
+            },
+            tmp_path,
+        )
+        os.replace(tmp_path, path)
+
+
+def _change_signals(enrollments_df):
+    """Returns {student id: last_activity_at|updated_at} (None when Canvas gives neither)
+
+    A student with several enrollments (EX. in two sections) gets the latest of each.
+    """
+    times = (
+        enrollments_df[["user_id", "last_activity_at", "updated_at"]]
+        .groupby("user_id")
+        .max()
+    )
+    missing = times["last_activity_at"].isna() & times["updated_at"].isna()
+    signals = times["last_activity_at"].astype(str) + "|" + times["updated_at"].astype(str)
+    return signals.where(~missing, None).to_dict()
+
+
+def _structure_hash(modules_df):
+    """Hash of the modules, their items and completion requirements"""
+    structure = modules_df[
+        ["module_id", "module_name", "module_position", "unlock_at", "items"]
+    ].to_dict("records")
+    payload = json.dumps(structure, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _state_path(cid):
+    return Path(f"{settings.ROOT_DIR}/sync_state/{cid}.pkl")
@@ -0,0 +1,156 @@
+"""
+Per-course instrumentation of a run, kept in settings.status next to each course's status.
+
+    * "seconds": wall time of each phase of run_course (see PHASES)
+    * "requests": Canvas requests sent for the course (retries included)
+    * "retries": how many of those were retries of throttled or 5xx responses
+    * "bytes": bytes of response bodies received
+    * "rows": rows the course added to module_data
+
+Requests are attributed to a course by the course id in their url (every request the
+script makes is under /courses/:id), so requests sent from worker threads and from the
+async client's event loop are counted too. Responses served by the response cache don't
+reach Canvas and aren't counted; revalidated ones are (with status 304).
+
+status_row turns a course's numbers into the extra columns (STATUS_COLUMNS) of
+status.csv and the status_log/ files.
+
+When settings.REQUEST_TRACE is on, every request is also written to
+status_log/<run start>--requests.jsonl, one JSON object per line:
+
+    {"time": "2020-02-01T12:30:00.123456+00:00", "course_id": "12345", "url": "...",
+     "status": 200, "seconds": 0.123, "bytes": 5120, "attempt": 0}
+"""
+import datetime
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import settings
+
+# the phases of run_course, in order
+PHASES = ["course", "modules", "progress", "items", "write"]
+STATUS_COLUMNS = [
+    "Requests",
+    "Retries",
+    "Bytes Received",
+    "Rows",
+    "Total Seconds",
+] + [f"{name.capitalize()} Seconds" for name in PHASES]
+
+_COURSE_URL = re.compile(r"/courses/(\d+)")
+_trace_lock = threading.Lock()
+_trace_file = None
+
+
+@contextmanager
+def phase(cid, name):
+    """Adds the wall time of the block to a course's phase
+
+    Args:
+        cid (Integer): course id
+        name (String): one of PHASES
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        with settings.status_lock:
+            metrics = _metrics(cid)
+            if metrics is not None:
+                metrics["seconds"][name] = metrics["seconds"].get(name, 0.0) + seconds
+
+
+def record_request(url, status_code, seconds, size, attempt):
+    """Counts a request sent to Canvas against its course (and traces it)
+
+    Args:
+        url (String): the request url
+        status_code (Integer): HTTP status of the response
+        seconds (float): time from sending the request to receiving the response
+        size (Integer): bytes of the response body
+        attempt (Integer): 0 for the first try, 1 for the first retry, ...
+    """
+    match = _COURSE_URL.search(url)
+    cid = match.group(1) if match else None
+    if cid is not None:
+        with settings.status_lock:
+            metrics = _metrics(cid)
+            if metrics is not None:
+                metrics["requests"] += 1
+                metrics["retries"] += attempt > 0
+                metrics["bytes"] += size
+    if settings.REQUEST_TRACE:
+        _trace(
+            {
+                "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "course_id": cid,
+                "url": url,
+                "status": status_code,
+                "seconds": round(seconds, 6),
+                "bytes": size,
+                "attempt": attempt,
+            }
+        )
+
+
+def record_rows(cid, rows):
+    """Records how many rows a course added to module_data"""
+    with settings.status_lock:
+        metrics = _metrics(cid)
+        if metrics is not None:
+            metrics["rows"] += rows
+
+
+def status_row(info):
+    """Returns the STATUS_COLUMNS values of a course's settings.status entry"""
+    metrics = info.get("metrics") or _empty_metrics()
+    seconds = metrics["seconds"]
+    phase_seconds = [
+        round(seconds[name], 3) if name in seconds else None for name in PHASES
+    ]
+    return [
+        metrics["requests"],
+        metrics["retries"],
+        metrics["bytes"],
+        metrics["rows"],
+        round(sum(seconds.values()), 3),
+    ] + phase_seconds
+
+
+def close_trace():
+    """Closes the request trace of the run (the next request starts a new one)"""
+    global _trace_file
+    with _trace_lock:
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+
+
+def _metrics(cid):
+    # callers hold settings.status_lock
+    info = settings.status.get(str(cid))
+    if info is None:
+        return None
+    if "metrics" not in info:
+        info["metrics"] = _empty_metrics()
+    return info["metrics"]
+
+
+def _empty_metrics():
+    return {"seconds": {}, "requests": 0, "retries": 0, "bytes": 0, "rows": 0}
+
+
+def _trace(record):
+    global _trace_file
+    line = json.dumps(record) + "\n"
+    with _trace_lock:
+        if _trace_file is None:
+            file_name = datetime.datetime.now().strftime("%Y-%m-%d--%H-%M-%S")
+            path = Path(f"{settings.ROOT_DIR}/status_log/{file_name}--requests.jsonl")
+            _trace_file = open(path, "w")
+        _trace_file.write(line)
@@ -6,6 +6,7 @@ relating to user input, feedback from the console and token controls.
 """
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from builtins import FileNotFoundError
 import dotenv
 import pandas as pd
@@ -21,6 +22,8 @@ init()
 
 import settings
 from .canvas_helpers import log_failure
+from . import request_scheduler
+from .instrumentation import phase
 
 # CANVAS_INSTANCES = ['https://canvas.ubc.ca',
 #                     'https://ubc.test.instructure.com',
@@ -31,13 +34,16 @@ from .canvas_helpers import log_failure
 # (not needed if not using pylint)
 
 
-def get_user_settings():
+def get_user_settings(shard=None):
     """Handles console printouts and collecting user input
 
+    Args:
+        shard (Shard): only the courses of this shard (see sharding.py), if any
+
     Returns:
         dictionary: key-value pairs defining settings
                     (canvas obj., instance base_url,
-                    token, header and course id)
+                    token, header, course id and validated course objects)
 
     Exceptions Caught:
         InvalidAccessToken: if value for token is not set in .env file or if token value is not valid
@@ -48,50 +54,74 @@ def get_user_settings():
 
     """
     print("\n")
-    base_url = "https://canvas.ubc.ca"
+    base_url = settings.BASE_URL
 
     token = __load_token(base_url)
 
     canvas = Canvas(base_url, token)
+    request_scheduler.install(canvas)
     auth_header = {"Authorization": "Bearer " + token}
     course_ids = __load_ids()
-    courses = []
-    valid_cids = []
+    if shard is not None:
+        course_ids = [cid for cid in course_ids if shard.owns(cid)]
+        print("Shard {}: {} course(s)".format(shard, len(course_ids)))
     for cid in course_ids:
-
         settings.status[str(cid)] = {
             "cname": None,
             "status": "Not executed",
             "message": "Has not been run yet",
         }
-        try:
-            course = canvas.get_course(cid)
-        except InvalidAccessToken:
+
+    # every course is requested at the same time (the scheduler bounds what's in flight)
+    pool_size = settings.MAX_COURSE_WORKERS * settings.MAX_WORKERS
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        results = list(executor.map(lambda cid: __get_course(canvas, cid), course_ids))
+
+    courses = []
+    valid_cids = []
+    for cid, (course, error) in zip(course_ids, results):
+        if isinstance(error, InvalidAccessToken):
             __shut_down(
                 "Invalid Access Token: Please check that the token provided is correct and still active"
             )
-        except Unauthorized:
+        elif isinstance(error, Unauthorized):
             log_failure(cid, "User not authorized to get course data")
-        except TypeError:
+        elif isinstance(error, TypeError):
             log_failure(cid, 'Invalid type on course id: "' + str(cid) + '"')
-        except ResourceDoesNotExist:
+        elif isinstance(error, ResourceDoesNotExist):
             log_failure(cid, "Not Found Error: Please ensure correct course id")
         else:
             courses.append(course)
             valid_cids.append(cid)
 
+    usr_settings = {
+        "canvas": canvas,
+        "base_url": base_url,
+        "token": token,
+        "header": auth_header,
+        "course_ids": valid_cids,
+        "courses": dict(zip(valid_cids, courses)),
+    }
+
     if not courses:
-        __shut_down(
-            "Error: course_entitlements.csv must contain at least one valid course code"
-        )
+        if shard is None:
+            __shut_down(
+                "Error: course_entitlements.csv must contain at least one valid course code"
+            )
+        # a shard without valid courses still records its status for the merge
+        print("Shard {} has no valid courses to run".format(shard))
+        return usr_settings
 
-    course_names = __make_selected_courses_string(courses)
+    course_names = __make_selected_courses_string(list(courses))
     # if not admin:
     options = ["Yes, run for all courses", "Nevermind, end process"]
     title = "You have chosen to get Module Process: \n\n For: {} \n\n From: {}".format(
         course_names, base_url
     )
-    continue_confirm = pick(options, title)
+    if settings.CONFIRM_RUN:
+        continue_confirm = pick(options, title)
+    else:
+        continue_confirm = (options[0], 0)
 
     if continue_confirm[1] == 0:
         print(
@@ -103,13 +133,7 @@ def get_user_settings():
         print("Starting...")
         print("Getting module dataframe")
 
-        return {
-            "canvas": canvas,
-            "base_url": base_url,
-            "token": token,
-            "header": auth_header,
-            "course_ids": valid_cids,
-        }
+        return usr_settings
 
     print("Exiting user setup...")
     sys.exit()
@@ -137,6 +161,29 @@ def render_status_table():
     print(table)
 
 
+def render_request_stats(stats, cache_stats=None):
+    """Prints a one line summary of the Canvas requests made during the run
+
+    Args:
+        stats (dictionary): counters from RequestScheduler.stats()
+        cache_stats (dictionary): counters from ResponseCache.stats() (if the cache is on)
+    """
+    print(
+        "Canvas requests: {} (throttled: {}, server errors: {}, retried: {})".format(
+            stats["requests"],
+            stats["throttled"],
+            stats["server_errors"],
+            stats["retries"],
+        )
+    )
+    if cache_stats is not None:
+        print(
+            "Response cache: {} served from cache, {} not modified, {} fetched".format(
+                cache_stats["hits"], cache_stats["revalidated"], cache_stats["misses"]
+            )
+        )
+
+
 def __load_token(url):
     try:
         token = __read_token(url)
@@ -156,11 +203,25 @@ def __load_token(url):
     return token
 
 
+def __get_course(canvas, cid):
+    """Requests a course (in a worker thread)
+
+    Returns:
+        tuple: (Course, None) if the course could be requested, else (None, the error)
+    """
+    try:
+        with phase(cid, "course"):
+            return canvas.get_course(cid), None
+    except (InvalidAccessToken, Unauthorized, TypeError, ResourceDoesNotExist) as error:
+        return None, error
+
+
 def __load_ids():
     """Load course ids from .csv file
 
     Returns:
-        listof course_id: All course ids in the course_ids column
+        listof course_id: All course ids in the course_ids column, without duplicates
+                          (in the order they first appear)
 
     Exceptions Caught:
         FileNotFoundError: if there is no courses.csv file in src directory (SHUTS DOWN)
@@ -168,17 +229,10 @@ def __load_ids():
 
     """
 
-    cids = []
-
     try:
         entitlements_path = Path(f"{settings.ROOT_DIR}/course_entitlements.csv")
         dataframe = pd.read_csv(entitlements_path)
-        for index, row in dataframe.iterrows():
-            course_id = row["course_id"]
-
-            if course_id not in cids:
-                cids.append(course_id)
-        return cids
+        return dataframe["course_id"].drop_duplicates().tolist()
     except FileNotFoundError:
         __shut_down(
             "File Not Found: There must be a file named course_entitlements.csv in ROOT directory."
@@ -225,8 +279,8 @@ def __read_token(url):
     """
     dotenv.load_dotenv(dotenv.find_dotenv(".env"))
 
-    if url == "https://canvas.ubc.ca":
-        token = os.environ.get("CANVAS_API_TOKEN")
+    # canvas.ubc.ca (and any other BASE_URL)
+    token = os.environ.get("CANVAS_API_TOKEN")
 
     # if url == 'https://ubc.test.instructure.com':
     #     token = os.environ.get('CANVAS_API_TOKEN_TEST')
@@ -0,0 +1,298 @@
+"""
+Output formats for the tables written to data/<course id> and data/Tableau.
+
+settings.OUTPUT_FORMAT picks the format of a run:
+    * "csv" (default): what Tableau reads (module-progress.twb). Timestamps are written
+      as text in UTC (see timestamps.format_timestamps)
+    * "parquet": compressed, typed Arrow files (requires pyarrow). Ids stay integers
+      even with missing values and *_at columns are stored as UTC timestamps, so
+      loaders get the same dtypes back without parsing
+
+write_table and read_table take a path without extension, so callers don't need to
+know which format is in use:
+
+    write_table(dataframe, data_path / "module_data")
+    module_data = read_table(data_path / "module_data")
+
+TableWriter builds one table from many DataFrames without holding them all in memory:
+
+    writer = TableWriter(data_path / "module_data", columns)
+    writer.append(course_rows)   # for every course
+    writer.finish()
+
+pyarrow is only required for Parquet output:
+https://arrow.apache.org/docs/python/
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+import settings
+from .timestamps import format_timestamps
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - only needed for Parquet output
+    pyarrow = None
+
+
+# the numeric Canvas keys of the tables (not sis_user_id, login_id, integration_id)
+ID_COLUMNS = {
+    "id",
+    "user_id",
+    "course_id",
+    "module_id",
+    "student_id",
+    "items_id",
+    "items_module_id",
+    "items_content_id",
+    "assignment_id",
+    "content_id",
+}
+
+
+def write_table(dataframe, path, output_format=None):
+    """Writes a DataFrame in the run's output format
+
+    Args:
+        dataframe (DataFrame): the table to write
+        path (Path): file path without extension
+        output_format (string): "csv" or "parquet" (defaults to settings.OUTPUT_FORMAT)
+
+    Returns:
+        Path: the path written (with extension)
+    """
+    writer = _format(output_format or settings.OUTPUT_FORMAT)
+    # a table left over from a run in another format would shadow this one in read_table
+    for other in FORMATS.values():
+        if other is not writer:
+            Path(path).with_suffix(other.extension).unlink(missing_ok=True)
+    path = Path(path).with_suffix(writer.extension)
+    writer.write(dataframe, path)
+    return path
+
+
+def read_table(path):
+    """Reads a table written by write_table, in whichever format it was written
+
+    Args:
+        path (Path): file path without extension
+
+    Returns:
+        DataFrame: the table
+
+    Raises:
+        FileNotFoundError: if the table wasn't written in any known format
+    """
+    path = Path(path)
+    for writer in FORMATS.values():
+        candidate = path.with_suffix(writer.extension)
+        if candidate.exists():
+            return writer.read(candidate)
+    raise FileNotFoundError(f"No table found at {path}")
+
+
+def extension(output_format=None):
+    """Returns the file extension of an output format, EX. '.csv'"""
+    return _format(output_format or settings.OUTPUT_FORMAT).extension
+
+
+class TableWriter:
+    """Appends DataFrames to a single table file as they arrive
+
+    Rows are written to a .partial file that finish() renames into place, so readers
+    never see a half written table. Safe to append from several threads.
+
+    Args:
+        path (Path): file path without extension
+        columns (list of strings): the table's columns, in order; every appended
+                                   DataFrame is reindexed to them
+        output_format (string): "csv" or "parquet" (defaults to settings.OUTPUT_FORMAT)
+    """
+
+    def __init__(self, path, columns, output_format=None):
+        self.format = _format(output_format or settings.OUTPUT_FORMAT)
+        self.path = Path(path).with_suffix(self.format.extension)
+        self.partial_path = self.path.with_name(self.path.name + ".partial")
+        self.columns = list(columns)
+        self.rows = 0
+        self._appender = None
+        self._lock = threading.Lock()
+
+    def append(self, dataframe):
+        """Writes the rows of dataframe to the end of the table"""
+        dataframe = dataframe.reindex(columns=self.columns)
+        with self._lock:
+            if self._appender is None:
+                self._appender = self.format.appender(self.partial_path, self.columns)
+            self._appender.append(dataframe)
+            self.rows += len(dataframe)
+
+    def finish(self):
+        """Completes the table and moves it into place
+
+        Returns:
+            Path: the path written (with extension)
+        """
+        with self._lock:
+            if self._appender is None:
+                self._appender = self.format.appender(self.partial_path, self.columns)
+            self._appender.close()
+            for other in FORMATS.values():
+                if other is not self.format:
+                    Path(self.path).with_suffix(other.extension).unlink(missing_ok=True)
+            os.replace(self.partial_path, self.path)
+        return self.path
+
+    def abort(self):
+        """Discards the rows written so far (any previous table is left in place)"""
+        with self._lock:
+            if self._appender is not None:
+                self._appender.close()
+            self.partial_path.unlink(missing_ok=True)
+
+
+class CsvFormat:
+    extension = ".csv"
+
+    @staticmethod
+    def write(dataframe, path):
+        format_timestamps(dataframe, path.stem).to_csv(path, index=False)
+
+    @staticmethod
+    def appender(path, columns):
+        return _CsvAppender(path, columns)
+
+    @staticmethod
+    def read(path):
+        return pd.read_csv(path)
+
+
+class ParquetFormat:
+    extension = ".parquet"
+
+    @staticmethod
+    def write(dataframe, path):
+        if pyarrow is None:
+            raise RuntimeError(
+                'Parquet output requires pyarrow. Install it or set OUTPUT_FORMAT = "csv"'
+            )
+        _typed(dataframe).to_parquet(path, index=False, compression="zstd")
+
+    @staticmethod
+    def read(path):
+        return pd.read_parquet(path)
+
+    @staticmethod
+    def appender(path, columns):
+        if pyarrow is None:
+            raise RuntimeError(
+                'Parquet output requires pyarrow. Install it or set OUTPUT_FORMAT = "csv"'
+            )
+        return _ParquetAppender(path, columns)
+
+
+class _CsvAppender:
+    def __init__(self, path, columns):
+        # path is <table>.csv.partial
+        self.table = Path(path).name.split(".")[0]
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        pd.DataFrame(columns=columns).to_csv(self.file, index=False)
+
+    def append(self, dataframe):
+        format_timestamps(dataframe, self.table).to_csv(
+            self.file, header=False, index=False
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetAppender:
+    """Writes each appended DataFrame as a row group of one Parquet file
+
+    The schema comes from the first DataFrame (columns that are all empty there are
+    stored as strings); later DataFrames are cast to it.
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.writer = None
+
+    def append(self, dataframe):
+        table = pyarrow.Table.from_pandas(_typed(dataframe), preserve_index=False)
+        if self.writer is None:
+            schema = pyarrow.schema(
+                [
+                    field.with_type(pyarrow.string())
+                    if pyarrow.types.is_null(field.type)
+                    else field
+                    for field in table.schema
+                ]
+            ).remove_metadata()
+            self.writer = pyarrow.parquet.ParquetWriter(
+                self.path, schema, compression="zstd"
+            )
+        self.writer.write_table(table.cast(self.writer.schema, safe=False))
+
+    def close(self):
+        if self.writer is None:
+            self.append(pd.DataFrame(columns=self.columns))
+        self.writer.close()
+
+
+FORMATS = {"csv": CsvFormat, "parquet": ParquetFormat}
+
+
+def _format(output_format):
+    try:
+        return FORMATS[output_format]
+    except KeyError:
+        raise ValueError(
+            f'Unknown output format "{output_format}", expected one of: '
+            + ", ".join(FORMATS)
+        )
+
+
+def _typed(dataframe):
+    """Returns a copy of dataframe that Arrow can store with useful types
+
+    * *_at columns become UTC timestamps (Canvas times are UTC)
+    * Canvas id columns (ID_COLUMNS) holding whole numbers (as floats because of
+      missing values, or as strings) become Int64; other ids (EX. sis_user_id) are
+      institution codes and keep their text, leading zeros included
+    * lists and dicts (EX. a module's raw items) become JSON strings
+    * other object columns holding more than one type become strings
+    """
+    dataframe = dataframe.copy()
+    for col in dataframe.columns:
+        values = dataframe[col]
+        if col.endswith("_at"):
+            dataframe[col] = pd.to_datetime(values, errors="coerce", utc=True)
+        elif _is_id(col) and values.dtype.kind == "f":
+            if (values.dropna() % 1 == 0).all():
+                dataframe[col] = values.astype("Int64")
+        elif _is_id(col) and values.dropna().astype(str).str.isdigit().all():
+            dataframe[col] = pd.to_numeric(values).astype("Int64")
+        elif values.dtype == object:
+            types = {type(v) for v in values.dropna()}
+            if types & {list, dict}:
+                dataframe[col] = values.map(
+                    lambda v: json.dumps(v, default=str)
+                    if isinstance(v, (list, dict))
+                    else None
+                    if pd.isnull(v)
+                    else str(v)
+                )
+            elif len(types) > 1:
+                dataframe[col] = values.map(lambda v: v if pd.isnull(v) else str(v))
+    return dataframe
+
+
+def _is_id(col):
+    return col in ID_COLUMNS
@@ -0,0 +1,134 @@
+"""
+Compact records for the Canvas objects read in the per-student hot loop.
+
+Every student's modules arrive as canvasapi objects (or, with the async client, JSON
+dicts), each carrying a dict of attributes; a course with thousands of students keeps
+all of them in memory until the student module table is built. These classes keep
+only the attributes the script reads, in __slots__ (no per-object __dict__), with the
+values Canvas returned (ints, strings, booleans, None):
+
+    * Module: a module, as seen by one student when requested with student_id
+    * ModuleItem / CompletionRequirement: an item of a module and its requirement
+      (a student's items are read column by column, see Record.columns)
+    * Student / Enrollment: a student user and their course enrollment
+
+Records are built straight from the JSON (from_json) or from a canvasapi object
+(from_object). An attribute Canvas didn't send is None. They can be read with
+RecordBuilder like canvasapi objects, and pickled (EX. by the run checkpoint).
+"""
+
+
+class Record:
+    """Base of the record classes: one slot per attribute"""
+
+    __slots__ = ()
+
+    def __init__(self, **attributes):
+        for name in self.__slots__:
+            setattr(self, name, attributes.get(name))
+
+    @classmethod
+    def from_json(cls, data):
+        """Returns the record of a JSON object (dict) from the Canvas API"""
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(record, name, data.get(name))
+        return record
+
+    @classmethod
+    def columns(cls, data):
+        """Returns {attribute: list of values} of a list of JSON objects (dicts)
+
+        Reads many objects (EX. every item of a course) column by column, without
+        building a record per object.
+        """
+        return {
+            name: [element.get(name) for element in data] for name in cls.__slots__
+        }
+
+    @classmethod
+    def from_object(cls, theobj):
+        """Returns the record of a canvasapi object (or anything with the attributes)"""
+        if isinstance(theobj, cls):
+            return theobj
+        return cls.from_json(vars(theobj))
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        )
+        return f"{type(self).__name__}({values})"
+
+
+class Module(Record):
+    """A course module (state and completed_at are only set for a single student)
+
+    items is kept as the list of item dicts Canvas returned, since student_module_df
+    writes it as it is; ModuleItem.columns reads them when they are flattened.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "position",
+        "unlock_at",
+        "require_sequential_progress",
+        "publish_final_grade",
+        "prerequisite_module_ids",
+        "published",
+        "state",
+        "completed_at",
+        "items_count",
+        "items_url",
+        "items",
+        "course_id",
+    )
+
+
+class ModuleItem(Record):
+    """An item of a module (the attributes in the student items table)"""
+
+    __slots__ = (
+        "id",
+        "title",
+        "position",
+        "indent",
+        "type",
+        "module_id",
+        "completion_requirement",
+    )
+
+
+class CompletionRequirement(Record):
+    """What a student has to do to complete an item, and whether they did"""
+
+    __slots__ = ("type", "completed", "min_score")
+
+
+class Student(Record):
+    """A student user of a course"""
+
+    __slots__ = (
+        "id",
+        "name",
+        "created_at",
+        "sortable_name",
+        "short_name",
+        "sis_user_id",
+        "integration_id",
+        "login_id",
+        "pronouns",
+    )
+
+
+class Enrollment(Record):
+    """A student's enrollment in a course"""
+
+    __slots__ = ("created_at", "user_id", "updated_at", "last_activity_at")
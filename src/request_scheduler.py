@@ -0,0 +1,229 @@
+"""
+Rate-limit-aware scheduler that every Canvas request goes through.
+
+Canvas meters API use with a leaky bucket per token. Every response carries
+X-Rate-Limit-Remaining (what is left in the bucket) and X-Request-Cost, and once the
+bucket runs dry Canvas answers 403 "Rate Limit Exceeded":
+https://canvas.instructure.com/doc/api/file.throttling.html
+
+The scheduler limits how many requests are in flight and adapts that limit AIMD-style:
+every healthy response raises it a little (additive increase), while a throttled
+response or a bucket below settings.RATE_LIMIT_LOW_WATERMARK halves it (multiplicative
+decrease). Throttled and 5xx responses are retried with jittered exponential backoff.
+
+canvasapi requests are routed through it by mounting a SchedulingAdapter on the Canvas
+object's session (see install), behind the response cache when settings.CACHE_RESPONSES
+is on; the async client calls request_slot/handle directly. Both report every request sent to
+Canvas to instrumentation.record_request.
+
+    * scheduler is the run-wide RequestScheduler
+    * scheduler.stats() returns the request/throttle/retry counters
+"""
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from requests.adapters import HTTPAdapter
+
+import settings
+from . import instrumentation, response_cache
+
+
+class RequestScheduler:
+    """Bounds and adapts the number of concurrent Canvas requests
+
+    Args:
+        max_concurrency (int): upper bound of the in-flight limit
+        initial_concurrency (int): in-flight limit to start with
+        low_watermark (float): X-Rate-Limit-Remaining value under which the limit shrinks
+        max_retries (int): attempts after the first for throttled/5xx responses
+        backoff_base (float): seconds of the first backoff (doubled per attempt)
+        backoff_cap (float): maximum backoff in seconds
+    """
+
+    # don't shrink again before the requests already in flight have reported back
+    DECREASE_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        max_concurrency=None,
+        initial_concurrency=None,
+        low_watermark=None,
+        max_retries=None,
+        backoff_base=None,
+        backoff_cap=None,
+    ):
+        self.max_concurrency = max_concurrency or settings.MAX_CONCURRENT_REQUESTS
+        self.limit = float(
+            min(initial_concurrency or settings.INITIAL_CONCURRENT_REQUESTS, self.max_concurrency)
+        )
+        self.low_watermark = (
+            settings.RATE_LIMIT_LOW_WATERMARK if low_watermark is None else low_watermark
+        )
+        self.max_retries = settings.MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base or settings.BACKOFF_BASE
+        self.backoff_cap = backoff_cap or settings.BACKOFF_CAP
+        self.rate_limit_remaining = None
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._counters = {
+            "requests": 0,
+            "throttled": 0,
+            "server_errors": 0,
+            "retries": 0,
+            "request_cost": 0.0,
+        }
+
+    @contextmanager
+    def request_slot(self):
+        """Blocks until a request may be sent (for threads)"""
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def async_request_slot(self):
+        """Waits until a request may be sent (for coroutines)"""
+        delay = 0.001
+        while not self._try_acquire():
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def handle(self, status_code, headers, text, attempt):
+        """Records a response and decides whether it should be retried
+
+        Args:
+            status_code (int): HTTP status of the response
+            headers (Mapping): response headers
+            text (function): returns the response body (only called for 403s)
+            attempt (int): 0 for the first try, 1 for the first retry, ...
+
+        Returns:
+            float: seconds to wait before retrying, or None if the response is final
+        """
+        throttled = status_code == 403 and "Rate Limit Exceeded" in text()
+        server_error = status_code >= 500
+        remaining = _float_header(headers, "X-Rate-Limit-Remaining")
+        cost = _float_header(headers, "X-Request-Cost")
+
+        with self._condition:
+            self._counters["requests"] += 1
+            if cost is not None:
+                self._counters["request_cost"] += cost
+            if remaining is not None:
+                self.rate_limit_remaining = remaining
+
+            if throttled:
+                self._counters["throttled"] += 1
+                self._decrease()
+            elif remaining is not None and remaining < self.low_watermark:
+                self._decrease()
+            elif not server_error:
+                # additive increase: about +1 per limit's worth of healthy responses
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+            if server_error:
+                self._counters["server_errors"] += 1
+
+            if (throttled or server_error) and attempt < self.max_retries:
+                self._counters["retries"] += 1
+                return self.backoff(attempt)
+        return None
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff in seconds"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def stats(self):
+        """Returns a snapshot of the scheduler counters and current limits"""
+        with self._condition:
+            stats = dict(self._counters)
+            stats["concurrency_limit"] = int(self.limit)
+            stats["rate_limit_remaining"] = self.rate_limit_remaining
+        return stats
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease >= self.DECREASE_INTERVAL:
+            self.limit = max(1.0, self.limit / 2)
+            self._last_decrease = now
+
+    def _try_acquire(self):
+        with self._condition:
+            if self._in_flight >= int(self.limit):
+                return False
+            self._in_flight += 1
+            return True
+
+    def _release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+
+class SchedulingAdapter(HTTPAdapter):
+    """requests transport adapter that sends every request through a RequestScheduler"""
+
+    def __init__(self, request_scheduler, **kwargs):
+        self.request_scheduler = request_scheduler
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        attempt = 0
+        while True:
+            with self.request_scheduler.request_slot():
+                start = time.perf_counter()
+                response = super().send(request, **kwargs)
+                seconds = time.perf_counter() - start
+            instrumentation.record_request(
+                request.url, response.status_code, seconds, len(response.content), attempt
+            )
+            delay = self.request_scheduler.handle(
+                response.status_code, response.headers, lambda: response.text, attempt
+            )
+            if delay is None:
+                return response
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+
+def install(canvas):
+    """Routes every request made by a canvasapi Canvas object through the scheduler
+
+    Args:
+        canvas (canvasapi.Canvas): the Canvas obj. from Canvas Python API wrapper
+    """
+    # enough pooled connections for every worker thread that can send a request
+    pool_size = settings.MAX_COURSE_WORKERS * settings.MAX_WORKERS
+    adapter = SchedulingAdapter(
+        scheduler, pool_connections=pool_size, pool_maxsize=pool_size
+    )
+    if settings.CACHE_RESPONSES:
+        adapter = response_cache.CachingAdapter(adapter, response_cache.cache)
+    session = canvas._Canvas__requester._session
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def _float_header(headers, name):
+    value = headers.get(name)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+scheduler = RequestScheduler()
@@ -0,0 +1,277 @@
+"""
+Persistent cache of Canvas GET responses, shared by the canvasapi and async clients.
+
+Responses are stored in cache/ (one JSON file per url and token) and the most recently
+used ones are also kept in memory, so the same course looked up twice in a run (EX. by
+interface.get_user_settings and again by run_course) is only requested once.
+
+    * responses younger than settings.CACHE_TTL seconds are served without a request
+    * older responses that came with an ETag are revalidated with If-None-Match; a
+      304 Not Modified answer is served from the cache
+    * once the cache grows past settings.CACHE_MAX_MB the least recently used files
+      are deleted
+
+Progress endpoints (a student's modules, the course's student submissions, enrollments
+with their last activity) are never served without revalidating, so the cache can't
+hide a student's new completions.
+
+canvasapi requests are cached by wrapping the scheduling adapter in a CachingAdapter
+(see request_scheduler.install); the async client calls the cache directly.
+
+    * cache is the run-wide ResponseCache
+    * cache.stats() returns the hit/revalidation/miss counters
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+import settings
+
+# the stored body is already decoded, so these would no longer describe it
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+# urls that carry student progress: a student's modules, the bulk submissions of
+# bulk_progress (students/submissions?student_ids[]=all, the brackets may be escaped)
+# and the enrollments with their last activity
+_PROGRESS_URL_PARTS = (
+    "student_id=",
+    "student_ids",
+    "/students/submissions",
+    "/enrollments",
+)
+
+
+class ResponseCache:
+    """On-disk and in-memory cache of successful GET responses
+
+    Args:
+        directory (string): folder holding the cached responses
+        ttl (float): seconds a response is served without revalidating
+        max_bytes (int): size of the cache folder above which old responses are evicted
+        memory_entries (int): number of responses also kept in memory
+    """
+
+    def __init__(self, directory=None, ttl=None, max_bytes=None, memory_entries=None):
+        self.directory = Path(directory or f"{settings.ROOT_DIR}/cache")
+        self.ttl = settings.CACHE_TTL if ttl is None else ttl
+        self.max_bytes = (
+            settings.CACHE_MAX_MB * 2 ** 20 if max_bytes is None else max_bytes
+        )
+        self.memory_entries = (
+            settings.CACHE_MEMORY_ENTRIES if memory_entries is None else memory_entries
+        )
+        self._memory = OrderedDict()
+        self._sizes = None
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "revalidated": 0, "misses": 0, "evicted": 0}
+
+    @staticmethod
+    def key(authorization, url):
+        """Returns the cache key of a request (its full url, including the query string)"""
+        return hashlib.sha256(f"{authorization} {url}".encode()).hexdigest()
+
+    def lookup(self, key, url):
+        """Returns (entry, fresh) for a request
+
+        entry is None when nothing usable is cached. fresh is True when the entry can be
+        served without asking Canvas.
+        """
+        entry = self._load(key)
+        if entry is None:
+            with self._lock:
+                self._counters["misses"] += 1
+            return None, False
+
+        fresh = time.time() - entry["stored_at"] < self._ttl_for(url)
+        if fresh:
+            with self._lock:
+                self._counters["hits"] += 1
+            return entry, True
+        if not entry["headers"].get("etag"):
+            with self._lock:
+                self._counters["misses"] += 1
+            return None, False
+        return entry, False
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Returns the headers that ask Canvas whether entry is still current"""
+        if entry is None:
+            return {}
+        return {"If-None-Match": entry["headers"]["etag"]}
+
+    def store(self, key, url, headers, body):
+        """Caches a 200 response and returns its entry
+
+        Args:
+            key (string): from ResponseCache.key
+            url (string): the full request url
+            headers (Mapping): response headers
+            body (bytes): decoded response body
+        """
+        headers = {
+            name.lower(): value
+            for name, value in headers.items()
+            if name.lower() not in _DROPPED_HEADERS
+        }
+        entry = {
+            "url": url,
+            "stored_at": time.time(),
+            "headers": headers,
+            "body": body.decode("utf-8", "surrogateescape"),
+        }
+        # nothing to gain from keeping a progress response Canvas can't revalidate
+        if self._ttl_for(url) > 0 or headers.get("etag"):
+            self._save(key, entry)
+        return entry
+
+    def revalidated(self, key, entry):
+        """Marks a cached entry as current again (after a 304) and returns it"""
+        with self._lock:
+            self._counters["revalidated"] += 1
+        entry = dict(entry, stored_at=time.time())
+        self._save(key, entry)
+        return entry
+
+    @staticmethod
+    def body(entry):
+        """Returns the cached body as bytes"""
+        return entry["body"].encode("utf-8", "surrogateescape")
+
+    def stats(self):
+        """Returns a snapshot of the cache counters"""
+        with self._lock:
+            return dict(self._counters)
+
+    def _ttl_for(self, url):
+        if any(part in url for part in _PROGRESS_URL_PARTS):
+            return 0
+        return self.ttl
+
+    def _load(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._touch(key)
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                entry = json.load(file)
+            # the modification time orders the files for eviction in later runs
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._remember(key, entry)
+            self._touch(key)
+        return entry
+
+    def _save(self, key, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+        size = tmp_path.stat().st_size
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._remember(key, entry)
+            self._init_sizes()
+            self._sizes[key] = size
+            self._sizes.move_to_end(key)
+            self._evict()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _touch(self, key):
+        if self._sizes is not None and key in self._sizes:
+            self._sizes.move_to_end(key)
+
+    def _init_sizes(self):
+        # least recently used first, going by the files' modification times
+        if self._sizes is not None:
+            return
+        files = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        self._sizes = OrderedDict((p.stem, p.stat().st_size) for p in files)
+
+    def _evict(self):
+        total = sum(self._sizes.values())
+        while total > self.max_bytes and len(self._sizes) > 1:
+            key, size = self._sizes.popitem(last=False)
+            self._memory.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            total -= size
+            self._counters["evicted"] += 1
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+
+class CachingAdapter(BaseAdapter):
+    """requests transport adapter that answers GET requests from a ResponseCache
+
+    Args:
+        adapter (requests.adapters.BaseAdapter): sends the requests that can't be
+                                                 answered from the cache
+        response_cache (ResponseCache): the cache to use
+    """
+
+    def __init__(self, adapter, response_cache):
+        super().__init__()
+        self.adapter = adapter
+        self.cache = response_cache
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return self.adapter.send(request, **kwargs)
+
+        key = self.cache.key(request.headers.get("Authorization"), request.url)
+        entry, fresh = self.cache.lookup(key, request.url)
+        if fresh:
+            return _to_response(request, entry)
+
+        request.headers.update(self.cache.conditional_headers(entry))
+        response = self.adapter.send(request, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            return _to_response(request, self.cache.revalidated(key, entry))
+        if response.status_code == 200:
+            self.cache.store(key, request.url, response.headers, response.content)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+def _to_response(request, entry):
+    """Builds a requests Response from a cache entry"""
+    response = Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response._content = ResponseCache.body(entry)
+    response.encoding = "utf-8"
+    response.url = request.url
+    response.request = request
+    return response
+
+
+cache = ResponseCache()
@@ -0,0 +1,78 @@
+"""
+Compact dtypes for the item level tables (items_df and student_items_df).
+
+Those tables have a row per item (per student), so the same module names, titles and
+types repeat millions of times, and flatten_items leaves every item attribute as a
+string. apply_schema converts the columns listed in a schema to:
+
+    * "category": text with few distinct values (names, titles, types, states)
+    * "Int32" / "Int64": nullable integers for positions and ids
+    * "boolean": nullable booleans (item_cp_req_completed)
+
+Values and missing values are unchanged, so the CSV output is the same. Columns that
+aren't in the table are skipped, and a column whose values don't fit the type (EX. an
+id that isn't a number) is left as it is.
+"""
+import pandas as pd
+
+_ITEM_COLUMNS = {
+    "module_id": "Int64",
+    "module_name": "category",
+    "course_id": "Int64",
+    "items_id": "Int64",
+    "items_title": "category",
+    "items_position": "Int32",
+    "items_indent": "Int32",
+    "items_type": "category",
+    "items_module_id": "Int64",
+    "items_content_id": "Int64",
+}
+
+ITEMS_SCHEMA = dict(
+    _ITEM_COLUMNS,
+    items_completion_req_type="category",
+)
+
+STUDENT_ITEMS_SCHEMA = dict(
+    _ITEM_COLUMNS,
+    items_count="Int32",
+    module_position="Int32",
+    state="category",
+    # kept as text (like student_module_df), but only one value per student
+    student_id="category",
+    student_name="category",
+    item_cp_req_type="category",
+    item_cp_req_completed="boolean",
+    course_name="category",
+)
+
+_BOOLEANS = {True: True, False: False, "True": True, "False": False}
+
+
+def apply_schema(dataframe, schema):
+    """Converts the columns of dataframe named in schema to their compact dtype (in place)
+
+    Args:
+        dataframe (DataFrame): the table to convert
+        schema (dictionary): column name -> "category", "Int32", "Int64" or "boolean"
+
+    Returns:
+        DataFrame: dataframe
+    """
+    for col, dtype in schema.items():
+        if col not in dataframe.columns:
+            continue
+        values = dataframe[col]
+        try:
+            if dtype == "category":
+                dataframe[col] = values.astype("category")
+            elif dtype == "boolean":
+                booleans = values.map(_BOOLEANS)
+                if booleans.count() != values.count():
+                    continue
+                dataframe[col] = booleans.astype("boolean")
+            else:
+                dataframe[col] = pd.to_numeric(values).astype(dtype)
+        except (TypeError, ValueError):
+            pass
+    return dataframe
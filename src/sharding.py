@@ -0,0 +1,208 @@
+"""
+Sharded runs, for splitting the courses of course_entitlements.csv across machines:
+
+    python update_module_progress.py --shard 1/3    (on the first machine)
+    python update_module_progress.py --shard 2/3    (on the second one, ...)
+    python update_module_progress.py --merge        (once every shard has finished)
+
+    * a course belongs to shard crc32(course_id) % N + 1, so every machine picks the same
+      courses without talking to the others, and a course stays in the same shard
+      from one run to the next
+    * a shard only writes (and clears) the data/<course id> folders of its courses, its
+      own checkpoint and data/shards/shard-<i>-of-<N>/ with its status (status.csv, and
+      status.pkl for the merge); it doesn't write data/Tableau
+    * the merge builds data/Tableau (module_data, status.csv, course_entitlements.csv)
+      and its archive from the shards' course folders, like write_tableau_directory
+      after a normal run. Courses are appended in course_entitlements.csv order, so the
+      result doesn't depend on which shard finished first
+
+The machines can share the project folder (EX. a network drive) or copy their data/
+folders to the machine that merges: --merge takes those data/ folders as arguments and
+copies their course folders into this one.
+"""
+import datetime
+import os
+import pickle
+import shutil
+import zlib
+from pathlib import Path
+
+import pandas as pd
+
+import settings
+from .canvas_helpers import STUDENT_ITEMS_COLUMNS, _status_dataframe, log_failure
+from .output_formats import read_table
+from .schema import STUDENT_ITEMS_SCHEMA, apply_schema
+from .timestamps import parse_timestamps
+
+
+class Shard:
+    """Shard index of count (1-based)
+
+    Args:
+        index (int): this shard, from 1 to count
+        count (int): number of shards
+    """
+
+    def __init__(self, index, count):
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"Shard must be I/N with 1 <= I <= N, got {index}/{count}")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, spec):
+        """Returns the Shard of a spec like "2/4"
+
+        Raises:
+            ValueError: if spec isn't I/N with 1 <= I <= N
+        """
+        try:
+            index, count = (int(part) for part in spec.split("/"))
+        except ValueError:
+            raise ValueError(f'Shard must be I/N, EX. "2/4", got "{spec}"')
+        return cls(index, count)
+
+    @property
+    def name(self):
+        """Folder name of the shard, EX. shard-2-of-4"""
+        return f"shard-{self.index}-of-{self.count}"
+
+    def owns(self, cid):
+        """Returns True if the course belongs to this shard"""
+        return shard_index(cid, self.count) == self.index
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+
+def shard_index(cid, count):
+    """Returns the shard (1 to count) a course id belongs to
+
+    crc32 rather than hash(), which is salted per process.
+    """
+    return zlib.crc32(str(cid).strip().encode()) % count + 1
+
+
+class NoModuleData:
+    """Stands in for ModuleDataWriter when module_data is built later from the course
+    folders (by --merge after a shard run, or by the daemon when it publishes)"""
+
+    def append(self, dataframe):
+        pass
+
+    def abort(self):
+        pass
+
+
+def write_shard_status(shard):
+    """Writes the shard's status (settings.status) to data/shards/<shard name>/
+
+    status.pkl is what merge_shards reads; status.csv (also copied to status_log/) is
+    for people.
+    """
+    current_dt = datetime.datetime.now()
+    shard_path = Path(f"{settings.ROOT_DIR}/data/shards/{shard.name}")
+    os.makedirs(shard_path, exist_ok=True)
+
+    with settings.status_lock:
+        status = {cid: dict(info) for cid, info in settings.status.items()}
+    saved = {"shard": str(shard), "finished_at": current_dt, "status": status}
+    partial = shard_path / "status.pkl.partial"
+    with open(partial, "wb") as file:
+        pickle.dump(saved, file)
+    os.replace(partial, shard_path / "status.pkl")
+
+    dataframe = _status_dataframe(current_dt)
+    dataframe.to_csv(shard_path / "status.csv", index=False)
+    file_name = current_dt.strftime("%Y-%m-%d--%H-%M-%S") + f"--{shard.name}.csv"
+    dataframe.to_csv(Path(f"{settings.ROOT_DIR}/status_log/{file_name}"), index=False)
+
+
+def merge_shards(module_data, data_paths=None):
+    """Appends every shard's courses to module_data and restores their status
+
+    settings.status gets an entry per course of course_entitlements.csv, in its order;
+    a course no shard ran is marked as failed. When a course was run by several
+    shards (EX. an old run with another number of shards), the latest one is used.
+
+    Args:
+        module_data (ModuleDataWriter): from open_module_data
+        data_paths (list of Path): the data/ folders holding the shards' output
+                                   (defaults to this project's data/)
+
+    Returns:
+        int: number of shards found
+    """
+    data_path = Path(f"{settings.ROOT_DIR}/data")
+    data_paths = [Path(path) for path in data_paths or [data_path]]
+
+    # course id -> (finished_at, status, data folder holding the course)
+    found = {}
+    shard_count = 0
+    for path in data_paths:
+        for status_path in sorted(path.glob("shards/*/status.pkl")):
+            with open(status_path, "rb") as file:
+                saved = pickle.load(file)
+            shard_count += 1
+            print(
+                "Shard {}: {} course(s), finished {:%Y-%m-%d %H:%M:%S}".format(
+                    saved["shard"], len(saved["status"]), saved["finished_at"]
+                )
+            )
+            for cid, info in saved["status"].items():
+                if cid not in found or found[cid][0] < saved["finished_at"]:
+                    found[cid] = (saved["finished_at"], info, path)
+
+    with settings.status_lock:
+        settings.status.clear()
+    for cid in _load_ids():
+        if cid not in found:
+            with settings.status_lock:
+                settings.status[cid] = {
+                    "cname": None,
+                    "status": "Failed",
+                    "message": "No shard has output for this course",
+                }
+            continue
+        finished_at, info, path = found[cid]
+        info = dict(info)
+        info.setdefault("updated_on", finished_at)
+        with settings.status_lock:
+            settings.status[cid] = info
+        if info["status"] != "Success":
+            continue
+        if not (path / cid).exists():
+            log_failure(cid, "The shard's course folder is missing: " + str(path / cid))
+            continue
+        if path.resolve() != data_path.resolve():
+            shutil.rmtree(data_path / cid, ignore_errors=True)
+            shutil.copytree(path / cid, data_path / cid)
+        module_data.append(read_student_items(data_path / cid / "student_items_df"))
+    return shard_count
+
+
+def read_student_items(path):
+    """Reads a course's student_items_df back with the dtypes it was written from
+
+    CSV values are read as text (only empty values become missing), so writing them
+    again gives the same text.
+
+    Args:
+        path (Path): file path without extension
+    """
+    csv_path = Path(path).with_suffix(".csv")
+    if csv_path.exists():
+        dataframe = pd.read_csv(
+            csv_path, dtype=str, keep_default_na=False, na_values=[""]
+        )
+    else:
+        dataframe = read_table(path)
+    parse_timestamps(dataframe, [col for col in STUDENT_ITEMS_COLUMNS if col.endswith("_at")])
+    return apply_schema(dataframe, STUDENT_ITEMS_SCHEMA)
+
+
+def _load_ids():
+    """Returns the course ids (strings) of course_entitlements.csv, in order"""
+    dataframe = pd.read_csv(Path(f"{settings.ROOT_DIR}/course_entitlements.csv"))
+    return [str(cid) for cid in dataframe["course_id"].drop_duplicates()]
@@ -0,0 +1,188 @@
+"""
+Star schema output for data/Tableau (settings.OUTPUT_SCHEMA = "star").
+
+module_data repeats every course, module and item attribute on each student's row. In
+star mode it is split into a narrow fact table and one table per dimension, each row
+written once:
+
+    * fact_progress: course_id, module_id, items_id, student_id, state, completed_at,
+      item_cp_req_completed (one row per student and item, like module_data)
+    * dim_courses: course_id, course_name
+    * dim_modules: module_id, course_id, module_name, module_position, items_count,
+      unlock_at
+    * dim_items: items_id, module_id, items_title, items_position, items_indent,
+      items_type, items_module_id, item_cp_req_type
+    * dim_students: student_id, student_name
+
+The columns keep their module_data names, so joining fact_progress to the dimensions
+on their ids gives back module_data (the calculated fields of module-progress.twb keep
+working). dim_modules and dim_items are read from the course's module_df and items_df
+(data/<course id>/, written before its student items are appended), so they also hold
+the modules and items no student row references. Courses and students only exist in
+the student items, so dim_courses and dim_students are taken from them.
+"""
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from .output_formats import FORMATS, TableWriter, read_table
+
+FACT_TABLE = "fact_progress"
+FACT_COLUMNS = [
+    "course_id",
+    "module_id",
+    "items_id",
+    "student_id",
+    "state",
+    "completed_at",
+    "item_cp_req_completed",
+]
+# table -> (key column, columns)
+DIMENSIONS = {
+    "dim_courses": ("course_id", ["course_id", "course_name"]),
+    "dim_modules": (
+        "module_id",
+        [
+            "module_id",
+            "course_id",
+            "module_name",
+            "module_position",
+            "items_count",
+            "unlock_at",
+        ],
+    ),
+    "dim_items": (
+        "items_id",
+        [
+            "items_id",
+            "module_id",
+            "items_title",
+            "items_position",
+            "items_indent",
+            "items_type",
+            "items_module_id",
+            "item_cp_req_type",
+        ],
+    ),
+    "dim_students": ("student_id", ["student_id", "student_name"]),
+}
+TABLES = [FACT_TABLE] + list(DIMENSIONS)
+# dimension -> the course folder table it is read from
+COURSE_TABLES = {"dim_modules": "module_df", "dim_items": "items_df"}
+# course folder column -> its module_data name
+COURSE_COLUMNS = {"items_completion_req_type": "item_cp_req_type"}
+
+
+def split_student_items(student_items):
+    """Returns {table name: DataFrame} with the facts, courses and students of student items
+
+    Dimension rows are unique by their key within student_items. dim_modules and
+    dim_items come from the course folder instead (see read_course_dimensions).
+
+    Args:
+        student_items (DataFrame): a student items table (STUDENT_ITEMS_COLUMNS)
+    """
+    tables = {FACT_TABLE: student_items[FACT_COLUMNS]}
+    for name, (key, columns) in DIMENSIONS.items():
+        if name not in COURSE_TABLES:
+            tables[name] = _unique(student_items[columns], key)
+    return tables
+
+
+def read_course_dimensions(course_path):
+    """Returns {table name: DataFrame} with the dim_modules and dim_items rows of a course
+
+    CSV values are read as text (only empty values become missing), so they are
+    written again unchanged. Rows without a key (EX. the items_df row of a module
+    without items) are dropped.
+
+    Args:
+        course_path (Path): the course folder, data/<course id>
+    """
+    tables = {}
+    for name, table in COURSE_TABLES.items():
+        key, columns = DIMENSIONS[name]
+        path = Path(course_path) / table
+        csv_path = path.with_suffix(".csv")
+        if csv_path.exists():
+            dataframe = pd.read_csv(
+                csv_path, dtype=str, keep_default_na=False, na_values=[""]
+            )
+        else:
+            dataframe = read_table(path)
+        dataframe = dataframe.rename(columns=COURSE_COLUMNS)
+        tables[name] = _unique(dataframe[columns], key)
+    return tables
+
+
+def _unique(dataframe, key):
+    """Returns the rows of dataframe with a key, one per key"""
+    return dataframe.dropna(subset=[key]).drop_duplicates(subset=[key])
+
+
+class StarWriter:
+    """Writes the star schema tables one course at a time
+
+    Drop-in replacement for the module_data TableWriter: same append/finish/abort.
+    The first time a course's rows are appended its modules and items are read from
+    its course folder. Dimension rows already written by an earlier course (EX. a
+    student enrolled in two courses) are skipped. Safe to append from several threads.
+
+    Args:
+        tableau_path (Path): the Tableau output directory
+        data_path (Path): the folder holding the course folders (defaults to the
+                          parent of tableau_path, EX. data/)
+    """
+
+    def __init__(self, tableau_path, data_path=None):
+        self.data_path = Path(data_path or Path(tableau_path).parent)
+        self.tables = {FACT_TABLE: TableWriter(tableau_path / FACT_TABLE, FACT_COLUMNS)}
+        for name, (_, columns) in DIMENSIONS.items():
+            self.tables[name] = TableWriter(tableau_path / name, columns)
+        self._written = {name: set() for name in DIMENSIONS}
+        self._courses = set()
+        self._lock = threading.Lock()
+
+    def append(self, student_items):
+        """Writes a course's student items as facts and new dimension rows"""
+        tables = split_student_items(student_items)
+        with self._lock:
+            for cid in student_items["course_id"].dropna().astype(str).unique():
+                if cid not in self._courses:
+                    self._courses.add(cid)
+                    course = read_course_dimensions(self.data_path / cid)
+                    for name, dataframe in course.items():
+                        if name in tables:
+                            dataframe = _unique(
+                                pd.concat([tables[name], dataframe]), DIMENSIONS[name][0]
+                            )
+                        tables[name] = dataframe
+            for name, dataframe in tables.items():
+                if name in DIMENSIONS:
+                    keys = dataframe[DIMENSIONS[name][0]].astype(str)
+                    new = ~keys.isin(self._written[name])
+                    dataframe = dataframe[new]
+                    self._written[name].update(keys[new])
+                self.tables[name].append(dataframe)
+
+    def finish(self):
+        """Completes every table and moves it into place"""
+        with self._lock:
+            for table in self.tables.values():
+                table.finish()
+
+    def abort(self):
+        """Discards the rows written so far (any previous tables are left in place)"""
+        with self._lock:
+            for table in self.tables.values():
+                table.abort()
+
+
+def remove_tables(tableau_path):
+    """Deletes star schema tables left in tableau_path by an earlier star mode run"""
+    for name in TABLES:
+        for output_format in FORMATS.values():
+            (tableau_path / name).with_suffix(output_format.extension).unlink(
+                missing_ok=True
+            )
@@ -0,0 +1,82 @@
+"""
+Timestamp handling for the Canvas tables.
+
+Canvas returns times as ISO 8601 strings in UTC, EX. 2020-02-01T12:30:00Z. They are
+parsed into tz-aware (UTC) datetime64 columns as soon as a table is built, so sorting,
+comparing and summarizing them (EX. the latest completion of a course) is vectorized.
+They are only turned back into text when a table is written to CSV (see
+output_formats.py), the way the CSVs have always shown them:
+
+    * completed_at of the student item tables (module_data, student_items_df, and
+      the fact_progress and changes tables built from them) in CSV_DATE_FORMAT, which
+      module-progress.twb reads as a date & time
+    * every other timestamp (EX. unlock_at, created_at) as Canvas sent it, in
+      CANVAS_DATE_FORMAT; module-progress.twb reads unlock_at as a string
+"""
+import pandas as pd
+
+CSV_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+CANVAS_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+# table name -> its columns written in CSV_DATE_FORMAT
+CSV_DATE_COLUMNS = {
+    "module_data": ["completed_at"],
+    "student_items_df": ["completed_at"],
+    "fact_progress": ["completed_at"],
+    "changes": ["completed_at", "detected_at"],
+}
+
+
+def parse_timestamps(dataframe, columns):
+    """Parses Canvas timestamp columns into UTC datetime64 columns (in place)
+
+    Missing (and unparseable) values become NaT. Columns that aren't in dataframe are
+    skipped.
+
+    Args:
+        dataframe (DataFrame): the table holding the columns
+        columns (list of strings): names of the timestamp columns
+
+    Returns:
+        DataFrame: dataframe
+    """
+    for col in columns:
+        if col in dataframe.columns:
+            dataframe[col] = pd.to_datetime(
+                dataframe[col], utc=True, format="ISO8601", errors="coerce"
+            )
+    return dataframe
+
+
+def format_timestamps(dataframe, table):
+    """Returns dataframe with its timestamp columns as text, for a CSV file
+
+    Args:
+        dataframe (DataFrame): the rows to write
+        table (string): the table's name, EX. module_data (see CSV_DATE_COLUMNS)
+
+    Returns:
+        DataFrame: dataframe itself if it has no timestamp column, otherwise a copy
+    """
+    formatted = None
+    for col in dataframe.columns:
+        values = dataframe[col]
+        if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+            continue
+        if formatted is None:
+            formatted = dataframe.copy(deep=False)
+        if values.dt.tz is not None:
+            values = values.dt.tz_convert("UTC")
+        date_format = (
+            CSV_DATE_FORMAT
+            if col in CSV_DATE_COLUMNS.get(table, ())
+            else CANVAS_DATE_FORMAT
+        )
+        formatted[col] = values.dt.strftime(date_format)
+    return dataframe if formatted is None else formatted
+
+
+def format_timestamp(value):
+    """Returns a timestamp formatted like in the CSV output (None if missing)"""
+    if pd.isnull(value):
+        return None
+    return value.strftime(CSV_DATE_FORMAT)
@@ -0,0 +1,69 @@
+"""
+Fixtures shared by the tests: a local FakeCanvas (benchmarks/fake_canvas.py) and a
+ROOT_DIR of their own, so the tests never talk to a real Canvas or write into the repo.
+"""
+import pytest
+
+import settings
+from benchmarks.fake_canvas import FakeCanvas
+
+
+@pytest.fixture
+def root_dir(tmp_path, monkeypatch):
+    """Points settings.ROOT_DIR at a temporary folder and returns it"""
+    monkeypatch.setattr(settings, "ROOT_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def fake_canvas():
+    """Returns a function that serves SyntheticCourse objects and returns the server
+
+    Every server started is stopped after the test.
+    """
+    servers = []
+
+    def serve(courses, **kwargs):
+        server = FakeCanvas(courses, **kwargs)
+        server.start()
+        servers.append(server)
+        return server
+
+    yield serve
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def run_module_progress(tmp_path, monkeypatch):
+    """Returns a function that runs update_module_progress against a FakeCanvas
+
+    run(server, course_ids, name, shard=None, resume=False, **overrides) sets up a project folder
+    tmp_path/name (course_entitlements.csv, data/Tableau, archive, status_log), points
+    the settings at it and at the server (overrides are other settings, EX.
+    STUDENT_CHUNK_SIZE=5), runs main and returns the folder. The same name can be run
+    again, like a later run of the script.
+    """
+    import update_module_progress
+
+    monkeypatch.setenv("CANVAS_API_TOKEN", "any-token")
+    monkeypatch.setattr(settings, "CONFIRM_RUN", False)
+    monkeypatch.setattr(settings, "CACHE_RESPONSES", False)
+
+    def run(server, course_ids, name, shard=None, resume=False, **overrides):
+        root = tmp_path / name
+        for folder in ("data/Tableau", "archive", "status_log"):
+            (root / folder).mkdir(parents=True, exist_ok=True)
+        lines = ["user_id,course_id"] + [f"u,{cid}" for cid in course_ids]
+        (root / "course_entitlements.csv").write_text("\n".join(lines) + "\n")
+
+        monkeypatch.setattr(settings, "ROOT_DIR", str(root))
+        monkeypatch.setattr(settings, "BASE_URL", server.base_url)
+        for setting, value in overrides.items():
+            monkeypatch.setattr(settings, setting, value)
+        settings.status.clear()
+        update_module_progress.main(resume=resume, shard=shard)
+        return root
+
+    yield run
+    settings.status.clear()
@@ -0,0 +1,134 @@
+import datetime
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import settings
+from src import archive
+
+
+@pytest.fixture
+def archive_root(tmp_path, monkeypatch):
+    """Points the archive at tmp_path/archive, with small chunks so the test files are cut"""
+    monkeypatch.setattr(settings, "ROOT_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "ARCHIVE_KEEP_RUNS", None)
+    monkeypatch.setattr(settings, "ARCHIVE_KEEP_DAYS", None)
+    monkeypatch.setattr(archive, "MIN_CHUNK_BYTES", 4 << 10)
+    monkeypatch.setattr(archive, "MAX_CHUNK_BYTES", 32 << 10)
+    monkeypatch.setattr(archive, "CUT_MODULUS", 64)
+    monkeypatch.setattr(archive, "BLOCK_BYTES", 16 << 10)
+    monkeypatch.setattr(archive, "SCAN_BYTES", 8 << 10)
+    return tmp_path
+
+
+def module_data(courses=3, students=200, edit=None):
+    """Returns a module_data like CSV (course_id in the second column)"""
+    lines = [b"student_id,course_id,items_title,state,completed_at\n"]
+    for course in range(1, courses + 1):
+        for student in range(students):
+            for item in range(3):
+                state = b"completed" if (student + item) % 3 else b"started"
+                if (course, student, item) == edit:
+                    state = b"locked"
+                lines.append(
+                    b"%d,%d,Item %d,%s,2020-02-%02dT10:30:00Z\n"
+                    % (student, course, item, state, 1 + student % 28)
+                )
+    return b"".join(lines)
+
+
+def write_tableau(path, csv, binary=b""):
+    os.makedirs(path, exist_ok=True)
+    (path / "module_data.csv").write_bytes(csv)
+    (path / "module_progress.hyper").write_bytes(binary)
+
+
+def test_restore_gives_back_the_archived_bytes(archive_root):
+    tableau_path = archive_root / "data/Tableau"
+    csv = module_data()
+    binary = np.random.default_rng(0).bytes(50 << 10)
+    write_tableau(tableau_path, csv, binary)
+
+    manifest = archive.archive_directory(tableau_path, run="2020-02-01--12-30-00")
+    assert all(len(entry["chunks"]) > 1 for entry in manifest["files"])
+
+    destination = archive_root / "restored"
+    os.makedirs(destination)
+    (destination / "stale.csv").write_bytes(b"not part of the run\n")
+    archive.restore("2020-02-01--12-30-00", destination)
+    assert sorted(os.listdir(destination)) == ["module_data.csv", "module_progress.hyper"]
+    assert (destination / "module_data.csv").read_bytes() == csv
+    assert (destination / "module_progress.hyper").read_bytes() == binary
+
+
+def test_a_small_edit_only_stores_a_few_new_chunks(archive_root):
+    tableau_path = archive_root / "data/Tableau"
+    write_tableau(tableau_path, module_data())
+    first = archive.archive_directory(tableau_path, run="2020-02-01--12-30-00")
+
+    write_tableau(tableau_path, module_data(edit=(2, 100, 1)))
+    second = archive.archive_directory(tableau_path, run="2020-02-02--12-30-00")
+
+    chunks = second["files"][0]["chunks"]
+    assert len(chunks) > 10
+    assert second["new_chunks"] == 1
+    assert len(set(chunks) - set(first["files"][0]["chunks"])) == 1
+    archive.restore("2020-02-01--12-30-00")
+    assert (tableau_path / "module_data.csv").read_bytes() == module_data()
+
+
+def test_retention_removes_old_runs_and_their_chunks(archive_root, monkeypatch):
+    tableau_path = archive_root / "data/Tableau"
+    runs = ["2020-02-01--12-30-00", "2020-02-02--12-30-00", "2020-02-03--12-30-00"]
+    manifests = []
+    for number, run in enumerate(runs):
+        write_tableau(tableau_path, module_data(courses=1, students=20 + number))
+        manifests.append(archive.archive_directory(tableau_path, run=run))
+    assert archive.list_runs() == runs
+
+    monkeypatch.setattr(settings, "ARCHIVE_KEEP_RUNS", 2)
+    assert archive.apply_retention() == [runs[0]]
+    assert archive.list_runs() == runs[1:]
+    stored = {path.name for path in (archive_root / "archive/objects").glob("*/*")}
+    kept = {
+        chunk
+        for manifest in manifests[1:]
+        for entry in manifest["files"]
+        for chunk in entry["chunks"]
+    }
+    assert stored == kept
+
+    # older than a day, but the newest run is always kept
+    monkeypatch.setattr(settings, "ARCHIVE_KEEP_RUNS", None)
+    monkeypatch.setattr(settings, "ARCHIVE_KEEP_DAYS", 1)
+    assert archive.apply_retention(now=datetime.datetime(2020, 3, 1)) == [runs[1]]
+    assert archive.list_runs() == [runs[2]]
+    archive.restore(runs[2])
+    assert (tableau_path / "module_data.csv").read_bytes() == module_data(
+        courses=1, students=22
+    )
+
+
+def test_files_split_in_several_threads_at_once_cut_the_same(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "_powers", archive._powers)
+    path = tmp_path / "module_data.csv"
+    path.write_bytes(module_data())
+    expected = list(archive.split_file(path))
+
+    results = []
+    barrier = threading.Barrier(8)
+
+    def split():
+        barrier.wait()
+        results.append(list(archive.split_file(path)))
+
+    # every thread finds the power table empty and grows it
+    archive._powers = (np.ones(0, dtype=np.uint32), np.ones(0, dtype=np.uint32))
+    threads = [threading.Thread(target=split) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [expected] * 8
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+from canvasapi.exceptions import (
+    BadRequest,
+    CanvasException,
+    Conflict,
+    Forbidden,
+    InvalidAccessToken,
+    ResourceDoesNotExist,
+    Unauthorized,
+    UnprocessableEntity,
+)
+
+import settings
+from src.async_canvas import AsyncCanvasClient
+
+httpx = pytest.importorskip("httpx")
+
+MODULES = [{"id": 1, "name": "Module 1", "position": 1, "items": []}]
+
+
+@pytest.fixture
+def canvas(monkeypatch):
+    """Returns a function making an AsyncCanvasClient answered by handler(request)"""
+    monkeypatch.setattr(settings, "CACHE_RESPONSES", False)
+    clients = []
+
+    def make(handler):
+        client = AsyncCanvasClient("https://canvas.example.com", "any-token")
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+@pytest.mark.parametrize(
+    "status, headers, error",
+    [
+        (400, {}, BadRequest),
+        (401, {}, Unauthorized),
+        (401, {"WWW-Authenticate": 'Bearer realm="canvas-lms"'}, InvalidAccessToken),
+        (403, {}, Forbidden),
+        (404, {}, ResourceDoesNotExist),
+        (409, {}, Conflict),
+        (422, {}, UnprocessableEntity),
+        (418, {}, CanvasException),
+    ],
+)
+def test_error_responses_raise_the_canvasapi_exceptions(canvas, status, headers, error):
+    client = canvas(
+        lambda request: httpx.Response(
+            status, headers=headers, json={"errors": [{"message": "no"}]}
+        )
+    )
+    with pytest.raises(error):
+        client.get_modules(1)
+
+
+def test_results_are_handed_over_off_the_event_loop(canvas):
+    client = canvas(lambda request: httpx.Response(200, json=MODULES))
+    threads = {}
+
+    def on_result(student_id, modules):
+        threads[student_id] = threading.get_ident()
+
+    results = client.get_student_modules(1, [10, 11, 12], on_result=on_result)
+    assert [len(modules) for modules in results] == [1, 1, 1]
+    assert sorted(threads) == [10, 11, 12]
+    assert client._thread.ident not in threads.values()
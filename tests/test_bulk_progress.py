@@ -0,0 +1,150 @@
+import pandas as pd
+import pytest
+from canvasapi import Canvas
+
+import settings
+from benchmarks.fake_canvas import SyntheticCourse
+from src.bulk_progress import get_student_module_status_bulk, supports_bulk_progress
+from src.canvas_helpers import (
+    get_modules,
+    get_student_items_status,
+    get_student_module_status,
+)
+
+
+pytestmark = pytest.mark.filterwarnings(
+    "ignore:Canvas may respond unexpectedly when making requests to HTTP URLs:UserWarning"
+)
+
+
+@pytest.fixture(autouse=True)
+def no_cache(root_dir, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_RESPONSES", False)
+
+
+def test_bulk_progress_matches_per_student(fake_canvas):
+    synthetic = SyntheticCourse(
+        1,
+        students=30,
+        modules=4,
+        items=5,
+        requirement_types=["must_submit", "min_score"],
+        sequential=True,
+        future_modules=1,
+    )
+    server = fake_canvas([synthetic])
+    course = Canvas(server.base_url, "any-token").get_course(synthetic.id)
+    modules_df = get_modules(course)
+    assert supports_bulk_progress(modules_df)
+
+    requests_before = server.request_count
+    per_student = get_student_items_status(course, get_student_module_status(course))
+    per_student_requests = server.request_count - requests_before
+
+    requests_before = server.request_count
+    bulk = get_student_items_status(
+        course, get_student_module_status_bulk(course, modules_df)
+    )
+    bulk_requests = server.request_count - requests_before
+
+    assert bulk.to_csv(index=False) == per_student.to_csv(index=False)
+    assert bulk_requests < per_student_requests
+    assert {"locked", "unlocked", "started", "completed"} <= set(per_student["state"])
+
+
+def test_requirements_only_visible_per_student_are_not_supported(fake_canvas):
+    synthetic = SyntheticCourse(
+        1, students=2, modules=2, items=2, requirement_types=["must_view", "must_submit"]
+    )
+    server = fake_canvas([synthetic])
+    course = Canvas(server.base_url, "any-token").get_course(synthetic.id)
+    assert not supports_bulk_progress(get_modules(course))
+
+
+class GradedCourse(SyntheticCourse):
+    """Three sequential modules of a must_submit item and a min_score item (5 points);
+    the last one unlocks in the future. Its submissions are given, not derived from
+    the per-student progress."""
+
+    def __init__(self, submissions):
+        super().__init__(
+            1,
+            students=3,
+            modules=3,
+            items=2,
+            requirement_types=["must_submit", "min_score"],
+            sequential=True,
+            future_modules=1,
+        )
+        self.given = submissions
+
+    def submissions_json(self):
+        return [
+            {
+                "id": number,
+                "user_id": user_id,
+                "assignment_id": assignment_id,
+                "workflow_state": "submitted" if score is None else "graded",
+                "submitted_at": at,
+                "graded_at": None if score is None else at,
+                "score": score,
+            }
+            for number, (user_id, assignment_id, at, score) in enumerate(self.given, 1)
+        ]
+
+
+# the students, and the ids of each module's must_submit and min_score items
+A, B, C = 100000, 100001, 100002
+M0_SUBMIT, M0_SCORE, M1_SUBMIT, M1_SCORE, M2_SUBMIT, M2_SCORE = (
+    100000, 100001, 100100, 100101, 100200, 100201
+)
+
+
+def test_bulk_progress_states(fake_canvas):
+    server = fake_canvas(
+        [
+            GradedCourse(
+                [
+                    (A, M0_SUBMIT, "2020-02-01T10:00:00Z", None),
+                    (A, M0_SCORE, "2020-02-03T10:00:00Z", 6.0),
+                    (A, M1_SUBMIT, "2020-02-05T10:00:00Z", None),
+                    (A, M1_SCORE, "2020-02-04T10:00:00Z", 5.0),
+                    (A, M2_SUBMIT, "2020-02-06T10:00:00Z", None),
+                    (A, M2_SCORE, "2020-02-06T10:00:00Z", 9.0),
+                    (B, M0_SUBMIT, "2020-02-01T10:00:00Z", None),
+                    (B, M0_SCORE, "2020-02-02T10:00:00Z", 3.0),
+                    (B, M1_SUBMIT, "2020-02-02T10:00:00Z", None),
+                    (B, M1_SCORE, "2020-02-02T10:00:00Z", 8.0),
+                    (C, M0_SCORE, "2020-02-02T10:00:00Z", 4.9),
+                ]
+            )
+        ]
+    )
+    course = Canvas(server.base_url, "any-token").get_course(1)
+    status = get_student_module_status_bulk(course, get_modules(course))
+
+    progress = {
+        (int(row.student_id), row.module_id % 1000): (
+            row.state,
+            None if pd.isnull(row.completed_at) else row.completed_at.isoformat(),
+        )
+        for row in status.itertuples()
+    }
+    assert progress == {
+        # completed when the last requirement was met; the last module isn't unlocked yet
+        (A, 0): ("completed", "2020-02-03T10:00:00+00:00"),
+        (A, 1): ("completed", "2020-02-05T10:00:00+00:00"),
+        (A, 2): ("locked", None),
+        # a score below the minimum doesn't complete the first module, so the second
+        # one stays locked although its requirements are met
+        (B, 0): ("started", None),
+        (B, 1): ("locked", None),
+        (B, 2): ("locked", None),
+        (C, 0): ("unlocked", None),
+        (C, 1): ("locked", None),
+        (C, 2): ("locked", None),
+    }
+
+    items = status[(status["student_id"] == str(B)) & (status["module_id"] == 1000)]
+    requirements = [item["completion_requirement"] for item in items["items"].iloc[0]]
+    assert [requirement["completed"] for requirement in requirements] == [True, False]
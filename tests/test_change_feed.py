@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from benchmarks.fake_canvas import SyntheticCourse
+
+pytestmark = pytest.mark.filterwarnings(
+    "ignore:Canvas may respond unexpectedly when making requests to HTTP URLs:UserWarning"
+)
+
+KEY = ["student_id", "items_id"]
+
+
+def read_csv(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def expected_changes(previous, current):
+    """The transitions found by merging two runs' student items, like consumers did"""
+    merged = current.merge(
+        previous[KEY + ["state", "item_cp_req_completed"]],
+        on=KEY,
+        how="left",
+        suffixes=("", "_previous"),
+        indicator=True,
+    )
+    found = merged["_merge"] == "both"
+    completed = merged["item_cp_req_completed"] == "True"
+    was_completed = merged["item_cp_req_completed_previous"] == "True"
+    merged["change"] = None
+    merged.loc[found & (merged["state"] != merged["state_previous"]), "change"] = "state"
+    merged.loc[found & was_completed & ~completed, "change"] = "reverted"
+    merged.loc[completed & ~was_completed, "change"] = "completed"
+    merged["previous_state"] = merged["state_previous"].fillna("")
+    return merged[merged["change"].notna()]
+
+
+def transitions(dataframe):
+    columns = KEY + ["change", "previous_state", "state"]
+    return sorted(map(tuple, dataframe[columns].to_numpy().tolist()))
+
+
+def test_change_feed_lists_the_transitions_between_runs(fake_canvas, run_module_progress):
+    server = fake_canvas([SyntheticCourse(1, students=10, modules=3, items=4, seed=0)])
+    root = run_module_progress(server, [1], "project", CHANGE_FEED=True)
+    # the first run has no previous progress to compare with
+    assert read_csv(root / "data/Tableau/changes.csv").empty
+    previous = read_csv(root / "data/1/student_items_df.csv")
+
+    # other progress, and a student who is new since the first run
+    server.courses[1] = SyntheticCourse(1, students=11, modules=3, items=4, seed=1)
+    root = run_module_progress(server, [1], "project", CHANGE_FEED=True)
+    current = read_csv(root / "data/1/student_items_df.csv")
+    changes = read_csv(root / "data/Tableau/changes.csv")
+
+    expected = expected_changes(previous, current)
+    assert set(expected["change"]) == {"completed", "reverted", "state"}
+    assert transitions(changes) == transitions(expected)
+    new_student = changes[changes["student_id"] == "100010"]
+    assert not new_student.empty
+    assert set(new_student["change"]) == {"completed"}
+    assert changes["detected_at"].nunique() == 1
+
+
+def test_unchanged_progress_has_no_changes(fake_canvas, run_module_progress):
+    server = fake_canvas([SyntheticCourse(1, students=10, modules=3, items=4)])
+    run_module_progress(server, [1], "project", CHANGE_FEED=True)
+    root = run_module_progress(server, [1], "project", CHANGE_FEED=True)
+    assert read_csv(root / "data/Tableau/changes.csv").empty
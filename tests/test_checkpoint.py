@@ -0,0 +1,91 @@
+import filecmp
+import threading
+
+import pytest
+
+from benchmarks.fake_canvas import SyntheticCourse
+from src import canvas_helpers
+from src.canvas_helpers import STUDENT_MODULE_ATTRS
+from src.checkpoint import CourseCheckpoint
+from src.records import Module
+
+
+def test_saved_modules_are_restored_as_records(tmp_path):
+    course = SyntheticCourse(1, students=1, modules=2, items=2)
+    student_id = course.students[0]["id"]
+    modules = [Module.from_json(module) for module in course.student_modules_json(student_id)]
+
+    CourseCheckpoint(tmp_path).add(student_id, modules)
+    # a resumed run reads the checkpoint back from disk
+    restored = CourseCheckpoint(tmp_path).modules(student_id)
+
+    assert all(isinstance(module, Module) for module in restored)
+    for saved, module in zip(restored, modules):
+        for attrname in STUDENT_MODULE_ATTRS:
+            assert getattr(saved, attrname) == getattr(module, attrname)
+    assert CourseCheckpoint(tmp_path).modules(student_id + 1) is None
+
+
+class Interrupted(BaseException):
+    """Stands in for Ctrl+C (not an Exception, so run_course doesn't catch it)"""
+
+
+TABLES = ["module_df", "items_df", "student_module_df", "student_items_df"]
+
+
+@pytest.mark.filterwarnings(
+    "ignore:Canvas may respond unexpectedly when making requests to HTTP URLs:UserWarning"
+)
+def test_resumed_run_matches_a_clean_run(fake_canvas, run_module_progress, monkeypatch):
+    courses = [SyntheticCourse(cid, students=10, modules=2, items=3, seed=cid) for cid in (1, 2)]
+    server = fake_canvas(courses)
+    clean = run_module_progress(server, [1, 2], "clean")
+
+    # interrupt the run once course 1 and 5 students of course 2 have been fetched
+    fetched = []
+    lock = threading.Lock()
+    get_student_modules = canvas_helpers._get_student_modules
+
+    def interrupted(course, student):
+        with lock:
+            if len(fetched) >= 15:
+                raise Interrupted()
+            fetched.append(student["id"])
+        return get_student_modules(course, student)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(canvas_helpers, "_get_student_modules", interrupted)
+        with pytest.raises(Interrupted):
+            run_module_progress(
+                server, [1, 2], "resumed", MAX_COURSE_WORKERS=1, MAX_WORKERS=1
+            )
+    assert not (clean.parent / "resumed/data/Tableau/module_data.csv").exists()
+
+    requested = []
+
+    def counted(course, student):
+        requested.append(student["id"])
+        return get_student_modules(course, student)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(canvas_helpers, "_get_student_modules", counted)
+        resumed = run_module_progress(server, [1, 2], "resumed", resume=True)
+
+    # only the students the interrupted run didn't get to are requested
+    assert sorted(requested) == [courses[1].students[i]["id"] for i in range(5, 10)]
+    assert not (resumed / "checkpoint").exists()
+    paths = ["data/Tableau/module_data.csv"] + [
+        f"data/{cid}/{table}.csv" for cid in (1, 2) for table in TABLES
+    ]
+    for path in paths:
+        assert filecmp.cmp(clean / path, resumed / path, shallow=False), path
+
+
+@pytest.mark.filterwarnings(
+    "ignore:Canvas may respond unexpectedly when making requests to HTTP URLs:UserWarning"
+)
+def test_no_checkpoint_is_written_when_turned_off(fake_canvas, run_module_progress):
+    server = fake_canvas([SyntheticCourse(1, students=3, modules=2, items=2)])
+    root = run_module_progress(server, [1], "project", CHECKPOINT=False)
+    assert not (root / "checkpoint").exists()
+    assert (root / "data/Tableau/module_data.csv").exists()
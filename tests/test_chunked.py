@@ -0,0 +1,25 @@
+import filecmp
+
+import pytest
+
+from benchmarks.fake_canvas import SyntheticCourse
+
+pytestmark = pytest.mark.filterwarnings(
+    "ignore:Canvas may respond unexpectedly when making requests to HTTP URLs:UserWarning"
+)
+
+TABLES = ["module_df", "items_df", "student_module_df", "student_items_df"]
+
+
+def test_chunked_run_writes_the_same_files(fake_canvas, run_module_progress):
+    server = fake_canvas(
+        [SyntheticCourse(cid, students=23, modules=3, items=4, seed=cid) for cid in (1, 2)]
+    )
+    whole = run_module_progress(server, [1, 2], "whole")
+    chunked = run_module_progress(server, [1, 2], "chunked", STUDENT_CHUNK_SIZE=5)
+
+    paths = ["data/Tableau/module_data.csv"] + [
+        f"data/{cid}/{table}.csv" for cid in (1, 2) for table in TABLES
+    ]
+    for path in paths:
+        assert filecmp.cmp(whole / path, chunked / path, shallow=False), path
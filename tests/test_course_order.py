@@ -0,0 +1,29 @@
+from src.canvas_helpers import CourseOrder
+
+
+class Recorder:
+    def __init__(self):
+        self.appended = []
+
+    def append(self, dataframe):
+        self.appended.append(dataframe)
+
+
+def test_courses_are_appended_in_course_ids_order():
+    module_data = Recorder()
+    order = CourseOrder(module_data, [1, 2, 3, 4])
+
+    # course 3 finishes first (in two chunks), then 1 (which fails), then 4, then 2
+    order.course(3).append("3a")
+    order.course(3).append("3b")
+    order.finish(3)
+    assert module_data.appended == []
+    order.finish(1)
+    order.course(4).append("4")
+    order.finish(4)
+    assert module_data.appended == []
+    order.course(2).append("2")
+    assert module_data.appended == ["2"]
+    order.finish(2)
+
+    assert module_data.appended == ["2", "3a", "3b", "4"]
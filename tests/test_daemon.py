@@ -0,0 +1,70 @@
+import pytest
+from canvasapi import Canvas
+
+import settings
+import update_module_progress
+from benchmarks.fake_canvas import SyntheticCourse
+from src import daemon
+from src.canvas_helpers import log_failure
+
+pytestmark = pytest.mark.filterwarnings(
+    "ignore:Canvas may respond unexpectedly when making requests to HTTP URLs:UserWarning"
+)
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Records the daemon's publishes (they still happen)"""
+    calls = []
+    publish = daemon._publish
+
+    def record(courses):
+        calls.append(list(courses))
+        return publish(courses)
+
+    monkeypatch.setattr(daemon, "_publish", record)
+    return calls
+
+
+def test_a_cycle_only_publishes_when_something_changed(
+    fake_canvas, run_module_progress, published
+):
+    course = SyntheticCourse(1, students=8, modules=2, items=3, seed=1)
+    server = fake_canvas([course, SyntheticCourse(2, students=5, modules=2, items=2)])
+    root = run_module_progress(server, [1, 2], "daemon")
+    canvas = Canvas(server.base_url, "any-token")
+    courses = {cid: canvas.get_course(cid) for cid in (1, 2)}
+    module_data = root / "data/Tableau/module_data.csv"
+
+    # the daemon's first cycle always publishes
+    run_course = update_module_progress.run_course
+    statuses = daemon._cycle(canvas, courses, [1, 2], run_course, None)
+    assert published == [[1, 2]]
+    assert statuses == {
+        "1": ("Success", "Course folder has been created in data directory"),
+        "2": ("Success", "Course folder has been created in data directory"),
+    }
+    first = module_data.read_bytes()
+    updated_on = settings.status["1"]["updated_on"]
+
+    # the same progress again: nothing is published and the course keeps its updated_on
+    assert daemon._cycle(canvas, courses, [1], run_course, statuses) is statuses
+    assert published == [[1, 2]]
+    assert settings.status["1"]["updated_on"] == updated_on
+
+    # new progress is published
+    course.seed = 2
+    statuses = daemon._cycle(canvas, courses, [1], run_course, statuses)
+    assert published == [[1, 2], [1, 2]]
+    assert module_data.read_bytes() != first
+    assert settings.status["1"]["updated_on"] > updated_on
+
+    # so is a course that fails (it keeps its previous data)
+    def fail(canvas, cid, writer, course=None):
+        log_failure(cid, "Unexpected error: Canvas is down")
+
+    published_data = module_data.read_bytes()
+    daemon._cycle(canvas, courses, [2], fail, statuses)
+    assert len(published) == 3
+    assert settings.status["2"]["status"] == "Failed"
+    assert module_data.read_bytes() == published_data
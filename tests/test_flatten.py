@@ -0,0 +1,28 @@
+import warnings
+
+import pytest
+
+from benchmarks.bench_flatten import bulk, make_module_status, row_by_row
+
+
+def flattened_csv(function, module_status):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        return function(module_status.copy()).to_csv(index=False)
+
+
+@pytest.mark.parametrize("rows", [100, 2000])
+def test_flatten_items_matches_row_by_row(rows):
+    module_status = make_module_status(rows)
+    assert flattened_csv(bulk, module_status) == flattened_csv(row_by_row, module_status)
+
+
+def test_flatten_items_keeps_modules_without_items_or_requirements():
+    module_status = make_module_status(100)
+    # a module without items, and items without a completion requirement
+    module_status.at[0, "items"] = []
+    module_status.at[1, "items"] = [
+        {key: value for key, value in item.items() if key != "completion_requirement"}
+        for item in module_status.at[1, "items"]
+    ]
+    assert flattened_csv(bulk, module_status) == flattened_csv(row_by_row, module_status)
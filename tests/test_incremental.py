@@ -0,0 +1,126 @@
+import pandas as pd
+import pytest
+
+from benchmarks.fake_canvas import SyntheticCourse
+from src import canvas_helpers
+from src.incremental import SyncState
+
+
+def students(*ids):
+    return pd.DataFrame({"id": list(ids)})
+
+
+def enrollments(activity):
+    return pd.DataFrame(
+        {
+            "user_id": list(activity),
+            "last_activity_at": list(activity.values()),
+            "updated_at": ["2020-01-02"] * len(activity),
+        }
+    )
+
+
+def table(rows):
+    return pd.DataFrame(rows, columns=["student_id", "value"])
+
+
+def previous_state():
+    return {
+        "signals": {"1": "a|2020-01-02", "2": "b|2020-01-02", "3": "c|2020-01-02"},
+        "student_module_df": table([("1", "old1"), ("2", "old2"), ("3", "old3")]),
+        "student_items_df": table([("1", "old1"), ("2", "old2"), ("3", "old3")]),
+    }
+
+
+def test_first_run_selects_every_student():
+    state = SyncState(7, "structure")
+    selected = state.select_students(students(1, 2), enrollments({"1": "a", "2": "b"}))
+    assert selected == {"1", "2"}
+
+
+def test_only_changed_and_new_students_are_selected():
+    state = SyncState(7, "structure", previous_state())
+    # 2's activity changed, 4 is new, 3 left the course
+    selected = state.select_students(
+        students(1, 2, 4), enrollments({"1": "a", "2": "b2", "4": "d"})
+    )
+    assert selected == {"2", "4"}
+
+
+def test_merge_replaces_refetched_students_in_roster_order():
+    state = SyncState(7, "structure", previous_state())
+    state.select_students(students(4, 2, 1), enrollments({"1": "a", "2": "b2", "4": "d"}))
+    fresh = table([("2", "new2"), ("4", "new4")])
+    student_module_status, student_items_status = state.merge(fresh, fresh.copy())
+
+    assert student_module_status.values.tolist() == [
+        ["4", "new4"],
+        ["2", "new2"],
+        ["1", "old1"],
+    ]
+    assert student_items_status["student_id"].tolist() == ["4", "2", "1"]
+
+
+def test_merge_keeps_students_that_could_not_be_refetched():
+    state = SyncState(7, "structure", previous_state())
+    state.select_students(students(1, 2, 3), enrollments({"1": "a", "2": "b2", "3": "c2"}))
+    # only 2 could be fetched
+    fresh = table([("2", "new2")])
+    student_module_status, _ = state.merge(fresh, fresh.copy())
+
+    assert student_module_status.values.tolist() == [
+        ["1", "old1"],
+        ["2", "new2"],
+        ["3", "old3"],
+    ]
+    # 3 is refetched by the next run
+    assert state.signals["3"] is None
+    assert state.signals["2"] == "b2|2020-01-02"
+
+
+def test_merge_keeps_everybody_when_nothing_was_fetched():
+    state = SyncState(7, "structure", previous_state())
+    state.select_students(students(1, 2, 3), enrollments({"1": "a", "2": "b2", "3": "c"}))
+    student_module_status, student_items_status = state.merge(None, None)
+
+    assert student_module_status["value"].tolist() == ["old1", "old2", "old3"]
+    assert student_items_status["value"].tolist() == ["old1", "old2", "old3"]
+    assert state.signals["2"] is None
+
+
+class ActiveCourse(SyntheticCourse):
+    """A SyntheticCourse whose first student has been active since the first run"""
+
+    def enrollments_json(self):
+        enrollments = super().enrollments_json()
+        enrollments[0]["last_activity_at"] = "2020-03-01T12:00:00Z"
+        return enrollments
+
+
+@pytest.mark.filterwarnings(
+    "ignore:Canvas may respond unexpectedly when making requests to HTTP URLs:UserWarning"
+)
+def test_failed_refetch_keeps_the_previous_progress(
+    fake_canvas, run_module_progress, monkeypatch
+):
+    server = fake_canvas([SyntheticCourse(1, students=5, modules=2, items=3)])
+    root = run_module_progress(server, [1], "project", INCREMENTAL=True)
+    first = (root / "data/1/student_items_df.csv").read_text()
+
+    server.courses[1] = ActiveCourse(1, students=5, modules=2, items=3)
+
+    def unreachable(course, student):
+        raise ConnectionError("Canvas is unreachable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(canvas_helpers, "_get_student_modules", unreachable)
+        run_module_progress(server, [1], "project", INCREMENTAL=True)
+    assert canvas_helpers.settings.status["1"]["status"] == "Success"
+    assert (root / "data/1/student_items_df.csv").read_text() == first
+
+    # the student is refetched by the next run
+    requests_before = server.request_count
+    run_module_progress(server, [1], "project", INCREMENTAL=True)
+    assert canvas_helpers.settings.status["1"]["status"] == "Success"
+    assert (root / "data/1/student_items_df.csv").read_text() == first
+    assert server.request_count > requests_before
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from src.output_formats import TableWriter, read_table, write_table
+
+pytest.importorskip("pyarrow")
+
+
+def student_table():
+    return pd.DataFrame(
+        {
+            "student_id": ["101", "102"],
+            "user_id": [101.0, None],
+            "sis_user_id": ["00123", "04567"],
+            "login_id": ["0042", "0777"],
+            "integration_id": ["0001", None],
+        }
+    )
+
+
+def test_parquet_keeps_zero_padded_institution_ids(tmp_path):
+    write_table(student_table(), tmp_path / "students", "parquet")
+    result = read_table(tmp_path / "students")
+
+    assert result["sis_user_id"].tolist() == ["00123", "04567"]
+    assert result["login_id"].tolist() == ["0042", "0777"]
+    assert result["integration_id"].tolist()[0] == "0001"
+    # the Canvas keys are still stored as integers
+    assert str(result["student_id"].dtype) == "Int64"
+    assert str(result["user_id"].dtype) == "Int64"
+
+
+def test_parquet_appender_keeps_zero_padded_institution_ids(tmp_path):
+    writer = TableWriter(tmp_path / "students", list(student_table().columns), "parquet")
+    writer.append(student_table())
+    writer.append(student_table())
+    writer.finish()
+
+    result = read_table(tmp_path / "students")
+    assert result["sis_user_id"].tolist() == ["00123", "04567"] * 2
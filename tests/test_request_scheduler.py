@@ -0,0 +1,132 @@
+import filecmp
+
+import pytest
+
+from benchmarks.fake_canvas import SyntheticCourse
+from src import request_scheduler
+from src.request_scheduler import RequestScheduler
+
+THROTTLED = "403 Forbidden (Rate Limit Exceeded)"
+
+
+def make_scheduler(**kwargs):
+    options = dict(
+        max_concurrency=16,
+        initial_concurrency=8,
+        low_watermark=150,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_cap=4,
+    )
+    options.update(kwargs)
+    return RequestScheduler(**options)
+
+
+def healthy(scheduler, remaining=700, attempt=0):
+    return scheduler.handle(200, {"X-Rate-Limit-Remaining": str(remaining)}, None, attempt)
+
+
+def throttled(scheduler, attempt=0):
+    return scheduler.handle(403, {}, lambda: THROTTLED, attempt)
+
+
+def test_healthy_responses_raise_the_limit_additively():
+    scheduler = make_scheduler()
+    for _ in range(8):
+        assert healthy(scheduler) is None
+    # about +1 per limit's worth of responses
+    assert 8.9 < scheduler.limit < 9.0
+    for _ in range(1000):
+        healthy(scheduler)
+    assert scheduler.limit == 16
+
+
+def test_throttled_responses_halve_the_limit_and_are_retried():
+    scheduler = make_scheduler()
+    delay = throttled(scheduler)
+    assert delay is not None and 0 <= delay <= 0.5
+    assert scheduler.limit == 4
+    stats = scheduler.stats()
+    assert stats["throttled"] == 1
+    assert stats["retries"] == 1
+
+
+def test_the_limit_is_halved_once_per_decrease_interval(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(request_scheduler.time, "monotonic", lambda: now[0])
+    scheduler = make_scheduler()
+    throttled(scheduler)
+    throttled(scheduler)
+    # the requests in flight when the first one was throttled don't count again
+    assert scheduler.limit == 4
+    now[0] += RequestScheduler.DECREASE_INTERVAL
+    throttled(scheduler)
+    assert scheduler.limit == 2
+    for _ in range(3):
+        now[0] += RequestScheduler.DECREASE_INTERVAL
+        throttled(scheduler)
+    assert scheduler.limit == 1
+
+
+def test_a_low_bucket_halves_the_limit_without_retrying():
+    scheduler = make_scheduler()
+    assert healthy(scheduler, remaining=100) is None
+    assert scheduler.limit == 4
+    assert scheduler.stats()["rate_limit_remaining"] == 100
+
+
+def test_other_forbidden_responses_are_final():
+    scheduler = make_scheduler()
+    assert scheduler.handle(403, {}, lambda: "unauthorized", 0) is None
+    assert scheduler.limit >= 8
+    assert scheduler.stats()["throttled"] == 0
+
+
+def test_server_errors_are_retried_up_to_max_retries():
+    scheduler = make_scheduler()
+    delays = [scheduler.handle(503, {}, None, attempt) for attempt in range(4)]
+    assert all(delay is not None for delay in delays[:3])
+    assert delays[3] is None
+    # a server error isn't a sign of a full bucket
+    assert scheduler.limit == 8
+    assert scheduler.stats()["server_errors"] == 4
+    assert scheduler.stats()["retries"] == 3
+
+
+def test_backoff_grows_with_the_attempt_up_to_the_cap():
+    scheduler = make_scheduler()
+    for attempt in range(10):
+        delay = scheduler.backoff(attempt)
+        assert 0 <= delay <= min(4, 0.5 * 2 ** attempt)
+
+
+@pytest.mark.filterwarnings(
+    "ignore:Canvas may respond unexpectedly when making requests to HTTP URLs:UserWarning"
+)
+def test_throttled_runs_are_retried_to_a_complete_output(
+    fake_canvas, run_module_progress, monkeypatch
+):
+    courses = [SyntheticCourse(cid, students=15, modules=2, items=3, seed=cid) for cid in (1, 2)]
+    unlimited = run_module_progress(fake_canvas(courses), [1, 2], "unlimited")
+
+    # a bucket that only fits two requests in flight, while the scheduler starts at 10
+    server = fake_canvas(courses, rate_limit=120, latency=0.02)
+    scheduler = make_scheduler(
+        max_concurrency=10,
+        initial_concurrency=10,
+        max_retries=50,
+        backoff_base=0.01,
+        backoff_cap=0.05,
+    )
+    monkeypatch.setattr(request_scheduler, "scheduler", scheduler)
+    limited = run_module_progress(server, [1, 2], "limited")
+
+    stats = scheduler.stats()
+    assert server.throttled_count > 0
+    assert stats["throttled"] == server.throttled_count
+    assert stats["retries"] == stats["throttled"]
+    assert stats["concurrency_limit"] < 10
+    for path in ["data/Tableau/module_data.csv"] + [
+        f"data/{cid}/student_items_df.csv" for cid in (1, 2)
+    ]:
+        assert filecmp.cmp(unlimited / path, limited / path, shallow=False), path
@@ -0,0 +1,59 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from benchmarks.fake_canvas import SyntheticCourse
+from src.response_cache import CachingAdapter, ResponseCache
+
+
+def cached_session(response_cache):
+    session = requests.Session()
+    session.mount("http://", CachingAdapter(HTTPAdapter(), response_cache))
+    return session
+
+
+def test_static_responses_are_served_from_the_cache(fake_canvas, tmp_path):
+    server = fake_canvas([SyntheticCourse(1, students=5)])
+    response_cache = ResponseCache(tmp_path / "cache", ttl=3600)
+    session = cached_session(response_cache)
+
+    url = f"{server.base_url}/api/v1/courses/1"
+    first = session.get(url).json()
+    second = session.get(url).json()
+
+    assert first == second
+    assert server.request_count == 1
+    assert response_cache.stats()["hits"] == 1
+
+
+def test_bulk_submissions_are_revalidated(fake_canvas, tmp_path):
+    # the course-wide submissions carry every student's progress, so even with a long
+    # CACHE_TTL they must be checked with Canvas on every request
+    server = fake_canvas([SyntheticCourse(1, students=5)])
+    response_cache = ResponseCache(tmp_path / "cache", ttl=3600)
+    session = cached_session(response_cache)
+
+    url = f"{server.base_url}/api/v1/courses/1/students/submissions"
+    params = {"student_ids[]": "all", "per_page": 100}
+    first = session.get(url, params=params).json()
+    second = session.get(url, params=params).json()
+
+    assert first == second
+    assert server.request_count == 2
+    assert response_cache.stats()["hits"] == 0
+    assert response_cache.stats()["revalidated"] == 1
+
+
+def test_progress_urls_are_never_fresh(tmp_path):
+    response_cache = ResponseCache(tmp_path / "cache", ttl=3600)
+    urls = [
+        "https://canvas.test/api/v1/courses/1/modules?student_id=7",
+        "https://canvas.test/api/v1/courses/1/enrollments?type%5B%5D=StudentEnrollment",
+        "https://canvas.test/api/v1/courses/1/students/submissions"
+        "?student_ids%5B%5D=all&per_page=100",
+    ]
+    for url in urls:
+        key = response_cache.key("Bearer token", url)
+        response_cache.store(key, url, {"ETag": '"1"'}, b"[]")
+        entry, fresh = response_cache.lookup(key, url)
+        assert entry is not None
+        assert not fresh, url
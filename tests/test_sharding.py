@@ -0,0 +1,55 @@
+import filecmp
+
+import pytest
+
+import settings
+import update_module_progress
+from benchmarks.fake_canvas import SyntheticCourse
+from src.sharding import Shard
+
+pytestmark = pytest.mark.filterwarnings(
+    "ignore:Canvas may respond unexpectedly when making requests to HTTP URLs:UserWarning"
+)
+
+# courses 1 and 2 belong to shard 2/2, 4 and 5 to shard 1/2
+COURSE_IDS = [1, 4, 2, 5]
+
+
+def test_merged_shards_match_a_single_run(fake_canvas, run_module_progress):
+    server = fake_canvas(
+        [SyntheticCourse(cid, students=12, modules=3, items=3, seed=cid) for cid in COURSE_IDS]
+    )
+    single = run_module_progress(server, COURSE_IDS, "single")
+    for index in (2, 1):
+        sharded = run_module_progress(server, COURSE_IDS, "sharded", shard=Shard(index, 2))
+    assert not (sharded / "data/Tableau/module_data.csv").exists()
+    update_module_progress.merge()
+    assert list(settings.status) == [str(cid) for cid in COURSE_IDS]
+    assert all(info["status"] == "Success" for info in settings.status.values())
+
+    for path in ["data/Tableau/module_data.csv", "data/Tableau/course_entitlements.csv"] + [
+        f"data/{cid}/student_items_df.csv" for cid in COURSE_IDS
+    ]:
+        assert filecmp.cmp(single / path, sharded / path, shallow=False), path
+
+
+def test_shards_split_the_courses():
+    shards = [Shard(index, 3) for index in (1, 2, 3)]
+    for cid in range(1, 50):
+        assert sum(shard.owns(cid) for shard in shards) == 1
+
+
+def test_a_shard_without_valid_courses_still_writes_its_status(
+    fake_canvas, run_module_progress
+):
+    # course 1 belongs to shard 2/2; course 4 (shard 1/2) doesn't exist
+    server = fake_canvas([SyntheticCourse(1, students=3, modules=2, items=2)])
+    root = run_module_progress(server, [1, 4], "sharded", shard=Shard(1, 2))
+    assert (root / "data/shards/shard-1-of-2/status.pkl").exists()
+    assert settings.status["4"]["status"] == "Failed"
+
+    run_module_progress(server, [1, 4], "sharded", shard=Shard(2, 2))
+    update_module_progress.merge()
+    assert settings.status["1"]["status"] == "Success"
+    assert settings.status["4"]["status"] == "Failed"
+    assert (root / "data/Tableau/module_data.csv").exists()
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from benchmarks.fake_canvas import SyntheticCourse
+from src.canvas_helpers import STUDENT_ITEMS_COLUMNS
+from src.star_schema import DIMENSIONS, FACT_TABLE, TABLES
+
+pytestmark = pytest.mark.filterwarnings(
+    "ignore:Canvas may respond unexpectedly when making requests to HTTP URLs:UserWarning"
+)
+
+
+class HiddenModuleCourse(SyntheticCourse):
+    """A course whose last module no student sees (so no student item references it)"""
+
+    def student_modules_json(self, student_id):
+        return super().student_modules_json(student_id)[:-1]
+
+
+def read_text(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""])
+
+
+def join_star(tableau_path):
+    """Returns module_data rebuilt from the star schema tables"""
+    tables = {name: read_text((tableau_path / name).with_suffix(".csv")) for name in TABLES}
+    joined = tables[FACT_TABLE]
+    for name, (key, columns) in DIMENSIONS.items():
+        new_columns = [col for col in columns if col == key or col not in joined]
+        joined = joined.merge(tables[name][new_columns], on=key, how="left")
+    return joined[STUDENT_ITEMS_COLUMNS]
+
+
+def test_joining_the_star_schema_gives_back_module_data(fake_canvas, run_module_progress):
+    courses = [HiddenModuleCourse(cid, students=12, modules=4, items=3, seed=cid) for cid in (1, 2)]
+    server = fake_canvas(courses)
+    flat = run_module_progress(server, [1, 2], "flat")
+    star = run_module_progress(server, [1, 2], "star", OUTPUT_SCHEMA="star")
+
+    module_data = read_text(flat / "data/Tableau/module_data.csv")
+    pd.testing.assert_frame_equal(join_star(star / "data/Tableau"), module_data)
+    assert not (star / "data/Tableau/module_data.csv").exists()
+
+
+def test_dimensions_hold_modules_and_items_no_student_references(
+    fake_canvas, run_module_progress
+):
+    course = HiddenModuleCourse(1, students=5, modules=3, items=2)
+    star = run_module_progress(fake_canvas([course]), [1], "star", OUTPUT_SCHEMA="star")
+
+    hidden = course.modules[-1]
+    tableau_path = star / "data/Tableau"
+    facts = read_text(tableau_path / "fact_progress.csv")
+    modules = read_text(tableau_path / "dim_modules.csv")
+    items = read_text(tableau_path / "dim_items.csv")
+    assert str(hidden["id"]) not in set(facts["module_id"])
+    assert list(modules["module_id"]) == [str(module["id"]) for module in course.modules]
+    assert modules["module_id"].is_unique and items["items_id"].is_unique
+    hidden_items = items[items["module_id"] == str(hidden["id"])]
+    assert list(hidden_items["items_id"]) == [str(item["id"]) for item in hidden["items"]]
+    assert set(hidden_items["item_cp_req_type"]) == {
+        item["completion_requirement"]["type"] for item in hidden["items"]
+    }
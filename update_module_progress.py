@@ -10,11 +10,24 @@ https://github.com/ucfopen/canvasapi
 
 """
 
+import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from canvasapi.exceptions import Unauthorized
 import pandas as pd
 import src.interface as interface
 import settings
+from src import async_canvas
+from src import archive
+from src.checkpoint import RunCheckpoint
+from src.chunked import ChunkedStudentStatus
+from src.daemon import serve
+from src.sharding import NoModuleData, Shard, merge_shards, write_shard_status
+from src.instrumentation import close_trace, phase, record_rows
+from src.incremental import sync_student_status
+from src.bulk_progress import get_student_module_status_bulk, supports_bulk_progress
+from src.request_scheduler import scheduler
+from src.response_cache import cache
 from src.canvas_helpers import (
     get_modules,
     get_items,
@@ -22,6 +35,8 @@ from src.canvas_helpers import (
     get_student_items_status,
     write_data_directory,
     clear_data_directory,
+    open_module_data,
+    CourseOrder,
     write_tableau_directory,
     log_success,
     log_failure,
@@ -30,63 +45,108 @@ from src.canvas_helpers import (
 pd.set_option("display.max_columns", 500)
 
 
-def main():
+def main(resume=False, shard=None):
     """
     Main entry point for Module Progress Script
+
+    Args:
+        resume (bool): continue the run that was interrupted (see src/checkpoint.py)
+                       instead of starting over
+        shard (Shard): only run this shard's courses and write its status instead of
+                       data/Tableau (see src/sharding.py)
     """
 
     # Initialization
-    usr_settings = interface.get_user_settings()
+    usr_settings = interface.get_user_settings(shard=shard)
     course_ids = usr_settings["course_ids"]
     canvas = usr_settings["canvas"]
-    tableau_dfs = []
+    courses = usr_settings["courses"]
 
-    # clear any folders that are currently in there (leave tableau folder)
-    clear_data_directory()
+    # every fetched student and finished course is saved, so the run can be resumed
+    checkpoint = RunCheckpoint(resume, shard=shard)
+    finished_courses = set(checkpoint.finished_courses())
+    finished = [cid for cid in course_ids if str(cid) in finished_courses]
+
+    # clear any folders that are currently in there (leave tableau folder and the
+    # folders of courses a resumed run already finished)
+    clear_data_directory(keep=[str(cid) for cid in finished], shard=shard)
 
-    # Getting course information for user-specified courses
-    # Loops through courses and tries to get module/item information and create Pandas Dataframes
-    # Writes dataframes to disk if successful
-    # Prints error and skips course if unsuccessful
-    for cid in course_ids:
-        course = canvas.get_course(cid)
-        # Calling helpers to get data from Canvas and build Pandas DataFrame's
+    # a shard leaves data/Tableau to --merge
+    module_data = open_module_data() if shard is None else NoModuleData()
+    # courses are appended in course_ids order, whichever finishes first
+    course_order = CourseOrder(module_data, course_ids)
+    for cid in finished:
+        status, student_items_tables = checkpoint.finished(cid)
+        with settings.status_lock:
+            settings.status[str(cid)] = status
+        for student_items_status in student_items_tables:
+            course_order.course(cid).append(student_items_status)
+        course_order.finish(cid)
+    if finished:
+        print("Resuming: {} course(s) already finished".format(len(finished)))
 
+    def run(cid):
         try:
-            settings.status[str(cid)]["cname"] = course.name
-            modules_df = get_modules(course)
-            items_df = get_items(modules_df, course.name)
-            student_module_status = get_student_module_status(course)
-            student_items_status = get_student_items_status(
-                course, student_module_status
-            )
-        except KeyError as error:
-            log_failure(cid, error)
-        except Unauthorized:
-            log_failure(
+            run_course(
+                canvas,
                 cid,
-                "User not authorized to get module progress data for course: "
-                + str(cid),
+                course_order.course(cid),
+                course=courses[cid],
+                checkpoint=checkpoint.course(cid),
             )
-        except IndexError:
-            log_failure(cid, "Course must have students enrolled")
+        finally:
+            course_order.finish(cid)
+
+    # Getting course information for user-specified courses (reusing the Course
+    # objects validated by get_user_settings)
+    # Runs up to MAX_COURSE_WORKERS courses at the same time; each course's rows are
+    # appended to module_data once it and the courses before it have finished
+    try:
+        with ThreadPoolExecutor(max_workers=settings.MAX_COURSE_WORKERS) as executor:
+            list(executor.map(run, [cid for cid in course_ids if cid not in finished]))
+    except BaseException:
+        # EX. Ctrl+C: the checkpoint keeps what was fetched, the partial tables go
+        module_data.abort()
+        raise
+
+    async_canvas.close_all()
+    close_trace()
+
+    if shard is not None:
+        write_shard_status(shard)
+    else:
+        try:
+            write_tableau_directory(module_data)
         except Exception as e:
-            log_failure(cid, "Unexpected error: " + e)
-        else:
-            # Writing dataframes to disk
-            dataframes = {
-                "module_df": modules_df,
-                "items_df": items_df,
-                "student_module_df": student_module_status,
-                "student_items_df": student_items_status,
-            }
-            tableau_dfs.append(student_items_status)
-            write_data_directory(dataframes, cid)
-            log_success(cid)
+            module_data.abort()
+            print(e)
+            print("Shutting down...")
+            sys.exit()
+    checkpoint.remove()
+
+    interface.render_status_table()
+    interface.render_request_stats(
+        scheduler.stats(), cache.stats() if settings.CACHE_RESPONSES else None
+    )
+    print("\n\033[94m" + "***COMPLETED***" + "\033[91m")
+
+
+def merge(data_paths=None):
+    """
+    Entry point for --merge: builds data/Tableau from the shards' output (see
+    src/sharding.py)
 
+    Args:
+        data_paths (list of strings): data/ folders of the shards, if they aren't in
+                                      this project's data/ folder
+    """
+    module_data = open_module_data()
     try:
-        write_tableau_directory(tableau_dfs)
+        if not merge_shards(module_data, data_paths):
+            raise FileNotFoundError("No shard output found (data/shards/*/status.pkl)")
+        write_tableau_directory(module_data)
     except Exception as e:
+        module_data.abort()
         print(e)
         print("Shutting down...")
         sys.exit()
@@ -95,5 +155,198 @@ def main():
     print("\n\033[94m" + "***COMPLETED***" + "\033[91m")
 
 
+def restore(run):
+    """
+    Entry point for --restore: writes an archived run's files back to data/Tableau
+    (see src/archive.py), or lists the archived runs
+
+    Args:
+        run (string): the run to restore, EX. 2020-02-01--12-30-00 (None lists them)
+    """
+    if not run:
+        print("\n".join(archive.list_runs()))
+        return
+    try:
+        manifest = archive.restore(run)
+    except (FileNotFoundError, ValueError) as e:
+        print(e)
+        print("Shutting down...")
+        sys.exit()
+    print("Restored {} file(s) of {} to data/Tableau".format(len(manifest["files"]), run))
+
+
+def daemon():
+    """
+    Entry point for the headless service mode (see src/daemon.py)
+    """
+    settings.CONFIRM_RUN = False
+    usr_settings = interface.get_user_settings()
+    clear_data_directory()
+    serve(usr_settings["canvas"], usr_settings["courses"], run_course)
+
+
+def run_course(canvas, cid, module_data, course=None, checkpoint=None):
+    """Gets module/item information for a single course and writes it to disk
+
+    Tries to get module/item information and create Pandas Dataframes.
+    Writes dataframes to disk if successful.
+    Logs the error and skips course if unsuccessful.
+    Safe to run for several courses at the same time.
+
+    Args:
+        canvas (canvasapi.Canvas): the Canvas obj. from Canvas Python API wrapper
+        cid (int): the course id
+        module_data (ModuleDataWriter): the Tableau union the course's student items
+                                        are appended to
+        course (canvasapi.course.Course): the course obj., if it was already requested
+        checkpoint (CourseCheckpoint): where fetched students are saved as they arrive
+                                       (and the course once it succeeded), if any
+    """
+    # Calling helpers to get data from Canvas and build Pandas DataFrame's
+    # Each step's wall time is recorded per course (see src/instrumentation.py)
+    sync_state = None
+    chunked = None
+    try:
+        with phase(cid, "course"):
+            if course is None:
+                course = canvas.get_course(cid)
+        with settings.status_lock:
+            settings.status[str(cid)]["cname"] = course.name
+        with phase(cid, "modules"):
+            modules_df = get_modules(course)
+            items_df = get_items(modules_df, course.name)
+        if use_bulk_progress(course, modules_df):
+            with phase(cid, "progress"):
+                student_module_status = get_student_module_status_bulk(
+                    course, modules_df
+                )
+            with phase(cid, "items"):
+                student_items_status = get_student_items_status(
+                    course, student_module_status
+                )
+        elif settings.INCREMENTAL:
+            # also flattens the refetched students' items
+            with phase(cid, "progress"):
+                sync_state, student_module_status, student_items_status = (
+                    sync_student_status(course, modules_df, checkpoint=checkpoint)
+                )
+        elif settings.STUDENT_CHUNK_SIZE:
+            # writes the student tables a chunk of students at a time (its own phases)
+            chunked = ChunkedStudentStatus(course, checkpoint=checkpoint)
+            chunked.run()
+        else:
+            with phase(cid, "progress"):
+                student_module_status = get_student_module_status(
+                    course, checkpoint=checkpoint
+                )
+            with phase(cid, "items"):
+                student_items_status = get_student_items_status(
+                    course, student_module_status
+                )
+    except KeyError as error:
+        log_failure(cid, error)
+    except Unauthorized:
+        log_failure(
+            cid,
+            "User not authorized to get module progress data for course: "
+            + str(cid),
+        )
+    except IndexError:
+        log_failure(cid, "Course must have students enrolled")
+    except Exception as e:
+        log_failure(cid, "Unexpected error: " + str(e))
+    else:
+        # Writing dataframes to disk
+        dataframes = {"module_df": modules_df, "items_df": items_df}
+        if chunked is None:
+            dataframes["student_module_df"] = student_module_status
+            dataframes["student_items_df"] = student_items_status
+        with phase(cid, "write"):
+            write_data_directory(dataframes, cid)
+            if chunked is None:
+                module_data.append(student_items_status)
+            else:
+                chunked.finish(module_data)
+                student_items_status = chunked.student_items
+            if sync_state is not None:
+                sync_state.save(student_module_status, student_items_status)
+        record_rows(cid, len(student_items_status))
+        log_success(cid)
+        if checkpoint is not None:
+            with settings.status_lock:
+                status = dict(settings.status[str(cid)])
+            checkpoint.finish(status, student_items_status)
+
+
+def use_bulk_progress(course, modules_df):
+    """Returns True if a course's progress should be derived with bulk requests
+
+    The mode comes from settings.PROGRESS_MODE_BY_COURSE (or settings.PROGRESS_MODE).
+    Courses with requirements that bulk progress can't derive use the per-student path.
+
+    Args:
+        course (canvasapi.course.Course): The course obj.
+        modules_df (DataFrame): the course's modules table
+    """
+    mode = settings.PROGRESS_MODE_BY_COURSE.get(course.id, settings.PROGRESS_MODE)
+    if mode != "bulk":
+        return False
+    if not supports_bulk_progress(modules_df):
+        print(
+            "{} has requirements only visible per student, not using bulk progress".format(
+                course.name
+            )
+        )
+        return False
+    return True
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Gets module progress from Canvas")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted run, skipping the students and courses it finished",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep running and refresh every course on its cadence (settings.REFRESH_MINUTES)",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        help="only run the courses of shard I of N (EX. 2/4) and leave data/Tableau to --merge",
+    )
+    parser.add_argument(
+        "--merge",
+        nargs="*",
+        metavar="DATA_DIR",
+        help="build data/Tableau from the shards' output (in data/, or the given data folders)",
+    )
+    parser.add_argument(
+        "--restore",
+        nargs="?",
+        const="",
+        metavar="RUN",
+        help="restore an archived run's data/Tableau (EX. 2020-02-01--12-30-00); without RUN lists them",
+    )
+    args = parser.parse_args()
+    shard = None
+    if args.shard is not None:
+        try:
+            shard = Shard.parse(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.merge is not None and (args.shard or args.daemon or args.resume):
+        parser.error("--merge can't be combined with --shard, --daemon or --resume")
+    if args.daemon and shard is not None:
+        parser.error("--daemon can't be combined with --shard")
+    if args.restore is not None:
+        restore(args.restore)
+    elif args.merge is not None:
+        merge(args.merge)
+    elif args.daemon:
+        daemon()
+    else:
+        main(resume=args.resume, shard=shard)